@@ -0,0 +1,66 @@
+# app/api/bootstrap.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+from fastapi import APIRouter
+
+from app.api.me import build_me_response, run_app_open_hooks
+from app.deps.current_user import CurrentUserDep
+from app.db.postgres import commit_unit_of_work, unit_of_work
+from app.services.history_service import list_history
+from app.services.promocodes_service import get_promocodes_for_user
+from app.services.referrals_service import get_referrals_info
+from app.services.tasks_service import get_all_tasks
+
+router = APIRouter(prefix="/api")
+
+# одновременно открытых соединений на один bootstrap
+BOOTSTRAP_MAX_CONNECTIONS = 3
+BOOTSTRAP_HISTORY_LIMIT = 20
+
+
+async def _fetch_history(user_id: int) -> Dict[str, Any]:
+    return await list_history(user_id=user_id, limit=BOOTSTRAP_HISTORY_LIMIT)
+
+
+async def _fetch_promocodes(user_id: int) -> Dict[str, Any]:
+    return {"promocodes": await get_promocodes_for_user(user_id)}
+
+
+@router.get("/bootstrap")
+async def bootstrap(user_id: CurrentUserDep):
+    """
+    Всё, что мини-апп грузит при старте, одним ответом:
+    /api/me, задачи всех категорий, промокоды, рефералы и первая страница истории.
+    Независимые части читаются параллельно, каждая в своей сессии.
+    """
+    # побочные эффекты /api/me и upsert пользователя из авторизации фиксируем
+    # до чтения: ветки в своих сессиях должны их видеть и не ждать блокировку
+    # строки users, которую держит транзакция запроса
+    await run_app_open_hooks(user_id)
+    await commit_unit_of_work()
+
+    limiter = asyncio.Semaphore(BOOTSTRAP_MAX_CONNECTIONS)
+
+    async def branch(fetch: Callable[[int], Awaitable[Any]]) -> Any:
+        # AsyncSession нельзя делить между задачами — у каждой ветки своя
+        async with limiter:
+            async with unit_of_work():
+                return await fetch(user_id)
+
+    me, tasks, promocodes, referrals, history = await asyncio.gather(
+        branch(build_me_response),
+        branch(get_all_tasks),
+        branch(_fetch_promocodes),
+        branch(get_referrals_info),
+        branch(_fetch_history),
+    )
+
+    return {
+        "me": me,
+        "tasks": tasks,
+        "promocodes": promocodes,
+        "referrals": referrals,
+        "history": history,
+    }
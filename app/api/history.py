@@ -1,28 +1,38 @@
 # app/api/history.py
 
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, Query
 from app.deps.current_user import CurrentUserDep
-from app.services.history_service import list_history, get_history_detail
+from app.services.history_service import (
+    InvalidHistoryCursor,
+    get_history_detail,
+    list_history,
+)
 
 router = APIRouter(prefix="/api")
 
 
 @router.get("/history/list")
-def history_list(
+async def history_list(
     user_id: CurrentUserDep,
     limit: int = Query(20, ge=1, le=50),
-    offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, max_length=200),
+    # старые клиенты листают по offset; убрать через релиз
+    offset: int = Query(0, ge=0, deprecated=True),
 ):
     """
-    Возвращает список записей истории пользователя.
-    Соответствует фронтовому контракту.
+    Возвращает страницу истории пользователя: {"items": [...], "next_cursor": ...}.
+    Следующая страница — тот же запрос с cursor=next_cursor.
     """
-    items = list_history(user_id=user_id, limit=limit, offset=offset)
-    return {"items": items}
+    try:
+        return await list_history(user_id=user_id, limit=limit, cursor=cursor, offset=offset)
+    except InvalidHistoryCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 
 @router.get("/history/detail/{record_id}")
-def history_detail(
+async def history_detail(
     record_id: int,
     user_id: CurrentUserDep,
 ):
@@ -31,7 +41,7 @@ def history_detail(
     Проверяет, что запись принадлежит пользователю.
     """
     # В сервисе параметр называется event_id, а не record_id
-    record = get_history_detail(user_id=user_id, event_id=record_id)
+    record = await get_history_detail(user_id=user_id, event_id=record_id)
     if not record:
         raise HTTPException(
             status_code=404,
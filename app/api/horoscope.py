@@ -32,7 +32,7 @@ async def get_horoscope(
         answer_full=text,
     )
 
-    # общий учёт запроса (daily + usage)
+    # общий учёт запроса (daily + usage) — только в очередь, награды применит воркер
     await track_user_request(user_id, "horoscope")
 
     return {"text": text}
@@ -64,7 +64,7 @@ async def get_horoscope_bot(
         answer_full=text,
     )
 
-    # общий учёт запроса (daily + usage)
+    # общий учёт запроса (daily + usage) — только в очередь, награды применит воркер
     await track_user_request(user_id, "horoscope_bot")
 
     return {"text": text}
@@ -0,0 +1,42 @@
+# app/api/leaderboard.py
+
+from fastapi import APIRouter, Query
+
+from app.deps.current_user import CurrentUserDep
+from app.services.leaderboard_service import LEADERBOARD_SIZE, get_my_rank, get_top
+from app.services.status_service import get_status, status_for_xp
+
+router = APIRouter(prefix="/api")
+
+
+@router.get("/leaderboard")
+async def leaderboard(
+    user_id: CurrentUserDep,
+    limit: int = Query(20, ge=1, le=LEADERBOARD_SIZE),
+):
+    """
+    Рейтинг по XP: топ пользователей и место текущего пользователя.
+    """
+    top = await get_top(limit)
+    me = await get_my_rank(user_id)
+    return {
+        # telegram id других пользователей наружу не отдаём
+        "top": [
+            {
+                "rank": e["rank"],
+                "name": e["name"],
+                "xp": e["xp"],
+                "is_me": e["user_id"] == user_id,
+            }
+            for e in top
+        ],
+        "me": {**me, **status_for_xp(me["xp"])},
+    }
+
+
+@router.get("/status")
+async def status(user_id: CurrentUserDep):
+    """
+    Текущий уровень, XP и сколько осталось до следующего уровня.
+    """
+    return await get_status(user_id)
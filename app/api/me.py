@@ -1,37 +1,38 @@
 # app/api/me.py
 
 import logging
+from typing import Any, Dict
 
 from fastapi import APIRouter, HTTPException, status
 from app.deps.current_user import CurrentUserDep
+from app.db.postgres import savepoint
 from app.services.user_service import get_user_profile
 from app.services.tasks_service import increment_task_progress
-from app.services.subscription_service import check_and_complete_subscriptions
+from app.services.subscription_service import schedule_subscription_check
 from bot_main import bot
 
 router = APIRouter(prefix="/api")
 
 
-@router.get("/me")
-async def get_me(
-    user_id: CurrentUserDep,
-):
+async def run_app_open_hooks(user_id: int) -> None:
     """
-    Возвращает профиль пользователя с полным статусом.
-    При каждом запуске мини-аппа автоматически проверяет подписки.
+    Побочные эффекты открытия мини-аппа (общие для /api/me и /api/bootstrap):
+    фоновая проверка подписок и ежедневный вход.
     """
-    # Проверка подписок (D_1, D_2)
-    try:
-        await check_and_complete_subscriptions(bot, user_id)
-    except Exception as e:
-        logging.exception("Failed to check subscriptions in /api/me: %s", e)
+    # Проверка подписок (D_1, D_2) — в фоне, ответ Telegram не ждём
+    schedule_subscription_check(bot, user_id)
 
     # Ежедневный вход (D_DAILY)
+    # savepoint: ошибка здесь не должна ломать транзакцию всего запроса
     try:
-        await increment_task_progress(user_id, "D_DAILY")
+        async with savepoint():
+            await increment_task_progress(user_id, "D_DAILY")
     except Exception as e:
         logging.exception("Failed to increment D_DAILY in /api/me: %s", e)
 
+
+async def build_me_response(user_id: int) -> Dict[str, Any]:
+    """Профиль в формате ответа /api/me."""
     profile = await get_user_profile(user_id)
     if profile is None:
         raise HTTPException(
@@ -53,3 +54,15 @@ async def get_me(
         "tasks_completed": profile["tasks_completed"],
         "requests_total": profile["requests_total"],
     }
+
+
+@router.get("/me")
+async def get_me(
+    user_id: CurrentUserDep,
+):
+    """
+    Возвращает профиль пользователя с полным статусом.
+    При каждом запуске мини-аппа ставит в фон проверку подписок.
+    """
+    await run_app_open_hooks(user_id)
+    return await build_me_response(user_id)
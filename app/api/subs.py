@@ -1,14 +1,14 @@
 # app/api/subs.py
 
-from datetime import datetime
+from datetime import datetime, timezone as dt_timezone
 from typing import Optional
 
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 
 from app.deps.current_user import CurrentUserDep
-from app.services.sms_service import preview_sms_purchase
-from app.db.postgres import AsyncSessionLocal
+from app.services.sms_service import PRICES, preview_sms_purchase
+from app.db.postgres import session_scope
 from app.db.models import SmsPurchase
 
 router = APIRouter(prefix="/api")
@@ -55,8 +55,7 @@ async def subs_quote(
     """
     Возвращает расчёт покупки по фронтовому контракту.
     """
-    package_map = {100: 100, 200: 200, 300: 300, 500: 500, 1000: 1000}
-    if body.messages not in package_map:
+    if body.messages not in PRICES:
         raise HTTPException(status_code=400, detail="Invalid messages amount")
 
     preview = await preview_sms_purchase(user_id, body.messages, body.promo_code)
@@ -90,8 +89,8 @@ async def subs_create_invoice(
     if body.client_confirmed_amount != int(preview.final_price_rub * 100):
         raise HTTPException(status_code=400, detail="Amount mismatch")
 
-    async with AsyncSessionLocal() as session:
-        now = datetime.utcnow().isoformat()
+    async with session_scope() as session:
+        now = datetime.now(dt_timezone.utc)
 
         purchase = SmsPurchase(
             user_id=user_id,
@@ -105,8 +104,7 @@ async def subs_create_invoice(
             paid_at=None,
         )
         session.add(purchase)
-        await session.commit()
-        await session.refresh(purchase)
+        await session.flush()
 
         invoice_id = purchase.id
 
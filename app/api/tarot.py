@@ -37,7 +37,7 @@ async def get_tarot(
         answer_full=text,
     )
 
-    # общий учёт запроса (daily + usage)
+    # общий учёт запроса (daily + usage) — только в очередь, награды применит воркер
     await track_user_request(user_id, "tarot")
 
     return {"text": text}
@@ -72,6 +72,7 @@ async def get_tarot_bot(
         answer_full=text,
     )
 
+    # общий учёт запроса (daily + usage) — только в очередь, награды применит воркер
     await track_user_request(user_id, "tarot_bot")
 
     return {"text": text}
@@ -1,23 +1,23 @@
 # app/db/daily_tip.py
 
-from datetime import datetime, timezone as dt_timezone
+from datetime import date, datetime, timezone as dt_timezone
 from typing import List, Tuple, Optional
 
-from sqlalchemy import select, insert
+from sqlalchemy import Select, select, insert
 from sqlalchemy.dialects.postgresql import insert as pg_insert
 
-from app.db.postgres import AsyncSessionLocal
+from app.db.postgres import session_scope
 from app.db.models import DailyTipSettings, AdviceSentLog, User
 
 
 async def was_advice_sent_today(user_id: int, date_str: str) -> bool:
     """Проверяет, отправляли ли уже совет дня этому пользователю в эту дату."""
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = (
             select(AdviceSentLog)
             .where(
                 AdviceSentLog.user_id == user_id,
-                AdviceSentLog.sent_date == date_str,
+                AdviceSentLog.sent_date == date.fromisoformat(date_str),
             )
         )
         result = await session.scalars(stmt)
@@ -26,16 +26,30 @@ async def was_advice_sent_today(user_id: int, date_str: str) -> bool:
 
 async def mark_advice_sent(user_id: int, date_str: str) -> None:
     """Отмечает, что совет дня отправлен пользователю в эту дату."""
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         # UPSERT по (user_id, sent_date)
         stmt = pg_insert(AdviceSentLog).values(
             user_id=user_id,
-            sent_date=date_str,
+            sent_date=date.fromisoformat(date_str),
         ).on_conflict_do_nothing(
             index_elements=[AdviceSentLog.user_id, AdviceSentLog.sent_date]
         )
         await session.execute(stmt)
-        await session.commit()
+
+
+def daily_tip_recipients_stmt() -> Select:
+    """Все, у кого включён совет дня (по частичному индексу enabled IS TRUE)."""
+    return (
+        select(
+            DailyTipSettings.user_id,
+            User.first_name,
+            DailyTipSettings.time_from,
+            DailyTipSettings.time_to,
+            DailyTipSettings.timezone,
+        )
+        .join(User, User.user_id == DailyTipSettings.user_id, isouter=True)
+        .where(DailyTipSettings.enabled.is_(True))
+    )
 
 
 async def get_users_enabled_for_advice() -> List[Tuple[int, str, Optional[str], Optional[str], Optional[str]]]:
@@ -43,20 +57,8 @@ async def get_users_enabled_for_advice() -> List[Tuple[int, str, Optional[str],
     Возвращает (user_id, first_name, time_from, time_to, timezone)
     для всех с включённым советом дня.
     """
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(
-                DailyTipSettings.user_id,
-                User.first_name,
-                DailyTipSettings.time_from,
-                DailyTipSettings.time_to,
-                DailyTipSettings.timezone,
-            )
-            .join(User, User.user_id == DailyTipSettings.user_id, isouter=True)
-            .where(DailyTipSettings.enabled.is_(True))
-        )
-        result = await session.execute(stmt)
-        rows = result.all()
+    async with session_scope() as session:
+        rows = (await session.execute(daily_tip_recipients_stmt())).all()
 
     res: List[Tuple[int, str, Optional[str], Optional[str], Optional[str]]] = []
     for user_id, first_name, time_from, time_to, timezone in rows:
@@ -79,8 +81,8 @@ async def upsert_daily_tip_settings_db(
     time_to: Optional[str],
     tz: Optional[str],
 ) -> dict:
-    async with AsyncSessionLocal() as session:
-        now = datetime.now(dt_timezone.utc).isoformat()
+    async with session_scope() as session:
+        now = datetime.now(dt_timezone.utc)
 
         stmt = pg_insert(DailyTipSettings).values(
             user_id=user_id,
@@ -101,7 +103,6 @@ async def upsert_daily_tip_settings_db(
         )
 
         await session.execute(stmt)
-        await session.commit()
 
         sel = select(DailyTipSettings).where(DailyTipSettings.user_id == user_id)
         result = await session.scalars(sel)
@@ -113,5 +114,5 @@ async def upsert_daily_tip_settings_db(
         "time_from": row.time_from,
         "time_to": row.time_to,
         "timezone": row.timezone,
-        "updated_at": row.updated_at,
+        "updated_at": row.updated_at.isoformat(),
     }
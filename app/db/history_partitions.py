@@ -0,0 +1,288 @@
+# app/db/history_partitions.py
+
+import asyncio
+import os
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import List, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.postgres import engine
+
+
+# === ПАРТИЦИИ ИСТОРИИ ===
+# history разбита по месяцам created_at (UTC): history_pYYYYMM.
+# Всё, что было до перехода на партиции, лежит в history_p_legacy.
+HISTORY_RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "12"))
+HISTORY_PARTITIONS_AHEAD = 3        # месяцев вперёд, для которых партиции создаются заранее
+HISTORY_LEGACY_PARTITION = "history_p_legacy"
+HISTORY_SWAP_LOCK_TIMEOUT = "5s"
+HISTORY_SWAP_ATTEMPTS = 5
+# как часто API проверяет, что партиции на HISTORY_PARTITIONS_AHEAD вперёд есть
+HISTORY_PARTITIONS_CHECK_INTERVAL = 6 * 3600  # секунд
+
+_maintainer_task: Optional[asyncio.Task] = None
+
+
+class HistoryPartition(NamedTuple):
+    name: str
+    lower: Optional[datetime]  # None — MINVALUE
+    upper: datetime
+
+
+def month_start(moment: datetime, months: int = 0) -> datetime:
+    """Начало месяца moment (UTC), сдвинутое на months месяцев."""
+    moment = moment.astimezone(dt_timezone.utc)
+    index = moment.year * 12 + moment.month - 1 + months
+    return datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+
+
+def history_cutoff(now: Optional[datetime] = None) -> datetime:
+    """
+    Граница хранимой истории: всё старше уходит в архив задачей ретеншна.
+    Пользовательские запросы ограничены ею, чтобы планировщик отсекал
+    старые партиции.
+    """
+    return month_start(now or datetime.now(dt_timezone.utc), -HISTORY_RETENTION_MONTHS)
+
+
+def partition_name(start: datetime) -> str:
+    return f"history_p{start:%Y%m}"
+
+
+_PARTITION_NAME_RE = re.compile(r"history_p(\d{4})(\d{2})")
+
+
+def partition_upper(name: str) -> Optional[datetime]:
+    """Верхняя граница месячной партиции по имени; None — имя не наше."""
+    match = _PARTITION_NAME_RE.fullmatch(name)
+    if match is None:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return month_start(datetime(year, month, 1, tzinfo=dt_timezone.utc), 1)
+
+
+def _bound(moment: datetime) -> str:
+    return f"'{moment.isoformat()}'"
+
+
+_BOUND_RE = re.compile(r"FROM \((.+?)\) TO \((.+?)\)")
+
+
+def _parse_bound(value: str) -> Optional[datetime]:
+    if value == "MINVALUE":
+        return None
+    return datetime.fromisoformat(value.strip("'")).astimezone(dt_timezone.utc)
+
+
+async def list_history_partitions(conn: AsyncConnection) -> List[HistoryPartition]:
+    """Подключённые партиции history по возрастанию границ."""
+    rows = (
+        await conn.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = 'history'::regclass"
+            )
+        )
+    ).all()
+
+    partitions = []
+    for name, bound in rows:
+        match = _BOUND_RE.search(bound or "")
+        if match is None:
+            continue
+        partitions.append(
+            HistoryPartition(name, _parse_bound(match.group(1)), _parse_bound(match.group(2)))
+        )
+    partitions.sort(key=lambda p: p.upper)
+    return partitions
+
+
+async def ensure_history_partitions(conn: AsyncConnection, dry_run: bool = False) -> List[str]:
+    """
+    Создаёт месячные партиции с текущего месяца на HISTORY_PARTITIONS_AHEAD
+    вперёд (кроме уже покрытых). Возвращает имена созданных
+    (с dry_run — тех, что были бы созданы, без DDL).
+    """
+    # pg_get_expr печатает границы в зоне сессии; вызывать внутри транзакции
+    await conn.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+    covered_until = max(
+        (p.upper for p in await list_history_partitions(conn)), default=None
+    )
+    now = datetime.now(dt_timezone.utc)
+
+    created = []
+    for offset in range(HISTORY_PARTITIONS_AHEAD + 1):
+        start, end = month_start(now, offset), month_start(now, offset + 1)
+        if covered_until is not None and start < covered_until:
+            continue
+        name = partition_name(start)
+        created.append(name)
+        if dry_run:
+            continue
+        await conn.execute(
+            text(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF history "
+                f"FOR VALUES FROM ({_bound(start)}) TO ({_bound(end)})"
+            )
+        )
+    return created
+
+
+async def _partition_maintainer_loop() -> None:
+    while True:
+        try:
+            async with engine.begin() as conn:
+                # CREATE ... PARTITION OF блокирует history: не ждём в очереди за долгими запросами
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{HISTORY_SWAP_LOCK_TIMEOUT}'"))
+                created = await ensure_history_partitions(conn)
+            if created:
+                print(f"✅ [history_partitions] created {', '.join(created)}")
+        except Exception as e:
+            print(f"❌ [history_partitions] partition check failed: {e}")
+        await asyncio.sleep(HISTORY_PARTITIONS_CHECK_INTERVAL)
+
+
+def start_history_partition_maintainer() -> None:
+    """
+    Запускает фоновое создание партиций history (вызывается на старте API):
+    долго работающий процесс не должен упереться в месяц без партиции.
+    """
+    global _maintainer_task
+    if _maintainer_task is None or _maintainer_task.done():
+        _maintainer_task = asyncio.create_task(_partition_maintainer_loop())
+
+
+async def stop_history_partition_maintainer() -> None:
+    global _maintainer_task
+    if _maintainer_task is not None:
+        _maintainer_task.cancel()
+        try:
+            await _maintainer_task
+        except asyncio.CancelledError:
+            pass
+        _maintainer_task = None
+
+
+async def _relkind(conn: AsyncConnection, name: str) -> Optional[str]:
+    return await conn.scalar(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {"name": name}
+    )
+
+
+async def partition_history(lock_conn: AsyncConnection) -> None:
+    """
+    Миграция: обычная history становится партицией history_p_legacy новой
+    партиционированной history без копирования строк. CHECK с границей
+    проверяется заранее (VALIDATE не блокирует запись), поэтому ATTACH
+    не сканирует таблицу под эксклюзивной блокировкой.
+    """
+    from app.db.migrations import build_index
+
+    if await _relkind(lock_conn, "history") == "p":
+        return
+
+    # с запасом в сутки, чтобы подмена точно успела до границы
+    boundary = month_start(datetime.now(dt_timezone.utc) + timedelta(days=1), 1)
+    check = "history_legacy_bound"
+
+    # у партиции уникальный индекс должен включать ключ партиционирования;
+    # к первичному ключу родителя ATTACH подключает только индекс-ограничение
+    unique = "history_id_created_at_key"
+    await build_index(lock_conn, unique, "history (id, created_at)", unique=True)
+
+    async with engine.begin() as conn:
+        has_constraint = await conn.scalar(
+            text(
+                "SELECT 1 FROM pg_constraint "
+                "WHERE conrelid = 'history'::regclass AND conname = :name"
+            ),
+            {"name": unique},
+        )
+        if not has_constraint:
+            await conn.execute(text(f"SET LOCAL lock_timeout = '{HISTORY_SWAP_LOCK_TIMEOUT}'"))
+            await conn.execute(
+                text(f"ALTER TABLE history ADD CONSTRAINT {unique} UNIQUE USING INDEX {unique}")
+            )
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ALTER TABLE history DROP CONSTRAINT IF EXISTS {check}"))
+        await conn.execute(
+            text(
+                f"ALTER TABLE history ADD CONSTRAINT {check} "
+                f"CHECK (created_at IS NOT NULL AND created_at < {_bound(boundary)}) NOT VALID"
+            )
+        )
+    async with engine.begin() as conn:
+        await conn.execute(text(f"ALTER TABLE history VALIDATE CONSTRAINT {check}"))
+
+    legacy = HISTORY_LEGACY_PARTITION
+    swap = [
+        f"SET LOCAL lock_timeout = '{HISTORY_SWAP_LOCK_TIMEOUT}'",
+        f"ALTER TABLE history RENAME TO {legacy}",
+        # у партиции не может быть своего первичного ключа; на history.id
+        # никто не ссылается (history_answers без FK), уникальность держит (id, created_at)
+        f"ALTER TABLE {legacy} DROP CONSTRAINT history_pkey",
+        f"ALTER INDEX ix_history_user_id_created_at RENAME TO {legacy}_user_id_created_at_idx",
+        f"ALTER TABLE {legacy} RENAME CONSTRAINT {unique} TO {legacy}_id_created_at_key",
+        # LIKE без CONSTRAINTS: NOT NULL и default id (та же history_id_seq) переносятся, CHECK — нет
+        f"CREATE TABLE history (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)",
+        "ALTER TABLE history ADD PRIMARY KEY (id, created_at)",
+        "ALTER TABLE history ADD FOREIGN KEY (user_id) REFERENCES users (user_id)",
+        "CREATE INDEX ix_history_user_id_created_at ON history (user_id, created_at, id)",
+        # иначе последовательность удалилась бы вместе с legacy-партицией
+        "ALTER SEQUENCE history_id_seq OWNED BY history.id",
+        # совпадающие индексы и FK legacy подключаются к родительским,
+        # уникальное ограничение (id, created_at) — к первичному ключу
+        f"ALTER TABLE history ATTACH PARTITION {legacy} "
+        f"FOR VALUES FROM (MINVALUE) TO ({_bound(boundary)})",
+        f"ALTER TABLE {legacy} DROP CONSTRAINT {check}",
+    ]
+    for attempt in range(1, HISTORY_SWAP_ATTEMPTS + 1):
+        try:
+            async with engine.begin() as conn:
+                for ddl in swap:
+                    await conn.execute(text(ddl))
+                await ensure_history_partitions(conn)
+            return
+        except Exception as e:
+            if attempt == HISTORY_SWAP_ATTEMPTS:
+                raise
+            print(f"⚠️ [migrations] history partition swap attempt {attempt} failed: {e}")
+            await asyncio.sleep(attempt)
+
+
+async def adopt_detached_partitions(lock_conn: AsyncConnection) -> None:
+    """
+    Миграция: партиции, которые ретеншн отключил до появления history_archives
+    и не успел удалить, записываются туда, чтобы следующий прогон их дочистил.
+    Берутся только отдельные таблицы с нашим именем и границей не позже cutoff.
+    """
+    rows = await lock_conn.execute(
+        text(
+            "SELECT relname FROM pg_class "
+            "WHERE relname LIKE 'history\\_p%' AND relkind = 'r' AND NOT relispartition"
+        )
+    )
+    cutoff = history_cutoff()
+    tables = [
+        name
+        for name in rows.scalars().all()
+        if name == HISTORY_LEGACY_PARTITION
+        or (partition_upper(name) is not None and partition_upper(name) <= cutoff)
+    ]
+    if not tables:
+        return
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO history_archives (table_name) VALUES (:name) "
+                "ON CONFLICT (table_name) DO NOTHING"
+            ),
+            [{"name": name} for name in tables],
+        )
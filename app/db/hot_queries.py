@@ -0,0 +1,75 @@
+# app/db/hot_queries.py
+
+import json
+from datetime import datetime, timezone
+from typing import Callable, Iterator, List, Tuple
+
+from sqlalchemy.sql import Executable
+
+from app.db.postgres import engine
+from app.db.daily_tip import daily_tip_recipients_stmt
+from app.services.credit_ledger_service import credit_delta_stmt, snapshot_chunk_stmt
+from app.services.history_service import history_detail_stmt, history_page_stmt
+from app.services.leaderboard_service import leaderboard_top_stmt, my_rank_stmt
+from app.services.promo_pool_service import promo_pool_pop_stmt
+from app.services.promocodes_service import user_promocodes_stmt
+from app.services.referrals_service import referral_friends_stmt
+from app.services.tasks_service import TASK_CONFIG, claimed_codes_stmt, task_progress_stmt
+from app.services.user_service import user_profile_stmt
+
+
+# Горячие запросы строят те же функции, что и сервисы;
+# здесь только произвольные значения параметров.
+HOT_QUERIES: List[Tuple[str, Callable[[], Executable]]] = [
+    ("history.list", lambda: history_page_stmt(1, 20, after=(datetime.now(timezone.utc), 1))),
+    ("history.detail", lambda: history_detail_stmt(1, 1)),
+    ("profile", lambda: user_profile_stmt(1)),
+    ("referrals.friends", lambda: referral_friends_stmt(1)),
+    ("promocodes.for_user", lambda: user_promocodes_stmt(1)),
+    ("promo_pool.pop", lambda: promo_pool_pop_stmt(5, 1)),
+    ("daily_tip.recipients", daily_tip_recipients_stmt),
+    ("tasks.progress", lambda: task_progress_stmt(1, list(TASK_CONFIG))),
+    ("tasks.claimed", lambda: claimed_codes_stmt(1)),
+    ("leaderboard.top", leaderboard_top_stmt),
+    ("leaderboard.rank", lambda: my_rank_stmt(1)),
+    ("credit.deduct", lambda: credit_delta_stmt(1, -1, "check")),
+    ("credit.snapshot", snapshot_chunk_stmt),
+]
+
+
+def _seq_scans(plan: dict) -> Iterator[str]:
+    if plan.get("Node Type") == "Seq Scan":
+        yield plan.get("Relation Name", "?")
+    for child in plan.get("Plans", ()):
+        yield from _seq_scans(child)
+
+
+async def check_hot_queries() -> List[Tuple[str, List[str]]]:
+    """
+    EXPLAIN каждого горячего запроса с enable_seqscan = off: планировщик
+    берёт seq scan, только если подходящего индекса нет вовсе, поэтому
+    любой Seq Scan в плане — недостающий индекс, а не капризы статистики.
+    Возвращает [(имя запроса, [таблицы с seq scan])] для проблемных.
+    """
+    failures: List[Tuple[str, List[str]]] = []
+
+    async with engine.connect() as conn:
+        await conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        try:
+            for name, build in HOT_QUERIES:
+                # параметры связываем драйвером: литералы ARRAY и т.п. не рендерятся
+                compiled = build().compile(dialect=conn.dialect)
+                result = await conn.exec_driver_sql(
+                    f"EXPLAIN (FORMAT JSON) {compiled.string}",
+                    compiled.params,
+                )
+                raw = result.scalar()
+                # psycopg отдаёт json уже разобранным
+                explained = json.loads(raw) if isinstance(raw, str) else raw
+                tables = list(_seq_scans(explained[0]["Plan"]))
+                if tables:
+                    failures.append((name, tables))
+        finally:
+            await conn.rollback()
+
+    return failures
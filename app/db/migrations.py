@@ -0,0 +1,167 @@
+# app/db/migrations.py
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import Awaitable, AsyncIterator, Callable, List, Optional, Set, Tuple
+
+from sqlalchemy import select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.postgres import engine
+from app.db.models import SchemaMigration
+from app.db.timestamp_migration import convert_timestamps
+from app.db.history_partitions import adopt_detached_partitions, partition_history
+
+
+@dataclass(frozen=True)
+class Migration:
+    """
+    Версионированная правка схемы. Сначала в одной транзакции выполняются
+    statements, затем строятся indexes — пары (имя, "таблица (колонки) [WHERE ...]"):
+    CONCURRENTLY и вне транзакции, чтобы не блокировать запись в таблицы.
+    run — для долгих онлайн-миграций (бэкфилл пачками и т.п.), получает
+    соединение из migration_lock() и сам управляет своими транзакциями.
+    """
+
+    version: int
+    name: str
+    statements: Tuple[str, ...] = ()
+    indexes: Tuple[Tuple[str, str], ...] = ()
+    run: Optional[Callable[[AsyncConnection], Awaitable[None]]] = None
+
+
+# Порядок важен, дописывать в конец; применённые миграции не менять.
+# Все правки идемпотентны: на свежей базе create_all уже создал то же самое.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        1,
+        "legacy_schema_patches",
+        statements=(
+            "ALTER TABLE users ADD COLUMN IF NOT EXISTS tasks_version INTEGER NOT NULL DEFAULT 0",
+            "ALTER TABLE promo_codes ADD COLUMN IF NOT EXISTS allocated_to BIGINT",
+            "ALTER TABLE promo_codes ADD COLUMN IF NOT EXISTS allocated_at TIMESTAMPTZ",
+        ),
+        indexes=(
+            ("ix_user_xp_xp", "user_xp (xp, user_id)"),
+            (
+                "ix_promo_codes_unallocated",
+                "promo_codes (discount_percent, code) WHERE allocated_to IS NULL AND is_active",
+            ),
+        ),
+    ),
+    Migration(
+        2,
+        "hot_path_indexes",
+        indexes=(
+            ("ix_history_user_id_created_at", "history (user_id, created_at, id)"),
+            ("ix_users_referrer_id", "users (referrer_id)"),
+            ("ix_user_promocodes_code", "user_promocodes (code)"),
+            ("ix_daily_tip_settings_enabled", "daily_tip_settings (user_id) WHERE enabled IS TRUE"),
+        ),
+    ),
+    Migration(3, "native_timestamps", run=convert_timestamps),
+    Migration(4, "partition_history", run=partition_history),
+    Migration(
+        5,
+        "history_archive_counts",
+        statements=(
+            # ретеншн до появления history_archive_counts удалял партиции без
+            # счётчика, а пересчёт user_stats не давал requests_total упасть
+            # ниже накопленного: разница с history и есть ушедшее в архив.
+            # Пока legacy-партиция на месте, ретеншн ничего не удалял.
+            "INSERT INTO history_archive_counts (user_id, requests) "
+            "SELECT s.user_id, s.requests_total - coalesce(h.cnt, 0) "
+            "FROM user_stats s LEFT JOIN ("
+            "SELECT user_id, count(*) AS cnt FROM history GROUP BY user_id"
+            ") h ON h.user_id = s.user_id "
+            "WHERE s.requests_total > coalesce(h.cnt, 0) "
+            "AND to_regclass('history_p_legacy') IS NULL "
+            "ON CONFLICT (user_id) DO NOTHING",
+        ),
+    ),
+    Migration(
+        6,
+        "credit_snapshot_cursor_index",
+        indexes=(
+            # курсор snapshot_ledger_chunk — max(last_ledger_id)
+            ("ix_credit_snapshots_last_ledger_id", "credit_snapshots (last_ledger_id)"),
+        ),
+    ),
+    Migration(7, "history_archives", run=adopt_detached_partitions),
+]
+
+
+@asynccontextmanager
+async def migration_lock() -> AsyncIterator[AsyncConnection]:
+    """
+    Отдельное соединение в autocommit с advisory lock на время миграций:
+    несколько инстансов, стартующих одновременно, мигрируют по очереди.
+    """
+    async with engine.connect() as conn:
+        conn = await conn.execution_options(isolation_level="AUTOCOMMIT")
+        await conn.execute(text("SELECT pg_advisory_lock(hashtext('schema_migrations'))"))
+        try:
+            yield conn
+        finally:
+            await conn.execute(text("SELECT pg_advisory_unlock(hashtext('schema_migrations'))"))
+
+
+async def applied_versions(conn: AsyncConnection) -> Set[int]:
+    result = await conn.execute(select(SchemaMigration.version))
+    return set(result.scalars().all())
+
+
+def pending_migrations(applied: Set[int]) -> List[Migration]:
+    return [m for m in MIGRATIONS if m.version not in applied]
+
+
+async def build_index(
+    conn: AsyncConnection, name: str, definition: str, unique: bool = False
+) -> None:
+    valid = await conn.scalar(
+        text(
+            "SELECT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid "
+            "WHERE c.relname = :name"
+        ),
+        {"name": name},
+    )
+    # уже есть (в т.ч. от create_all — на партиционированных таблицах
+    # CONCURRENTLY вообще нельзя, даже с IF NOT EXISTS)
+    if valid:
+        return
+    # прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс — строим заново
+    if valid is not None:
+        await conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    await conn.execute(text(f"CREATE {kind} CONCURRENTLY {name} ON {definition}"))
+
+
+async def apply_migrations(lock_conn: AsyncConnection) -> List[int]:
+    """
+    Применяет недостающие миграции по порядку. Вызывать под migration_lock(),
+    lock_conn — его соединение (в autocommit, на нём строятся индексы).
+    Возвращает применённые версии.
+    """
+    done: List[int] = []
+    for migration in pending_migrations(await applied_versions(lock_conn)):
+        if migration.statements:
+            async with engine.begin() as conn:
+                for ddl in migration.statements:
+                    await conn.execute(text(ddl))
+
+        for name, definition in migration.indexes:
+            await build_index(lock_conn, name, definition)
+
+        if migration.run is not None:
+            await migration.run(lock_conn)
+
+        # версия пишется последней: упавшая посередине миграция повторится
+        # целиком, поэтому все её правки идемпотентны
+        await lock_conn.execute(
+            SchemaMigration.__table__.insert().values(
+                version=migration.version, name=migration.name
+            )
+        )
+        print(f"✅ [migrations] applied {migration.version} {migration.name}")
+        done.append(migration.version)
+    return done
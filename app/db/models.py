@@ -1,12 +1,13 @@
 # app/db/models.py
 
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 from sqlalchemy import (
     Boolean,
     CheckConstraint,
     Column,
+    Date,
     DateTime,
     ForeignKey,
     Integer,
@@ -15,6 +16,10 @@ from sqlalchemy import (
     UniqueConstraint,
     Float,
     BigInteger,
+    Index,
+    LargeBinary,
+    func,
+    text,
 )
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
@@ -23,6 +28,10 @@ from .postgres import Base
 
 class User(Base):
     __tablename__ = "users"
+    __table_args__ = (
+        # друзья и число приглашённых по referrer_id
+        Index("ix_users_referrer_id", "referrer_id"),
+    )
 
     user_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     username: Mapped[Optional[str]] = mapped_column(String, nullable=True)
@@ -31,17 +40,22 @@ class User(Base):
         BigInteger, ForeignKey("users.user_id"), nullable=True
     )
     ref_code: Mapped[Optional[str]] = mapped_column(String, unique=True)
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
-    updated_at: Mapped[str] = mapped_column(String, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     is_banned: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     messages_balance: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
     photo_url: Mapped[Optional[str]] = mapped_column(Text, nullable=True)
 
     # НОВОЕ: поля для стрика активности (D_3 / D_4 / D_5)
-    # Храним дату в формате 'YYYY-MM-DD' по МСК
-    last_active_date: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+    # дата последней активности по МСК
+    last_active_date: Mapped[Optional[date]] = mapped_column(Date, nullable=True)
     streak_days: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
 
+    # версия каталога задач, под которую засеяны строки user_tasks
+    tasks_version: Mapped[int] = mapped_column(
+        Integer, nullable=False, default=0, server_default="0"
+    )
+
     histories: Mapped[list["History"]] = relationship(back_populates="user")
     xp: Mapped[Optional["UserXP"]] = relationship(back_populates="user", uselist=False)
     tasks: Mapped[list["UserTask"]] = relationship(back_populates="user")
@@ -61,6 +75,14 @@ class User(Base):
 
 class DailyTipSettings(Base):
     __tablename__ = "daily_tip_settings"
+    __table_args__ = (
+        # рассылка совета дня выбирает только включивших
+        Index(
+            "ix_daily_tip_settings_enabled",
+            "user_id",
+            postgresql_where=text("enabled IS TRUE"),
+        ),
+    )
 
     user_id: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("users.user_id"), primary_key=True
@@ -69,7 +91,7 @@ class DailyTipSettings(Base):
     time_from: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     time_to: Mapped[Optional[str]] = mapped_column(String, nullable=True)
     timezone: Mapped[Optional[str]] = mapped_column(String, nullable=True)
-    updated_at: Mapped[str] = mapped_column(String, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
 
     user: Mapped["User"] = relationship(back_populates="daily_tip_settings")
 
@@ -80,11 +102,17 @@ class AdviceSentLog(Base):
     user_id: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("users.user_id"), primary_key=True
     )
-    sent_date: Mapped[str] = mapped_column(String, primary_key=True)
+    sent_date: Mapped[date] = mapped_column(Date, primary_key=True)
 
 
 class History(Base):
     __tablename__ = "history"
+    __table_args__ = (
+        # лента истории пользователя, новые сверху
+        Index("ix_history_user_id_created_at", "user_id", "created_at", "id"),
+        # помесячные партиции, см. app/db/history_partitions.py
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     user_id: Mapped[int] = mapped_column(
@@ -92,13 +120,65 @@ class History(Base):
     )
     type: Mapped[str] = mapped_column(String, nullable=False)
     question: Mapped[Optional[str]] = mapped_column(Text)
+    # старые записи; новые ответы целиком лежат сжатыми в history_answers
     answer_full: Mapped[Optional[str]] = mapped_column(Text)
     answer_short: Mapped[Optional[str]] = mapped_column(Text)
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
+    # ключ партиционирования обязан входить в первичный ключ
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
 
     user: Mapped["User"] = relationship(back_populates="histories")
 
 
+class HistoryAnswer(Base):
+    """
+    Полный ответ записи истории, сжатый (см. history_answers_service).
+    Без FK на history: строки живут и удаляются вместе с записями истории,
+    а лента истории читает только узкие строки history.
+    """
+
+    __tablename__ = "history_answers"
+
+    history_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    codec: Mapped[str] = mapped_column(String, nullable=False)
+    raw_size: Mapped[int] = mapped_column(Integer, nullable=False)
+    data: Mapped[bytes] = mapped_column(LargeBinary, nullable=False)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class HistoryArchiveCount(Base):
+    """
+    Сколько записей истории пользователя ушло в архив по ретеншну.
+    Пополняется в той же транзакции, что отключает партицию от history,
+    поэтому архивный счётчик + строки history — всегда полное число запросов.
+    """
+
+    __tablename__ = "history_archive_counts"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.user_id"), primary_key=True
+    )
+    requests: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class HistoryArchive(Base):
+    """
+    Партиции history, отключённые ретеншном. Строка пишется в той же
+    транзакции, что DETACH, archived_at — в той же, что DROP TABLE:
+    ретеншн выгружает и удаляет только таблицы отсюда.
+    """
+
+    __tablename__ = "history_archives"
+
+    table_name: Mapped[str] = mapped_column(String, primary_key=True)
+    detached_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+    archived_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True), nullable=True)
+    archive_file: Mapped[Optional[str]] = mapped_column(String, nullable=True)
+
+
 class Level(Base):
     __tablename__ = "levels"
 
@@ -114,6 +194,15 @@ class Level(Base):
 
 class PromoCode(Base):
     __tablename__ = "promo_codes"
+    __table_args__ = (
+        # пул свободных кодов: выдача берёт первый код нужной скидки
+        Index(
+            "ix_promo_codes_unallocated",
+            "discount_percent",
+            "code",
+            postgresql_where=text("allocated_to IS NULL AND is_active"),
+        ),
+    )
 
     code: Mapped[str] = mapped_column(String, primary_key=True)
     discount_percent: Mapped[int] = mapped_column(Integer, nullable=False)
@@ -122,6 +211,9 @@ class PromoCode(Base):
     )
     is_active: Mapped[bool] = mapped_column(Boolean, nullable=False, default=True)
     description: Mapped[Optional[str]] = mapped_column(Text)
+    # кому код выдан из пула (NULL — свободен)
+    allocated_to: Mapped[Optional[int]] = mapped_column(BigInteger)
+    allocated_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
 
 class ReferralLink(Base):
@@ -145,7 +237,7 @@ class Referral(Base):
         BigInteger, ForeignKey("users.user_id"), nullable=False
     )
     friend_display_name: Mapped[Optional[str]] = mapped_column(String)
-    joined_at: Mapped[str] = mapped_column(String, nullable=False)
+    joined_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
     bonus_credits: Mapped[int] = mapped_column(Integer, default=0)
     bonus_referrer_given: Mapped[bool] = mapped_column(Boolean, default=False)
     bonus_friend_given: Mapped[bool] = mapped_column(Boolean, default=False)
@@ -171,8 +263,8 @@ class SmsPurchase(Base):
     promocode: Mapped[Optional[str]] = mapped_column(String)
     discount_percent: Mapped[Optional[int]] = mapped_column(Integer)
     status: Mapped[str] = mapped_column(String, default="pending")
-    created_at: Mapped[str] = mapped_column(String, nullable=False)
-    paid_at: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    paid_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     user: Mapped["User"] = relationship(back_populates="sms_purchases")
 
@@ -186,12 +278,14 @@ class UserPromocode(Base):
     code: Mapped[str] = mapped_column(
         String, ForeignKey("promo_codes.code"), primary_key=True
     )
-    assigned_at: Mapped[str] = mapped_column(String, nullable=False)
-    used_at: Mapped[Optional[str]] = mapped_column(String)
+    assigned_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    used_at: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
     source: Mapped[Optional[str]] = mapped_column(String)
 
     __table_args__ = (
         UniqueConstraint("user_id", "code", name="uq_user_promocode"),
+        # кому выдан код (PK начинается с user_id и тут не помогает)
+        Index("ix_user_promocodes_code", "code"),
     )
 
 
@@ -206,13 +300,17 @@ class UserTask(Base):
     progress_current: Mapped[int] = mapped_column(Integer, default=0)
     progress_target: Mapped[int] = mapped_column(Integer, nullable=False)
     reward_claimed: Mapped[bool] = mapped_column(Boolean, default=False)
-    last_updated: Mapped[Optional[str]] = mapped_column(String)
+    last_updated: Mapped[Optional[datetime]] = mapped_column(DateTime(timezone=True))
 
     user: Mapped["User"] = relationship(back_populates="tasks")
 
 
 class UserXP(Base):
     __tablename__ = "user_xp"
+    __table_args__ = (
+        # статус, место в рейтинге и топ по XP
+        Index("ix_user_xp_xp", "xp", "user_id"),
+    )
 
     user_id: Mapped[int] = mapped_column(
         BigInteger, ForeignKey("users.user_id"), primary_key=True
@@ -220,3 +318,77 @@ class UserXP(Base):
     xp: Mapped[int] = mapped_column(Integer, default=0)
 
     user: Mapped["User"] = relationship(back_populates="xp")
+
+
+class UserCounter(Base):
+    """Накопительные счётчики пользователя (запросы, покупки), от них считаются лестницы задач."""
+
+    __tablename__ = "user_counters"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.user_id"), primary_key=True
+    )
+    metric: Mapped[str] = mapped_column(String, primary_key=True)
+    value: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0, server_default="0")
+
+
+class UserStats(Base):
+    """Проекция счётчиков профиля, обновляется в тех же транзакциях, что и источники."""
+
+    __tablename__ = "user_stats"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.user_id"), primary_key=True
+    )
+    requests_total: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    friends_invited: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    tasks_completed: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+    xp: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default="0")
+
+
+class CreditLedger(Base):
+    """Журнал изменений messages_balance: только вставки, по строке на изменение."""
+
+    __tablename__ = "credit_ledger"
+    __table_args__ = (
+        Index("ix_credit_ledger_user_id_id", "user_id", "id"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.user_id"), nullable=False
+    )
+    delta: Mapped[int] = mapped_column(Integer, nullable=False)
+    balance_after: Mapped[int] = mapped_column(Integer, nullable=False)
+    reason: Mapped[str] = mapped_column(String, nullable=False)
+    ref: Mapped[Optional[str]] = mapped_column(String)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class CreditSnapshot(Base):
+    """Баланс, собранный из credit_ledger до last_ledger_id включительно."""
+
+    __tablename__ = "credit_snapshots"
+
+    user_id: Mapped[int] = mapped_column(
+        BigInteger, ForeignKey("users.user_id"), primary_key=True
+    )
+    balance: Mapped[int] = mapped_column(Integer, nullable=False)
+    last_ledger_id: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
+
+
+class SchemaMigration(Base):
+    """Применённые версии из app/db/migrations.py."""
+
+    __tablename__ = "schema_migrations"
+
+    version: Mapped[int] = mapped_column(Integer, primary_key=True)
+    name: Mapped[str] = mapped_column(String, nullable=False)
+    applied_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), nullable=False, server_default=func.now()
+    )
@@ -3,7 +3,9 @@
 import os
 import asyncio
 import re
-from typing import AsyncGenerator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncGenerator, AsyncIterator, Callable, List, Optional
 
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import (
@@ -39,8 +41,119 @@ AsyncSessionLocal = async_sessionmaker(
 )
 
 
-async def get_session() -> AsyncGenerator[AsyncSession, None]:
+# сессия текущего unit of work (запроса или фоновой задачи)
+_current_session: ContextVar[Optional[AsyncSession]] = ContextVar(
+    "current_session", default=None
+)
+
+
+@asynccontextmanager
+async def unit_of_work() -> AsyncIterator[AsyncSession]:
+    """
+    Открывает одну сессию и транзакцию на весь запрос (или фоновую задачу).
+    Все session_scope() внутри работают в ней, commit — один, в конце.
+    Всегда открывает новую сессию, даже если снаружи уже есть другая.
+    """
     async with AsyncSessionLocal() as session:
+        token = _current_session.set(session)
+        try:
+            yield session
+            await session.commit()
+        except BaseException:
+            await discard_unit_of_work(session)
+            raise
+        finally:
+            _current_session.reset(token)
+
+        for callback in _commit_hooks(session, pop=True):
+            callback()
+
+
+def current_session() -> Optional[AsyncSession]:
+    """Сессия текущего unit of work или None, если его нет."""
+    return _current_session.get()
+
+
+def _commit_hooks(session: AsyncSession, pop: bool = False) -> List[Callable[[], None]]:
+    if pop:
+        return session.info.pop("after_commit", [])
+    return session.info.setdefault("after_commit", [])
+
+
+def after_commit(callback: Callable[[], None]) -> None:
+    """
+    Выполняет callback после успешного commit текущего unit of work
+    (нужно для in-memory кэшей, которые нельзя трогать до фиксации).
+    Вне unit of work вызывает сразу.
+    """
+    session = _current_session.get()
+    if session is None:
+        callback()
+        return
+    _commit_hooks(session).append(callback)
+
+
+async def commit_unit_of_work() -> None:
+    """
+    Досрочно фиксирует текущий unit of work и выполняет его after_commit-callback'и.
+    Сессия остаётся открытой: дальнейшие запросы идут уже в новой транзакции.
+    Нужно перед работой в других сессиях, которым нужны (или мешают
+    блокировками) изменения этой транзакции. Вне unit of work ничего не делает.
+    """
+    session = _current_session.get()
+    if session is None:
+        return
+    await session.commit()
+    for callback in _commit_hooks(session, pop=True):
+        callback()
+
+
+async def discard_unit_of_work(session: AsyncSession) -> None:
+    """Откатывает транзакцию и отменяет отложенные after_commit-callback'и."""
+    await session.rollback()
+    _commit_hooks(session, pop=True)
+
+
+@asynccontextmanager
+async def session_scope() -> AsyncIterator[AsyncSession]:
+    """
+    Сессия для сервисной функции.
+    Внутри unit of work возвращает его сессию (без commit),
+    иначе открывает свой unit of work и коммитит на выходе.
+    """
+    session = _current_session.get()
+    if session is not None:
+        yield session
+        return
+
+    async with unit_of_work() as session:
+        yield session
+
+
+@asynccontextmanager
+async def savepoint() -> AsyncIterator[None]:
+    """
+    SAVEPOINT внутри unit of work: ошибка в блоке откатывает только его,
+    а транзакция запроса остаётся рабочей.
+    """
+    session = _current_session.get()
+    if session is None:
+        yield
+        return
+
+    hooks = _commit_hooks(session)
+    mark = len(hooks)
+    try:
+        async with session.begin_nested():
+            yield
+    except BaseException:
+        # callback'и из откатившегося блока выполнять нельзя
+        del hooks[mark:]
+        raise
+
+
+async def get_session() -> AsyncGenerator[AsyncSession, None]:
+    async with session_scope() as session:
         yield session
 
 
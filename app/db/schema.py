@@ -0,0 +1,50 @@
+# app/db/schema.py
+
+from sqlalchemy import text
+
+from app.db.postgres import Base, engine
+from app.db import models  # noqa: F401  — регистрирует таблицы в Base.metadata
+from app.db.migrations import (
+    applied_versions,
+    apply_migrations,
+    migration_lock,
+    pending_migrations,
+)
+from app.db.history_partitions import ensure_history_partitions
+
+
+async def ensure_schema() -> None:
+    """
+    Проверка схемы на старте API и скриптов: база должна быть уже
+    мигрирована (python migrate.py — шаг деплоя), иначе падаем сразу,
+    не начиная обслуживать запросы. Долгие миграции здесь не выполняются.
+    Недостающие таблицы без миграций создаёт create_all.
+    """
+    async with engine.connect() as conn:
+        applied = (
+            await applied_versions(conn)
+            if await conn.scalar(text("SELECT to_regclass('schema_migrations')")) is not None
+            else set()
+        )
+    pending = pending_migrations(applied)
+    if pending:
+        versions = ", ".join(f"{m.version} {m.name}" for m in pending)
+        raise RuntimeError(f"Database schema is behind ({versions}): run python migrate.py")
+
+    async with migration_lock():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+
+async def migrate_schema() -> None:
+    """
+    Шаг деплоя (migrate.py): создаёт недостающие таблицы, применяет миграции
+    из app/db/migrations.py и заводит партиции history на ближайшие месяцы.
+    Всё под advisory lock, так что параллельные запуски не мешают друг другу.
+    """
+    async with migration_lock() as lock_conn:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        await apply_migrations(lock_conn)
+        async with engine.begin() as conn:
+            await ensure_history_partitions(conn)
@@ -0,0 +1,262 @@
+# app/db/timestamp_migration.py
+
+import asyncio
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.postgres import engine
+
+
+# Перевод строковых дат (ISO из isoformat()) в timestamptz/date без долгих
+# блокировок: новая колонка + триггер, который заполняет её у свежих строк,
+# пачечный бэкфилл короткими транзакциями, затем быстрая подмена колонок.
+TIMESTAMP_BACKFILL_BATCH = 2000     # ключей (строк или пользователей) в пачке
+TIMESTAMP_BACKFILL_PAUSE = 0.05     # сек между пачками, чтобы не душить запись
+TIMESTAMP_SWAP_LOCK_TIMEOUT = "5s"  # не ждём долгие запросы на подмене, а повторяем
+TIMESTAMP_SWAP_ATTEMPTS = 5
+
+
+@dataclass(frozen=True)
+class TimestampColumn:
+    name: str
+    kind: str  # "timestamptz" | "date"
+    not_null: bool = False
+
+
+@dataclass(frozen=True)
+class TimestampTable:
+    table: str
+    key: str  # первая колонка PK, по ней режем бэкфилл на пачки
+    columns: Tuple[TimestampColumn, ...]
+    # индексы поверх конвертируемых колонок: (имя, определение по новым именам)
+    indexes: Tuple[Tuple[str, str], ...] = ()
+
+
+TIMESTAMP_TABLES: Tuple[TimestampTable, ...] = (
+    TimestampTable(
+        "users",
+        "user_id",
+        (
+            TimestampColumn("created_at", "timestamptz", not_null=True),
+            TimestampColumn("updated_at", "timestamptz", not_null=True),
+            TimestampColumn("last_active_date", "date"),
+        ),
+    ),
+    TimestampTable(
+        "daily_tip_settings",
+        "user_id",
+        (TimestampColumn("updated_at", "timestamptz", not_null=True),),
+    ),
+    TimestampTable(
+        "history",
+        "id",
+        (TimestampColumn("created_at", "timestamptz", not_null=True),),
+        indexes=(("ix_history_user_id_created_at", "history (user_id, created_at, id)"),),
+    ),
+    TimestampTable(
+        "referrals",
+        "id",
+        (TimestampColumn("joined_at", "timestamptz", not_null=True),),
+    ),
+    TimestampTable(
+        "sms_purchases",
+        "id",
+        (
+            TimestampColumn("created_at", "timestamptz", not_null=True),
+            TimestampColumn("paid_at", "timestamptz"),
+        ),
+    ),
+    TimestampTable(
+        "user_promocodes",
+        "user_id",
+        (
+            TimestampColumn("assigned_at", "timestamptz", not_null=True),
+            TimestampColumn("used_at", "timestamptz"),
+        ),
+    ),
+    TimestampTable(
+        "user_tasks",
+        "user_id",
+        (TimestampColumn("last_updated", "timestamptz"),),
+    ),
+)
+
+# advice_sent_log.sent_date входит в первичный ключ, а таблица узкая —
+# её переводим обычным ALTER TYPE (перезапись двух колонок быстрая)
+_ADVICE_SENT_DATE = (
+    "ALTER TABLE advice_sent_log ALTER COLUMN sent_date TYPE DATE USING sent_date::date"
+)
+
+
+def _tmp(column: TimestampColumn) -> str:
+    return f"{column.name}_new"
+
+
+def _convert(column: TimestampColumn, ref: str) -> str:
+    """SQL-выражение: строка ref -> значение нужного типа."""
+    value = f"NULLIF({ref}, '')"
+    if column.kind == "date":
+        return f"{value}::date"
+    # isoformat() без зоны писался из utcnow() — это UTC;
+    # значения с явным смещением приводим как есть
+    return (
+        f"CASE WHEN {value} ~ '\\d:\\d\\d(:\\d\\d(\\.\\d+)?)?\\s*(Z|[+-]\\d\\d(:?\\d\\d)?)$' "
+        f"THEN {value}::timestamptz "
+        f"ELSE {value}::timestamp AT TIME ZONE 'UTC' END"
+    )
+
+
+async def _column_type(conn: AsyncConnection, table: str, column: str) -> Optional[str]:
+    return await conn.scalar(
+        text(
+            "SELECT data_type FROM information_schema.columns "
+            "WHERE table_schema = current_schema() AND table_name = :t AND column_name = :c"
+        ),
+        {"t": table, "c": column},
+    )
+
+
+async def _expand(spec: TimestampTable, columns: Tuple[TimestampColumn, ...]) -> None:
+    """Новые колонки и триггер, который держит их в синхроне для новых строк."""
+    fn = f"{spec.table}_timestamps_sync"
+    assigns = "\n".join(
+        f"    NEW.{_tmp(c)} := {_convert(c, f'NEW.{c.name}')};" for c in columns
+    )
+    async with engine.begin() as conn:
+        for c in columns:
+            await conn.execute(
+                text(f"ALTER TABLE {spec.table} ADD COLUMN IF NOT EXISTS {_tmp(c)} {c.kind}")
+            )
+        await conn.execute(
+            text(
+                f"CREATE OR REPLACE FUNCTION {fn}() RETURNS trigger AS $$\n"
+                f"BEGIN\n{assigns}\n    RETURN NEW;\nEND\n$$ LANGUAGE plpgsql"
+            )
+        )
+        await conn.execute(text(f"DROP TRIGGER IF EXISTS {fn} ON {spec.table}"))
+        await conn.execute(
+            text(
+                f"CREATE TRIGGER {fn} BEFORE INSERT OR UPDATE ON {spec.table} "
+                f"FOR EACH ROW EXECUTE FUNCTION {fn}()"
+            )
+        )
+
+
+async def _backfill(spec: TimestampTable, columns: Tuple[TimestampColumn, ...]) -> int:
+    """Заполняет новые колонки у старых строк пачками по диапазонам ключа."""
+    sets = ", ".join(f"{_tmp(c)} = {_convert(c, c.name)}" for c in columns)
+    todo = " OR ".join(f"({_tmp(c)} IS NULL AND {c.name} IS NOT NULL)" for c in columns)
+    next_bound = text(
+        f"SELECT max({spec.key}) FROM ("
+        f"SELECT DISTINCT {spec.key} FROM {spec.table} WHERE {spec.key} > :last "
+        f"ORDER BY {spec.key} LIMIT :batch) AS keys"
+    )
+    fill = text(
+        f"UPDATE {spec.table} SET {sets} "
+        f"WHERE {spec.key} > :last AND {spec.key} <= :bound AND ({todo})"
+    )
+
+    last, total = -1, 0
+    while True:
+        async with engine.begin() as conn:
+            bound = await conn.scalar(
+                next_bound, {"last": last, "batch": TIMESTAMP_BACKFILL_BATCH}
+            )
+            if bound is None:
+                return total
+            total += (await conn.execute(fill, {"last": last, "bound": bound})).rowcount
+        last = bound
+        await asyncio.sleep(TIMESTAMP_BACKFILL_PAUSE)
+
+
+async def _validate_not_null(spec: TimestampTable, columns: Tuple[TimestampColumn, ...]) -> None:
+    """
+    CHECK NOT VALID + VALIDATE не блокирует запись, а с проверенным CHECK
+    последующий SET NOT NULL обходится без полного скана под эксклюзивной блокировкой.
+    """
+    for c in columns:
+        if not c.not_null:
+            continue
+        name = f"{spec.table}_{_tmp(c)}_not_null"
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE {spec.table} DROP CONSTRAINT IF EXISTS {name}"))
+            await conn.execute(
+                text(
+                    f"ALTER TABLE {spec.table} ADD CONSTRAINT {name} "
+                    f"CHECK ({_tmp(c)} IS NOT NULL) NOT VALID"
+                )
+            )
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE {spec.table} VALIDATE CONSTRAINT {name}"))
+
+
+async def _swap(spec: TimestampTable, columns: Tuple[TimestampColumn, ...]) -> None:
+    """Короткая транзакция: старые колонки удаляются, новые встают на их место."""
+    fn = f"{spec.table}_timestamps_sync"
+    for attempt in range(1, TIMESTAMP_SWAP_ATTEMPTS + 1):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{TIMESTAMP_SWAP_LOCK_TIMEOUT}'"))
+                await conn.execute(text(f"DROP TRIGGER IF EXISTS {fn} ON {spec.table}"))
+                await conn.execute(text(f"DROP FUNCTION IF EXISTS {fn}()"))
+                for c in columns:
+                    tmp = _tmp(c)
+                    if c.not_null:
+                        await conn.execute(
+                            text(f"ALTER TABLE {spec.table} ALTER COLUMN {tmp} SET NOT NULL")
+                        )
+                        await conn.execute(
+                            text(f"ALTER TABLE {spec.table} DROP CONSTRAINT {spec.table}_{tmp}_not_null")
+                        )
+                    # вместе со старой колонкой уходят и индексы по ней
+                    await conn.execute(text(f"ALTER TABLE {spec.table} DROP COLUMN {c.name}"))
+                    await conn.execute(
+                        text(f"ALTER TABLE {spec.table} RENAME COLUMN {tmp} TO {c.name}")
+                    )
+                for name, _ in spec.indexes:
+                    await conn.execute(text(f"ALTER INDEX {name}_new RENAME TO {name}"))
+            return
+        except Exception as e:
+            if attempt == TIMESTAMP_SWAP_ATTEMPTS:
+                raise
+            print(f"⚠️ [migrations] {spec.table} swap attempt {attempt} failed: {e}")
+            await asyncio.sleep(attempt)
+
+
+async def convert_timestamps(lock_conn: AsyncConnection) -> None:
+    """
+    Миграция строковых дат. Каждая таблица проходит expand → бэкфилл →
+    VALIDATE → индексы → подмену; прерванный прогон безопасно повторяется.
+    """
+    # импорт здесь: migrations импортирует этот модуль
+    from app.db.migrations import build_index
+
+    for spec in TIMESTAMP_TABLES:
+        columns = tuple(
+            [
+                c for c in spec.columns
+                if await _column_type(lock_conn, spec.table, c.name) == "character varying"
+            ]
+        )
+        if not columns:
+            continue
+
+        await _expand(spec, columns)
+        filled = await _backfill(spec, columns)
+        print(f"✅ [migrations] {spec.table}: backfilled {filled} rows")
+        await _validate_not_null(spec, columns)
+
+        for name, definition in spec.indexes:
+            new_definition = definition
+            for c in columns:
+                new_definition = new_definition.replace(c.name, _tmp(c))
+            await build_index(lock_conn, f"{name}_new", new_definition)
+
+        await _swap(spec, columns)
+
+    if await _column_type(lock_conn, "advice_sent_log", "sent_date") == "character varying":
+        async with engine.begin() as conn:
+            await conn.execute(text(_ADVICE_SENT_DATE))
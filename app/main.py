@@ -1,10 +1,12 @@
 import sys
+from contextlib import asynccontextmanager
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).parent))
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.responses import JSONResponse
 
 from app.api.me import router as me_router
@@ -16,10 +18,50 @@ from app.api.subs import router as subs_router
 from app.api.rituals import router as rituals_router
 from app.api.horoscope import router as horoscope_router
 from app.api.tarot import router as tarot_router
-from app.services.auth_service import validate_init_data
+from app.api.bootstrap import router as bootstrap_router
+from app.api.leaderboard import router as leaderboard_router
+from app.services.auth_service import validate_init_data, get_init_data_cache_stats
+from app.services.user_service import start_profile_flusher, stop_profile_flusher
+from app.services.tasks_service import get_claimed_cache_stats
+from app.services.profile_cache import get_profile_cache_stats
+from app.services.promo_catalog import (
+    start_promo_catalog,
+    stop_promo_catalog,
+    get_promo_catalog_stats,
+)
+from app.services.subscription_service import get_membership_cache_stats
+from app.services.task_events_service import (
+    start_task_event_workers,
+    stop_task_event_workers,
+    get_task_events_stats,
+)
+from app.db.postgres import unit_of_work, discard_unit_of_work
+from app.db.schema import ensure_schema
+from app.db.history_partitions import (
+    start_history_partition_maintainer,
+    stop_history_partition_maintainer,
+)
+from app.services.levels_service import load_levels
 
 
-app = FastAPI(title="EsotericAI Backend v3")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await ensure_schema()
+    await load_levels()
+    await start_promo_catalog()
+    start_profile_flusher()
+    start_history_partition_maintainer()
+    start_task_event_workers()
+    try:
+        yield
+    finally:
+        await stop_task_event_workers()
+        await stop_history_partition_maintainer()
+        await stop_profile_flusher()
+        await stop_promo_catalog()
+
+
+app = FastAPI(title="EsotericAI Backend v3", lifespan=lifespan)
 
 
 # CORS — максимально широкий для отладки
@@ -32,6 +74,10 @@ app.add_middleware(
 )
 
 
+# сжатие ответов (в первую очередь крупного /api/bootstrap)
+app.add_middleware(GZipMiddleware, minimum_size=1000)
+
+
 @app.middleware("http")
 async def validate_telegram_init_data(request: Request, call_next):
     public_paths = {
@@ -65,6 +111,21 @@ async def validate_telegram_init_data(request: Request, call_next):
     return await call_next(request)
 
 
+# Добавлен последним => внешний: оборачивает и авторизацию, и роуты.
+@app.middleware("http")
+async def db_unit_of_work(request: Request, call_next):
+    """
+    Одна сессия и одна транзакция Postgres на весь запрос.
+    Сервисы берут её через session_scope(), commit — один, в конце.
+    Ответ 5xx откатывает всё, что было сделано в запросе.
+    """
+    async with unit_of_work() as session:
+        response = await call_next(request)
+        if response.status_code >= 500:
+            await discard_unit_of_work(session)
+    return response
+
+
 # Подключение роутеров
 app.include_router(me_router)
 app.include_router(history_router)
@@ -75,8 +136,24 @@ app.include_router(subs_router)
 app.include_router(rituals_router)
 app.include_router(horoscope_router)
 app.include_router(tarot_router)
+app.include_router(bootstrap_router)
+app.include_router(leaderboard_router)
 
 
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
+
+
+@app.get("/api/health")
+def api_health_check():
+    """Состояние процесса и счётчики in-memory кэшей."""
+    return {
+        "status": "ok",
+        "auth_cache": get_init_data_cache_stats(),
+        "claimed_tasks_cache": get_claimed_cache_stats(),
+        "profile_cache": get_profile_cache_stats(),
+        "membership_cache": get_membership_cache_stats(),
+        "promo_catalog": get_promo_catalog_stats(),
+        "task_events": get_task_events_stats(),
+    }
@@ -2,13 +2,34 @@
 
 import hashlib
 import hmac
+import re
+import time
 from urllib.parse import parse_qsl
-from typing import Optional, NamedTuple
+from typing import Optional, NamedTuple, Tuple, Dict, Any
 from datetime import datetime
 import json
 
 from core.config import BOT_TOKEN
 from app.services.user_service import ensure_user_exists  # импорт async-функции
+from app.services.ttl_cache import TTLCache
+from app.db.postgres import after_commit
+
+
+# === КЭШ ПРОВЕРЕННЫХ initData ===
+# Мини-апп шлёт одну и ту же строку initData на все запросы сессии,
+# поэтому повторно её не парсим, не проверяем HMAC и не пишем в БД.
+INIT_DATA_CACHE_SIZE = 10_000
+INIT_DATA_CACHE_TTL = 60 * 60          # сек, сколько держим запись в кэше
+INIT_DATA_MAX_AGE = 24 * 60 * 60       # сек, initData старше этого в кэш не попадает
+
+# секретный ключ зависит только от токена бота — считаем один раз на процесс
+_SECRET_KEY = hmac.new(
+    key=b"WebAppData",
+    msg=BOT_TOKEN.encode(),
+    digestmod=hashlib.sha256,
+).digest()
+
+_HASH_RE = re.compile(r"(?:^|&)hash=([0-9a-fA-F]{64})(?:&|$)")
 
 
 class TelegramUser(NamedTuple):
@@ -21,7 +42,35 @@ class TelegramUser(NamedTuple):
     photo_url: Optional[str] = None
 
 
+# hash -> (исходная строка initData, пользователь)
+_init_data_cache: TTLCache[Tuple[str, TelegramUser]] = TTLCache(
+    maxsize=INIT_DATA_CACHE_SIZE,
+    ttl=INIT_DATA_CACHE_TTL,
+)
+
+
+def get_init_data_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша initData (для /api/health)."""
+    return _init_data_cache.stats()
+
+
+def _cache_ttl_for(auth_date: Optional[str]) -> float:
+    """Сколько секунд можно держать initData в кэше с учётом свежести auth_date."""
+    try:
+        issued_at = int(auth_date or 0)
+    except ValueError:
+        return 0
+    return min(INIT_DATA_CACHE_TTL, issued_at + INIT_DATA_MAX_AGE - time.time())
+
+
 async def validate_init_data(init_data: str) -> TelegramUser:
+    match = _HASH_RE.search(init_data)
+    if match:
+        cached = _init_data_cache.get(match.group(1))
+        # сверяем всю строку, а не только hash, чтобы подмена параметров не прошла
+        if cached is not None and hmac.compare_digest(cached[0], init_data):
+            return cached[1]
+
     print(f"🔍 [auth_service] Получен initData (первые 100 символов): {init_data[:100]}...")
 
     # init_data вида: "query_id=...&user=...&auth_date=...&hash=..."
@@ -34,14 +83,8 @@ async def validate_init_data(init_data: str) -> TelegramUser:
     sorted_params = sorted(params.items(), key=lambda x: x[0])
     data_check_string = "\n".join(f"{k}={v}" for k, v in sorted_params)
 
-    secret_key = hmac.new(
-        key=b"WebAppData",
-        msg=BOT_TOKEN.encode(),
-        digestmod=hashlib.sha256,
-    ).digest()
-
     computed_hash = hmac.new(
-        key=secret_key,
+        key=_SECRET_KEY,
         msg=data_check_string.encode(),
         digestmod=hashlib.sha256,
     ).hexdigest()
@@ -78,7 +121,7 @@ async def validate_init_data(init_data: str) -> TelegramUser:
         photo_url=photo_url,
     )
 
-    return TelegramUser(
+    tg_user = TelegramUser(
         user_id=user_data["id"],
         first_name=user_data["first_name"],
         last_name=user_data.get("last_name"),
@@ -87,3 +130,10 @@ async def validate_init_data(init_data: str) -> TelegramUser:
         allows_write_to_pm=user_data.get("allows_write_to_pm", False),
         photo_url=photo_url,
     )
+
+    ttl = _cache_ttl_for(params.get("auth_date"))
+    if ttl > 0:
+        # кэш пропускает ensure_user_exists — заполняем, только когда upsert зафиксирован
+        after_commit(lambda: _init_data_cache.set(hash_value, (init_data, tg_user), ttl=ttl))
+
+    return tg_user
@@ -0,0 +1,229 @@
+# app/services/credit_ledger_service.py
+
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import String, exists, func, literal, or_, select, text, update
+from sqlalchemy.sql import Executable
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import aliased
+
+from app.db.postgres import session_scope
+from app.db.models import CreditLedger, CreditSnapshot, User
+
+
+# === ЖУРНАЛ КРЕДИТОВ ===
+# Любое изменение messages_balance идёт одним запросом:
+# UPDATE users ... RETURNING в CTE + INSERT в credit_ledger из этой CTE.
+# Списание проверяет остаток в том же UPDATE (WHERE messages_balance >= :amount),
+# поэтому уйти в минус при параллельных запросах нельзя.
+SNAPSHOT_CHUNK_SIZE = 10_000
+# свежие строки журнала не сканируем: id выдаются до commit, и строка
+# с меньшим id может стать видна позже строки с большим — пачка
+# обрывается на первой свежей строке, чтобы курсор не перепрыгнул такие
+SNAPSHOT_SAFETY_LAG = "1 minute"
+OPENING_REASON = "opening_balance"
+
+
+def credit_delta_stmt(
+    user_id: int,
+    delta: int,
+    reason: str,
+    ref: Optional[str] = None,
+) -> Executable:
+    """UPDATE users ... RETURNING в CTE + INSERT строки журнала из неё."""
+    where = [User.user_id == user_id]
+    if delta < 0:
+        where.append(User.messages_balance >= -delta)
+
+    changed = (
+        update(User)
+        .where(*where)
+        .values(messages_balance=User.messages_balance + delta)
+        .returning(User.user_id, User.messages_balance)
+        .cte("changed")
+    )
+    return (
+        pg_insert(CreditLedger)
+        .from_select(
+            ["user_id", "delta", "balance_after", "reason", "ref"],
+            select(
+                changed.c.user_id,
+                literal(delta),
+                changed.c.messages_balance,
+                literal(reason),
+                literal(ref, String),
+            ),
+        )
+        .returning(CreditLedger.balance_after)
+    )
+
+
+async def apply_credit_delta(
+    user_id: int,
+    delta: int,
+    reason: str,
+    ref: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Меняет баланс на delta и пишет строку журнала в том же запросе.
+    Отрицательная delta проходит, только если хватает баланса.
+    Возвращает новый баланс или None (нет пользователя / не хватило средств).
+    """
+    if delta == 0:
+        return None
+
+    stmt = credit_delta_stmt(user_id, delta, reason, ref)
+    async with session_scope() as session:
+        return (await session.execute(stmt)).scalar_one_or_none()
+
+
+async def open_credit_ledger() -> int:
+    """
+    Стартовые записи журнала (reason=opening_balance) с балансом, который
+    был до появления журнала: до первой записи пользователя или текущий,
+    если записей нет. Идемпотентно.
+    """
+    first_entry = aliased(CreditLedger)
+    balance_before_ledger = func.coalesce(
+        select(first_entry.balance_after - first_entry.delta)
+        .where(first_entry.user_id == User.user_id)
+        .order_by(first_entry.id)
+        .limit(1)
+        .scalar_subquery(),
+        User.messages_balance,
+    )
+    opened = exists().where(
+        CreditLedger.user_id == User.user_id,
+        CreditLedger.reason == OPENING_REASON,
+    )
+    rows = (
+        select(
+            User.user_id,
+            balance_before_ledger.label("opening"),
+        )
+        .where(~opened)
+        .subquery()
+    )
+    stmt = pg_insert(CreditLedger).from_select(
+        ["user_id", "delta", "balance_after", "reason"],
+        select(
+            rows.c.user_id,
+            rows.c.opening,
+            rows.c.opening,
+            literal(OPENING_REASON),
+        ).where(rows.c.opening != 0),
+    )
+
+    async with session_scope() as session:
+        # без preserve_rowcount у INSERT ... SELECT rowcount = -1
+        result = await session.execute(stmt, execution_options={"preserve_rowcount": True})
+        return result.rowcount
+
+
+def snapshot_chunk_stmt(chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> Executable:
+    """
+    Курсор — максимальный last_ledger_id среди снимков: пачки идут по id
+    по порядку без пропусков (до первой свежей строки), и последняя строка
+    пачки всегда попадает в какой-то снимок.
+    """
+    cursor = (
+        select(func.coalesce(func.max(CreditSnapshot.last_ledger_id), 0))
+        .scalar_subquery()
+    )
+    # пропускать свежие строки нельзя: курсор уйдёт за них навсегда
+    fresh = (
+        select(func.min(CreditLedger.id))
+        .where(
+            CreditLedger.id > cursor,
+            CreditLedger.created_at >= func.now() - text(f"interval '{SNAPSHOT_SAFETY_LAG}'"),
+        )
+        .scalar_subquery()
+    )
+    chunk = (
+        select(CreditLedger.id, CreditLedger.user_id, CreditLedger.delta)
+        .where(
+            CreditLedger.id > cursor,
+            or_(fresh.is_(None), CreditLedger.id < fresh),
+        )
+        .order_by(CreditLedger.id)
+        .limit(chunk_size)
+        .cte("chunk")
+    )
+    per_user = select(
+        chunk.c.user_id,
+        func.sum(chunk.c.delta),
+        func.max(chunk.c.id),
+    ).group_by(chunk.c.user_id)
+
+    stmt = pg_insert(CreditSnapshot).from_select(
+        ["user_id", "balance", "last_ledger_id"],
+        per_user,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[CreditSnapshot.user_id],
+        set_={
+            "balance": CreditSnapshot.balance + stmt.excluded.balance,
+            "last_ledger_id": stmt.excluded.last_ledger_id,
+            "updated_at": func.now(),
+        },
+    )
+    return stmt
+
+
+async def snapshot_ledger_chunk(chunk_size: int = SNAPSHOT_CHUNK_SIZE) -> int:
+    """
+    Досчитывает credit_snapshots по следующей пачке строк журнала (snapshot_chunk_stmt).
+    Возвращает число обновлённых снимков (0 — журнал дочитан).
+    """
+    async with session_scope() as session:
+        result = await session.execute(
+            snapshot_chunk_stmt(chunk_size),
+            execution_options={"preserve_rowcount": True},
+        )
+        return result.rowcount
+
+
+async def verify_snapshots_chunk(
+    after_user_id: int = 0,
+    chunk_size: int = SNAPSHOT_CHUNK_SIZE,
+) -> Tuple[Optional[int], List[Dict[str, Any]]]:
+    """
+    Сверяет снимки с users.messages_balance для пользователей с user_id > after_user_id.
+    Пользователей, у которых в журнале есть строки новее снимка, пропускает.
+    Возвращает (последний просмотренный user_id или None, расхождения).
+    """
+    page = (
+        select(CreditSnapshot.user_id)
+        .where(CreditSnapshot.user_id > after_user_id)
+        .order_by(CreditSnapshot.user_id)
+        .limit(chunk_size)
+        .cte("page")
+    )
+    newer = exists().where(
+        CreditLedger.user_id == CreditSnapshot.user_id,
+        CreditLedger.id > CreditSnapshot.last_ledger_id,
+    )
+    stmt = (
+        select(
+            CreditSnapshot.user_id,
+            CreditSnapshot.balance,
+            User.messages_balance,
+            ~newer,
+        )
+        .join(page, page.c.user_id == CreditSnapshot.user_id)
+        .join(User, User.user_id == CreditSnapshot.user_id)
+        .order_by(CreditSnapshot.user_id)
+    )
+
+    async with session_scope() as session:
+        rows = (await session.execute(stmt)).all()
+
+    if not rows:
+        return None, []
+
+    mismatches = [
+        {"user_id": user_id, "ledger_balance": ledger_balance, "balance": balance}
+        for user_id, ledger_balance, balance, settled in rows
+        if settled and ledger_balance != balance
+    ]
+    return rows[-1][0], mismatches
@@ -2,11 +2,9 @@
 
 from typing import Optional
 
-from sqlalchemy import select, update
-
 from app.services.user_service import get_user_profile
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import User
+from app.services.profile_cache import invalidate_user_profile
+from app.services.credit_ledger_service import apply_credit_delta
 
 
 async def get_balance(user_id: int) -> int:
@@ -17,39 +15,35 @@ async def get_balance(user_id: int) -> int:
     return profile.get("credits_balance", 0) if profile else 0
 
 
-async def add(user_id: int, amount: int) -> None:
+async def add(
+    user_id: int,
+    amount: int,
+    reason: str = "purchase",
+    ref: Optional[str] = None,
+) -> None:
     """
-    Добавляет сообщения пользователю.
+    Добавляет сообщения пользователю (с записью в credit_ledger).
     """
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            update(User)
-            .where(User.user_id == user_id)
-            .values(messages_balance=User.messages_balance + amount)
-        )
-        await session.execute(stmt)
-        await session.commit()
+    if await apply_credit_delta(user_id, amount, reason, ref) is not None:
+        invalidate_user_profile(user_id)
 
 
-async def deduct(user_id: int, amount: int) -> bool:
+async def deduct(
+    user_id: int,
+    amount: int,
+    reason: str = "spend",
+    ref: Optional[str] = None,
+) -> bool:
     """
     Списывает сообщения у пользователя.
+    Проверка остатка, списание и запись в журнал — один запрос.
     Возвращает True, если успешно.
     """
-    async with AsyncSessionLocal() as session:
-        # читаем текущий баланс
-        stmt = select(User.messages_balance).where(User.user_id == user_id)
-        result = await session.execute(stmt)
-        row = result.first()
-
-        if not row or row[0] < amount:
-            return False
-
-        upd = (
-            update(User)
-            .where(User.user_id == user_id)
-            .values(messages_balance=User.messages_balance - amount)
-        )
-        await session.execute(upd)
-        await session.commit()
-        return True
+    if amount <= 0:
+        return amount == 0
+
+    if await apply_credit_delta(user_id, -amount, reason, ref) is None:
+        return False
+
+    invalidate_user_profile(user_id)
+    return True
@@ -0,0 +1,152 @@
+# app/services/history_answers_service.py
+
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+
+from sqlalchemy import func, select, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.postgres import session_scope
+from app.db.models import History, HistoryAnswer
+
+try:
+    import zstandard
+except ImportError:  # необязательная зависимость, без неё пишем zlib
+    zstandard = None
+
+
+# === ХРАНЕНИЕ ПОЛНЫХ ОТВЕТОВ ===
+# Полный ответ (несколько КБ) лежит сжатым в history_answers и читается
+# только карточкой записи; в history остаются узкие строки для ленты.
+HISTORY_ANSWER_MIN_COMPRESS = 256    # байт; короче — храним как есть
+HISTORY_ANSWER_ZSTD_LEVEL = 9
+HISTORY_ANSWER_ZLIB_LEVEL = 6
+HISTORY_ANSWERS_MIGRATE_BATCH = 500  # записей за проход мигратора
+
+_zstd_compressor = (
+    zstandard.ZstdCompressor(level=HISTORY_ANSWER_ZSTD_LEVEL) if zstandard else None
+)
+
+
+def pack_answer(raw: bytes) -> Tuple[str, bytes]:
+    """UTF-8 ответа -> (кодек, байты). Сжимаем, только если это выгодно."""
+    if len(raw) >= HISTORY_ANSWER_MIN_COMPRESS:
+        if _zstd_compressor is not None:
+            packed, codec = _zstd_compressor.compress(raw), "zstd"
+        else:
+            packed, codec = zlib.compress(raw, HISTORY_ANSWER_ZLIB_LEVEL), "zlib"
+        if len(packed) < len(raw):
+            return codec, packed
+    return "raw", raw
+
+
+def unpack_answer(codec: str, data: bytes) -> str:
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read zstd history answers")
+        raw = zstandard.ZstdDecompressor().decompress(data)
+    elif codec == "zlib":
+        raw = zlib.decompress(data)
+    else:
+        raw = data
+    return raw.decode("utf-8")
+
+
+def _answer_row(history_id: int, answer: str, created_at: datetime) -> Dict[str, Any]:
+    raw = answer.encode("utf-8")
+    codec, data = pack_answer(raw)
+    return {
+        "history_id": history_id,
+        "codec": codec,
+        "raw_size": len(raw),
+        "data": data,
+        "created_at": created_at,
+    }
+
+
+async def store_answer(history_id: int, answer: str, created_at: datetime) -> None:
+    """Сохраняет полный ответ записи истории (повторная запись — no-op)."""
+    stmt = (
+        pg_insert(HistoryAnswer)
+        .values(_answer_row(history_id, answer, created_at))
+        .on_conflict_do_nothing(index_elements=[HistoryAnswer.history_id])
+    )
+    async with session_scope() as session:
+        await session.execute(stmt)
+
+
+async def migrate_history_answers_chunk(
+    after_id: int = 0,
+    batch: int = HISTORY_ANSWERS_MIGRATE_BATCH,
+) -> Tuple[Optional[int], int]:
+    """
+    Переносит пачку старых answer_full (id > after_id) в history_answers
+    и обнуляет их в history. Возвращает (последний просмотренный id, перенесено);
+    (None, 0) — переносить больше нечего.
+    """
+    async with session_scope() as session:
+        rows = (
+            await session.execute(
+                select(History.id, History.answer_full, History.created_at)
+                .where(History.id > after_id, History.answer_full.isnot(None))
+                .order_by(History.id)
+                .limit(batch)
+            )
+        ).all()
+        if not rows:
+            return None, 0
+
+        ids = [row.id for row in rows]
+        await session.execute(
+            pg_insert(HistoryAnswer)
+            .values([_answer_row(row.id, row.answer_full, row.created_at) for row in rows])
+            .on_conflict_do_nothing(index_elements=[HistoryAnswer.history_id])
+        )
+        await session.execute(
+            update(History).where(History.id.in_(ids)).values(answer_full=None)
+        )
+
+    return ids[-1], len(ids)
+
+
+async def history_storage_report() -> Dict[str, Any]:
+    """Сколько места экономит сжатие и сколько ответов ещё ждут переноса."""
+    async with session_scope() as session:
+        by_codec = (
+            await session.execute(
+                select(
+                    HistoryAnswer.codec,
+                    func.count(),
+                    func.coalesce(func.sum(HistoryAnswer.raw_size), 0),
+                    func.coalesce(func.sum(func.octet_length(HistoryAnswer.data)), 0),
+                ).group_by(HistoryAnswer.codec)
+            )
+        ).all()
+        legacy = await session.scalar(
+            select(func.count()).select_from(History).where(History.answer_full.isnot(None))
+        )
+        history_bytes, answers_bytes = (
+            await session.execute(
+                text(
+                    "SELECT pg_total_relation_size('history'), "
+                    "pg_total_relation_size('history_answers')"
+                )
+            )
+        ).one()
+
+    raw_total = sum(int(raw) for _, _, raw, _ in by_codec)
+    stored_total = sum(int(stored) for _, _, _, stored in by_codec)
+    return {
+        "codecs": {
+            codec: {"rows": count, "raw_bytes": int(raw), "stored_bytes": int(stored)}
+            for codec, count, raw, stored in by_codec
+        },
+        "raw_bytes": raw_total,
+        "stored_bytes": stored_total,
+        "saved_bytes": raw_total - stored_total,
+        "ratio": round(stored_total / raw_total, 4) if raw_total else None,
+        "legacy_rows": legacy,
+        "history_table_bytes": history_bytes,
+        "history_answers_table_bytes": answers_bytes,
+    }
@@ -0,0 +1,233 @@
+# app/services/history_retention_service.py
+
+import asyncio
+import gzip
+import json
+import os
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, IO, Iterator, List
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.db.postgres import engine
+from app.db.migrations import migration_lock
+from app.db.history_partitions import (
+    ensure_history_partitions,
+    history_cutoff,
+    list_history_partitions,
+)
+from app.services.history_answers_service import unpack_answer, zstandard
+
+
+# === РЕТЕНШН ИСТОРИИ ===
+# Партиции history, целиком вышедшие за HISTORY_RETENTION_MONTHS, отключаются
+# (с переносом числа записей в history_archive_counts и отметкой в
+# history_archives), выгружаются в сжатый NDJSON и удаляются вместе с их
+# ответами в history_answers. Удаляются только таблицы из history_archives.
+HISTORY_ARCHIVE_DIR = Path(os.getenv("HISTORY_ARCHIVE_DIR", "archive/history"))
+HISTORY_ARCHIVE_FETCH = 1000          # строк за одну выборку серверного курсора
+HISTORY_ANSWERS_DELETE_BATCH = 5000   # ответов в одном DELETE
+HISTORY_ARCHIVE_ZSTD_LEVEL = 10
+HISTORY_DETACH_LOCK_TIMEOUT = "5s"
+HISTORY_DETACH_ATTEMPTS = 5
+
+
+def _archive_path(table: str) -> Path:
+    suffix = ".ndjson.zst" if zstandard is not None else ".ndjson.gz"
+    return HISTORY_ARCHIVE_DIR / f"{table}{suffix}"
+
+
+@contextmanager
+def _open_archive(path: Path) -> Iterator[IO[bytes]]:
+    with open(path, "wb") as raw:
+        if zstandard is not None:
+            cctx = zstandard.ZstdCompressor(level=HISTORY_ARCHIVE_ZSTD_LEVEL)
+            with cctx.stream_writer(raw, closefd=False) as writer:
+                yield writer
+        else:
+            with gzip.GzipFile(fileobj=raw, mode="wb") as writer:
+                yield writer
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+async def _detached_tables(conn: AsyncConnection) -> List[str]:
+    """Отключённые ретеншном, но ещё не удалённые партиции."""
+    result = await conn.execute(
+        text(
+            "SELECT table_name FROM history_archives "
+            "WHERE archived_at IS NULL ORDER BY table_name"
+        )
+    )
+    return list(result.scalars().all())
+
+
+async def _expired_tables(conn: AsyncConnection, cutoff: datetime) -> List[str]:
+    return [p.name for p in await list_history_partitions(conn) if p.upper <= cutoff]
+
+
+async def _detach(table: str) -> None:
+    """
+    Переносит число записей партиции в history_archive_counts, отмечает её
+    в history_archives и отключает в одной транзакции: пересчёт user_stats видит каждую запись ровно один
+    раз — либо в history, либо в архивном счётчике. Поэтому DETACH обычный,
+    а не CONCURRENTLY (тот нельзя в транзакции); эксклюзивная блокировка
+    history короткая и ограничена lock_timeout.
+    """
+    archive_counts = text(
+        "INSERT INTO history_archive_counts (user_id, requests) "
+        f"SELECT user_id, count(*) FROM {table} GROUP BY user_id "
+        "ON CONFLICT (user_id) DO UPDATE "
+        "SET requests = history_archive_counts.requests + excluded.requests"
+    )
+    mark_detached = text(
+        "INSERT INTO history_archives (table_name) VALUES (:table) "
+        "ON CONFLICT (table_name) DO NOTHING"
+    )
+    for attempt in range(1, HISTORY_DETACH_ATTEMPTS + 1):
+        try:
+            async with engine.begin() as conn:
+                await conn.execute(text(f"SET LOCAL lock_timeout = '{HISTORY_DETACH_LOCK_TIMEOUT}'"))
+                await conn.execute(archive_counts)
+                await conn.execute(mark_detached, {"table": table})
+                await conn.execute(text(f"ALTER TABLE history DETACH PARTITION {table}"))
+            return
+        except Exception as e:
+            if attempt == HISTORY_DETACH_ATTEMPTS:
+                raise
+            print(f"⚠️ [history_retention] detach {table} attempt {attempt} failed: {e}")
+            await asyncio.sleep(attempt)
+
+
+async def export_partition(table: str) -> Path:
+    """
+    Выгружает отключённую партицию в HISTORY_ARCHIVE_DIR (по строке JSON на
+    запись, с полным ответом). Файл появляется под итоговым именем только
+    целиком записанным, поэтому его наличие — признак готовой выгрузки.
+    """
+    path = _archive_path(table)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+
+    stmt = text(
+        "SELECT h.id, h.user_id, h.type, h.question, h.answer_short, h.answer_full, "
+        "h.created_at, a.codec, a.data "
+        f"FROM {table} h LEFT JOIN history_answers a ON a.history_id = h.id "
+        "ORDER BY h.id"
+    )
+    exported = 0
+    async with engine.connect() as conn:
+        expected = await conn.scalar(text(f"SELECT count(*) FROM {table}"))
+        result = await conn.stream(stmt)
+        with _open_archive(tmp) as out:
+            async for rows in result.partitions(HISTORY_ARCHIVE_FETCH):
+                lines = []
+                for row in rows:
+                    answer = (
+                        unpack_answer(row.codec, row.data)
+                        if row.codec is not None
+                        else row.answer_full
+                    )
+                    lines.append(
+                        json.dumps(
+                            {
+                                "id": row.id,
+                                "user_id": row.user_id,
+                                "type": row.type,
+                                "question": row.question,
+                                "answer_short": row.answer_short,
+                                "answer_full": answer,
+                                "created_at": row.created_at.isoformat(),
+                            },
+                            ensure_ascii=False,
+                        )
+                    )
+                out.write(("\n".join(lines) + "\n").encode("utf-8"))
+                exported += len(rows)
+
+    if exported != expected:
+        tmp.unlink(missing_ok=True)
+        raise RuntimeError(f"{table}: exported {exported} rows of {expected}")
+    os.replace(tmp, path)
+    return path
+
+
+async def drop_partition(table: str, path: Path) -> int:
+    """
+    Удаляет ответы записей партиции пачками, затем саму таблицу,
+    отмечая в history_archives файл выгрузки path.
+    """
+    delete = text(
+        "DELETE FROM history_answers WHERE history_id IN ("
+        f"SELECT id FROM {table} WHERE id > :last ORDER BY id LIMIT :batch"
+        ")"
+    )
+    last, deleted = -1, 0
+    while True:
+        async with engine.begin() as conn:
+            bound = await conn.scalar(
+                text(
+                    f"SELECT max(id) FROM (SELECT id FROM {table} "
+                    "WHERE id > :last ORDER BY id LIMIT :batch) AS ids"
+                ),
+                {"last": last, "batch": HISTORY_ANSWERS_DELETE_BATCH},
+            )
+            if bound is None:
+                break
+            result = await conn.execute(
+                delete, {"last": last, "batch": HISTORY_ANSWERS_DELETE_BATCH}
+            )
+            deleted += result.rowcount
+        last = bound
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {table}"))
+        await conn.execute(
+            text(
+                "UPDATE history_archives SET archived_at = now(), archive_file = :file "
+                "WHERE table_name = :table"
+            ),
+            {"file": str(path), "table": table},
+        )
+    return deleted
+
+
+async def run_history_retention(dry_run: bool = False) -> Dict[str, Any]:
+    """
+    Один проход ретеншна: партиции на ближайшие месяцы, затем архивирование
+    и удаление всех партиций старше history_cutoff(). Безопасно повторяется
+    после сбоя на любом шаге. С dry_run ничего не меняет: в created — партиции,
+    которые были бы созданы, в expired — которые были бы архивированы.
+    """
+    cutoff = history_cutoff()
+    summary: Dict[str, Any] = {"cutoff": cutoff.isoformat(), "created": [], "archived": []}
+
+    if dry_run:
+        async with engine.connect() as conn:
+            summary["created"] = await ensure_history_partitions(conn, dry_run=True)
+            summary["expired"] = await _expired_tables(conn, cutoff) + await _detached_tables(conn)
+            await conn.rollback()
+        return summary
+
+    # тот же lock, что у миграций: DDL на history не пересекается
+    async with migration_lock() as lock_conn:
+        async with engine.begin() as conn:
+            summary["created"] = await ensure_history_partitions(conn)
+            expired = await _expired_tables(conn, cutoff)
+
+        for table in expired:
+            await _detach(table)
+
+        for table in await _detached_tables(lock_conn):
+            path = await export_partition(table)
+            answers = await drop_partition(table, path)
+            summary["archived"].append(
+                {"table": table, "file": str(path), "answers_deleted": answers}
+            )
+
+    return summary
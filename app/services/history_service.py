@@ -1,13 +1,18 @@
 # app/services/history_service.py
 
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import base64
+import json
+from typing import Dict, Any, Optional, Tuple
+from datetime import datetime, timezone as dt_timezone
 
-from sqlalchemy import select
-from sqlalchemy.orm import InstrumentedAttribute
+from sqlalchemy import Select, select, tuple_
 
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import History
+from app.db.postgres import session_scope
+from app.db.models import History, HistoryAnswer
+from app.db.history_partitions import history_cutoff
+from app.services.history_answers_service import store_answer, unpack_answer
+from app.services.user_stats_service import bump_user_stats
+from app.services.profile_cache import invalidate_user_profile
 
 
 async def log_event(
@@ -18,85 +23,159 @@ async def log_event(
     meta_json: Optional[Dict] = None,  # пока не используем, для совместимости
 ) -> int:
     """Записывает событие в историю."""
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         answer_short = (
             answer_full[:100] + "..." if len(answer_full) > 100 else answer_full
         )
 
+        created_at = datetime.now(dt_timezone.utc)
         item = History(
             user_id=user_id,
             type=event_type,
             question=question,
-            answer_full=answer_full,
             answer_short=answer_short,
-            created_at=datetime.utcnow().isoformat(),
+            created_at=created_at,
         )
         session.add(item)
-        await session.commit()
-        await session.refresh(item)
+        await session.flush()
+
+        # полный ответ — сжатым в history_answers, в history только превью
+        await store_answer(item.id, answer_full, created_at)
+
+        await bump_user_stats(user_id, requests_total=1)
+        invalidate_user_profile(user_id)
         return item.id
 
 
-async def list_history(user_id: int, limit: int = 20, offset: int = 0) -> List[Dict[str, Any]]:
-    """Возвращает список событий истории."""
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(
-                History.id,
-                History.type,
-                History.question,
-                History.answer_short,
-                History.created_at,
-            )
-            .where(History.user_id == user_id)
-            .order_by(History.created_at.desc())
-            .limit(limit)
-            .offset(offset)
+class InvalidHistoryCursor(ValueError):
+    """Курсор ленты истории не разбирается (подделан или от другой версии)."""
+
+
+def encode_history_cursor(created_at: datetime, event_id: int) -> str:
+    """Непрозрачный курсор на позицию (created_at, id) в ленте истории."""
+    raw = json.dumps([created_at.isoformat(), event_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_history_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Разбирает курсор; InvalidHistoryCursor, если он битый."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, event_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(event_id)
+    except (ValueError, TypeError) as e:
+        raise InvalidHistoryCursor("Invalid history cursor") from e
+
+
+def history_page_stmt(
+    user_id: int,
+    limit: int,
+    after: Optional[Tuple[datetime, int]] = None,
+    offset: int = 0,
+) -> Select:
+    """Запрос страницы ленты: limit + 1 строк после позиции after (created_at, id)."""
+    stmt = (
+        select(
+            History.id,
+            History.type,
+            History.question,
+            History.answer_short,
+            History.created_at,
         )
-        result = await session.execute(stmt)
-        rows = result.all()
+        .where(
+            History.user_id == user_id,
+            History.created_at >= history_cutoff(),
+        )
+        .order_by(History.created_at.desc(), History.id.desc())
+        # лишняя строка — признак того, что есть следующая страница
+        .limit(limit + 1)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(History.created_at, History.id) < tuple_(*after))
+    elif offset:
+        stmt = stmt.offset(offset)
+    return stmt
 
-    return [
-        {
-            "id": row.id,
-            "type": row.type,
-            "title": row.question or "Запрос",
-            "preview": row.answer_short or "",
-            "created_at": row.created_at,
-        }
-        for row in rows
-    ]
+
+def history_detail_stmt(user_id: int, event_id: int) -> Select:
+    """Запрос карточки записи вместе со сжатым полным ответом."""
+    return (
+        select(
+            History.id,
+            History.type,
+            History.question,
+            History.answer_full,
+            History.created_at,
+            HistoryAnswer.codec,
+            HistoryAnswer.data,
+        )
+        .outerjoin(HistoryAnswer, HistoryAnswer.history_id == History.id)
+        .where(
+            History.id == event_id,
+            History.user_id == user_id,
+            # без границы поиск по id прошёл бы по индексам всех партиций
+            History.created_at >= history_cutoff(),
+        )
+    )
+
+
+async def list_history(
+    user_id: int,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+) -> Dict[str, Any]:
+    """
+    Страница ленты истории, новые сверху. Пагинация по ключу (created_at, id):
+    страница идёт по индексу от курсора, а не пропускает OFFSET строк, и
+    новые события не сдвигают уже отданные. next_cursor — None на последней.
+    Нижняя граница created_at отсекает партиции старше срока хранения.
+    offset — устаревшая пагинация старых клиентов (на один релиз),
+    учитывается только без cursor.
+    """
+    after = decode_history_cursor(cursor) if cursor else None
+    stmt = history_page_stmt(user_id, limit, after=after, offset=offset)
+
+    async with session_scope() as session:
+        rows = (await session.execute(stmt)).all()
+
+    page = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = page[-1]
+        next_cursor = encode_history_cursor(last.created_at, last.id)
+
+    return {
+        "items": [
+            {
+                "id": row.id,
+                "type": row.type,
+                "title": row.question or "Запрос",
+                "preview": row.answer_short or "",
+                "created_at": row.created_at.isoformat(),
+            }
+            for row in page
+        ],
+        "next_cursor": next_cursor,
+    }
 
 
 async def get_history_detail(user_id: int, event_id: int) -> Optional[Dict[str, Any]]:
     """Возвращает полную запись истории."""
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(
-                History.id,
-                History.type,
-                History.question,
-                History.answer_full,
-                History.created_at,
-            )
-            .where(
-                History.id == event_id,
-                History.user_id == user_id,
-            )
-        )
-        result = await session.execute(stmt)
-        row = result.first()
+    async with session_scope() as session:
+        row = (await session.execute(history_detail_stmt(user_id, event_id))).first()
 
     if not row:
         return None
 
-    row = row[0] if isinstance(row, tuple) else row  # на всякий случай
-
+    # ещё не перенесённые мигратором записи хранят ответ в самой history
+    answer_full = (
+        unpack_answer(row.codec, row.data) if row.codec is not None else row.answer_full
+    )
     return {
         "id": row.id,
         "type": row.type,
-        "created_at": row.created_at,
+        "created_at": row.created_at.isoformat(),
         "question": row.question,
-        "answer_full": row.answer_full,
-        "full_text": row.answer_full,
+        "answer_full": answer_full,
     }
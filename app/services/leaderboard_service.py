@@ -0,0 +1,143 @@
+# app/services/leaderboard_service.py
+
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import aliased
+
+from app.db.postgres import after_commit, session_scope
+from app.db.models import User, UserXP
+
+
+# === РЕЙТИНГ ПО XP ===
+# Топ держится в памяти: полная перезагрузка раз в LEADERBOARD_REFRESH_INTERVAL,
+# между ними — точечные правки из add_user_xp (note_xp_change).
+# Все запросы идут по индексу ix_user_xp_xp (xp, user_id).
+LEADERBOARD_SIZE = 100
+LEADERBOARD_REFRESH_INTERVAL = 300  # сек
+
+# [{user_id, name, xp}] по убыванию XP
+_top: List[Dict[str, Any]] = []
+_loaded_at: Optional[float] = None
+
+
+def _display_name(first_name: Optional[str], username: Optional[str]) -> str:
+    return first_name or username or "Участница"
+
+
+def _sort_and_trim() -> None:
+    _top.sort(key=lambda e: (-e["xp"], -e["user_id"]))
+    del _top[LEADERBOARD_SIZE:]
+
+
+def leaderboard_top_stmt(limit: int = LEADERBOARD_SIZE) -> Select:
+    """Топ по XP обходом индекса ix_user_xp_xp с конца."""
+    return (
+        select(UserXP.user_id, UserXP.xp, User.first_name, User.username)
+        .join(User, User.user_id == UserXP.user_id)
+        .order_by(UserXP.xp.desc(), UserXP.user_id.desc())
+        .limit(limit)
+    )
+
+
+def my_rank_stmt(user_id: int) -> Select:
+    """(XP пользователя, число пользователей с большим XP) одним запросом."""
+    other = aliased(UserXP)
+    my_xp = (
+        select(UserXP.xp)
+        .where(UserXP.user_id == user_id)
+        .scalar_subquery()
+    )
+    xp_value = func.coalesce(my_xp, 0)
+    higher = (
+        select(func.count())
+        .select_from(other)
+        .where(other.xp > xp_value)
+        .scalar_subquery()
+    )
+    return select(xp_value, higher)
+
+
+async def _reload_top() -> None:
+    global _loaded_at
+
+    async with session_scope() as session:
+        rows = (await session.execute(leaderboard_top_stmt())).all()
+
+    _top[:] = [
+        {
+            "user_id": user_id,
+            "name": _display_name(first_name, username),
+            "xp": int(xp or 0),
+        }
+        for user_id, xp, first_name, username in rows
+    ]
+    _loaded_at = time.monotonic()
+
+
+async def _fill_missing_names() -> None:
+    """Имена для тех, кто попал в топ точечной правкой."""
+    missing = [e["user_id"] for e in _top if e["name"] is None]
+    if not missing:
+        return
+
+    async with session_scope() as session:
+        stmt = select(User.user_id, User.first_name, User.username).where(
+            User.user_id.in_(missing)
+        )
+        names = {
+            user_id: _display_name(first_name, username)
+            for user_id, first_name, username in (await session.execute(stmt)).all()
+        }
+
+    for e in _top:
+        if e["name"] is None:
+            e["name"] = names.get(e["user_id"], _display_name(None, None))
+
+
+def note_xp_change(user_id: int, xp: int) -> None:
+    """
+    Точечно обновляет закэшированный топ после commit начисления XP.
+    Пользователь вне топа попадает в него, только если обогнал последнего.
+    """
+
+    def _apply() -> None:
+        if _loaded_at is None:
+            return
+
+        for e in _top:
+            if e["user_id"] == user_id:
+                e["xp"] = xp
+                _sort_and_trim()
+                return
+
+        if len(_top) < LEADERBOARD_SIZE or xp > _top[-1]["xp"]:
+            _top.append({"user_id": user_id, "name": None, "xp": xp})
+            _sort_and_trim()
+
+    after_commit(_apply)
+
+
+async def get_top(limit: int = LEADERBOARD_SIZE) -> List[Dict[str, Any]]:
+    """Топ пользователей по XP (из кэша, при необходимости перезагружается)."""
+    if _loaded_at is None or time.monotonic() - _loaded_at > LEADERBOARD_REFRESH_INTERVAL:
+        await _reload_top()
+    else:
+        await _fill_missing_names()
+
+    return [
+        {"rank": i, **e}
+        for i, e in enumerate(_top[:limit], start=1)
+    ]
+
+
+async def get_my_rank(user_id: int) -> Dict[str, Any]:
+    """
+    Место пользователя: 1 + число пользователей с большим XP.
+    Один запрос; подсчёт идёт по индексу по xp.
+    """
+    async with session_scope() as session:
+        xp, higher_cnt = (await session.execute(my_rank_stmt(user_id))).one()
+
+    return {"rank": int(higher_cnt or 0) + 1, "xp": int(xp or 0)}
@@ -0,0 +1,72 @@
+# app/services/levels_service.py
+
+from bisect import bisect_right
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, Mapping, NamedTuple, Optional, Tuple
+
+from sqlalchemy import select
+
+from core.config import LEVELS
+from app.db.postgres import session_scope
+from app.db.models import Level
+
+
+class LevelIndex(NamedTuple):
+    """Неизменяемая таблица уровней: уровни и их пороги min_xp по возрастанию."""
+
+    levels: Tuple[Mapping[str, Any], ...]
+    min_xp: Tuple[int, ...]
+
+
+def _build_index(levels: Iterable[Dict[str, Any]]) -> LevelIndex:
+    ordered = sorted(levels, key=lambda lvl: lvl["min_xp"])
+    return LevelIndex(
+        levels=tuple(MappingProxyType(dict(lvl)) for lvl in ordered),
+        min_xp=tuple(lvl["min_xp"] for lvl in ordered),
+    )
+
+
+# до load_levels() работаем по core.config.LEVELS (бот, скрипты)
+_index: LevelIndex = _build_index(LEVELS)
+
+
+async def load_levels() -> LevelIndex:
+    """
+    Один раз читает таблицу levels и подменяет индекс уровней.
+    Пустая таблица — остаёмся на core.config.LEVELS.
+    """
+    global _index
+
+    async with session_scope() as session:
+        stmt = select(
+            Level.code,
+            Level.title,
+            Level.min_xp,
+            Level.max_xp,
+        ).order_by(Level.min_xp)
+        rows = (await session.execute(stmt)).mappings().all()
+
+    if rows:
+        _index = _build_index(rows)
+    return _index
+
+
+def resolve_level(xp: int) -> Tuple[Mapping[str, Any], Optional[Mapping[str, Any]]]:
+    """Возвращает (текущий уровень, следующий уровень или None) для XP."""
+    index = _index
+    i = max(bisect_right(index.min_xp, xp) - 1, 0)
+    next_level = index.levels[i + 1] if i + 1 < len(index.levels) else None
+    return index.levels[i], next_level
+
+
+def levels_crossed(old_xp: int, new_xp: int) -> Tuple[Mapping[str, Any], ...]:
+    """Уровни, пороги которых пройдены при росте XP с old_xp до new_xp."""
+    index = _index
+    lo = bisect_right(index.min_xp, old_xp)
+    hi = bisect_right(index.min_xp, new_xp)
+    return index.levels[lo:hi]
+
+
+def level_number(level: Mapping[str, Any]) -> int:
+    """Номер уровня по порядку порогов, с 1."""
+    return bisect_right(_index.min_xp, level["min_xp"])
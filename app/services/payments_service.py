@@ -6,8 +6,8 @@ from datetime import datetime, timezone as dt_timezone
 from app.services.sms_service import preview_sms_purchase
 from app.services.user_service import ensure_user_exists
 from app.services.credits_service import add
-from app.services.tasks_service import increment_task_progress
-from app.db.postgres import AsyncSessionLocal
+from app.services.tasks_service import advance_counters
+from app.db.postgres import session_scope
 from app.db.models import SmsPurchase
 from sqlalchemy import select
 
@@ -20,8 +20,8 @@ async def quote(
 ) -> dict:
     """
     Рассчитывает стоимость покупки.
+    Только расчёт: без записей в БД (пользователь нужен лишь для счёта).
     """
-    await ensure_user_exists(user_id, "Unknown", None)
     preview = await preview_sms_purchase(user_id, messages, promo_code)
 
     return {
@@ -50,8 +50,8 @@ async def create_invoice(
     if int(preview.final_price_rub * 100) != client_confirmed_amount:
         raise ValueError("Amount mismatch")
 
-    async with AsyncSessionLocal() as session:
-        now = datetime.now(dt_timezone.utc).isoformat()
+    async with session_scope() as session:
+        now = datetime.now(dt_timezone.utc)
 
         purchase = SmsPurchase(
             user_id=user_id,
@@ -65,8 +65,7 @@ async def create_invoice(
             paid_at=None,
         )
         session.add(purchase)
-        await session.commit()
-        await session.refresh(purchase)
+        await session.flush()
 
         invoice_id = purchase.id
 
@@ -86,7 +85,7 @@ async def mark_paid(payment_id: int) -> None:
     """
     Помечает платёж как оплаченный и начисляет сообщения.
     """
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = select(SmsPurchase).where(SmsPurchase.id == payment_id)
         result = await session.scalars(stmt)
         purchase = result.first()
@@ -98,20 +97,19 @@ async def mark_paid(payment_id: int) -> None:
         messages = purchase.messages_count
 
         # 1) Начислить купленные сообщения
-        await add(user_id, messages)
+        await add(user_id, messages, reason="purchase", ref=str(payment_id))
 
         # 2) Пометить платёж как оплаченный
         purchase.status = "paid"
-        purchase.paid_at = datetime.now(dt_timezone.utc).isoformat()
-        await session.commit()
-
-    # 3) Двинуть задачи по покупкам
-    # Первая покупка — просто факт
-    await increment_task_progress(user_id, "BUY_0", delta=1)
-
-    # Остальные считают суммарное количество купленных сообщений
-    await increment_task_progress(user_id, "BUY_1", delta=messages)
-    await increment_task_progress(user_id, "BUY_2", delta=messages)
-    await increment_task_progress(user_id, "BUY_3", delta=messages)
-    await increment_task_progress(user_id, "BUY_4", delta=messages)
-    await increment_task_progress(user_id, "BUY_5", delta=messages)
+        purchase.paid_at = datetime.now(dt_timezone.utc)
+
+    # 3) Двинуть счётчики покупок — от них считаются BUY_0..BUY_5
+    await advance_counters(
+        user_id,
+        [
+            # Первая покупка — просто факт
+            ("purchases", 1),
+            # Суммарное количество купленных сообщений
+            ("purchased_messages", messages),
+        ],
+    )
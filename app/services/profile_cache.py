@@ -0,0 +1,105 @@
+# app/services/profile_cache.py
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from app.db.postgres import after_commit, current_session
+from app.services.ttl_cache import TTLCache
+
+
+# === КЭШ СОБРАННОГО ПРОФИЛЯ (/api/me) ===
+# Профиль кэшируется целиком на PROFILE_CACHE_TTL, одновременные промахи
+# по одному пользователю ждут одну загрузку (single-flight).
+# Все записи, влияющие на профиль, вызывают invalidate_user_profile.
+PROFILE_CACHE_SIZE = 20_000
+PROFILE_CACHE_TTL = 30.0  # сек
+
+ProfileLoader = Callable[[int], Awaitable[Optional[Dict[str, Any]]]]
+
+_profile_cache: TTLCache[Dict[str, Any]] = TTLCache(
+    maxsize=PROFILE_CACHE_SIZE,
+    ttl=PROFILE_CACHE_TTL,
+)
+# user_id -> future текущей загрузки
+_loading: Dict[int, "asyncio.Future[Optional[Dict[str, Any]]]"] = {}
+# загрузки, начатые до инвалидации: их результат в кэш не кладём
+_stale_loads: Set[int] = set()
+_counters = {"invalidations": 0, "shared_loads": 0}
+
+
+def _drop(user_id: int) -> None:
+    _profile_cache.pop(user_id)
+    if user_id in _loading:
+        _stale_loads.add(user_id)
+
+
+def _dirty_profiles(session) -> Set[int]:
+    return session.info.setdefault("dirty_profiles", set())
+
+
+def invalidate_user_profile(user_id: int) -> None:
+    """
+    Сбрасывает профиль пользователя из кэша сразу и ещё раз после commit,
+    чтобы не осталось значения, прочитанного до фиксации записи.
+    До commit текущая транзакция читает профиль мимо кэша.
+    """
+    _counters["invalidations"] += 1
+    _drop(user_id)
+
+    session = current_session()
+    if session is not None:
+        _dirty_profiles(session).add(user_id)
+        after_commit(lambda: _drop(user_id))
+
+
+async def cached_user_profile(
+    user_id: int,
+    loader: ProfileLoader,
+) -> Optional[Dict[str, Any]]:
+    """Профиль из кэша; при промахе — одна загрузка на всех ожидающих."""
+    session = current_session()
+    if session is not None and user_id in session.info.get("dirty_profiles", ()):
+        # свои незафиксированные изменения — читаем мимо кэша и не кэшируем
+        return await loader(user_id)
+
+    profile = _profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+
+    pending = _loading.get(user_id)
+    if pending is not None:
+        _counters["shared_loads"] += 1
+        try:
+            return await asyncio.shield(pending)
+        except asyncio.CancelledError:
+            if not pending.cancelled():
+                raise
+            # загрузка у другого запроса упала — грузим сами
+            return await loader(user_id)
+
+    future: "asyncio.Future[Optional[Dict[str, Any]]]" = (
+        asyncio.get_running_loop().create_future()
+    )
+    _loading[user_id] = future
+    try:
+        profile = await loader(user_id)
+    except BaseException:
+        future.cancel()
+        raise
+    else:
+        future.set_result(profile)
+        if profile is not None and user_id not in _stale_loads:
+            _profile_cache.set(user_id, profile)
+        return profile
+    finally:
+        _loading.pop(user_id, None)
+        _stale_loads.discard(user_id)
+
+
+def get_profile_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша профилей (для /api/health)."""
+    return {
+        **_profile_cache.stats(),
+        **_counters,
+        "loading": len(_loading),
+    }
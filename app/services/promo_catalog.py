@@ -0,0 +1,139 @@
+# app/services/promo_catalog.py
+
+import asyncio
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Any, Dict, NamedTuple, Optional
+
+from sqlalchemy import select
+
+from app.db.postgres import AsyncSessionLocal
+from app.db.models import PromoCode
+
+
+# === КАТАЛОГ ПРОМОКОДОВ (только чтение) ===
+# Все активные промокоды лежат в памяти и перечитываются раз в
+# PROMO_CATALOG_REFRESH_INTERVAL. Каталог полный, поэтому отсутствие кода
+# в нём — точный отрицательный ответ: несуществующие коды в БД не ходят.
+PROMO_CATALOG_REFRESH_INTERVAL = 60.0  # сек
+
+
+class CatalogPromo(NamedTuple):
+    discount_percent: int
+    expires_at: datetime
+
+
+# код -> промокод; при обновлении словарь подменяется целиком
+_catalog: Dict[str, CatalogPromo] = {}
+# скидка -> сколько свободных кодов осталось в пуле
+_stock: Dict[int, int] = {}
+_loaded_at: Optional[float] = None
+_refresher_task: Optional[asyncio.Task] = None
+_stats = {"lookups": 0, "found": 0, "rejected": 0, "refreshes": 0}
+
+
+def _as_utc(value: datetime) -> datetime:
+    # expires_at хранится без таймзоны — считаем, что это UTC
+    return value if value.tzinfo else value.replace(tzinfo=dt_timezone.utc)
+
+
+async def refresh_promo_catalog() -> int:
+    """
+    Перечитывает активные промокоды одним запросом. Возвращает их число.
+    Заодно пересчитывает остатки свободных кодов по скидкам.
+    """
+    global _catalog, _stock, _loaded_at
+
+    stmt = select(
+        PromoCode.code,
+        PromoCode.discount_percent,
+        PromoCode.expires_at,
+        PromoCode.allocated_to,
+    ).where(
+        PromoCode.is_active.is_(True),
+        PromoCode.expires_at > datetime.now(dt_timezone.utc),
+    )
+    # отдельная сессия: обновление не должно зависеть от транзакции запроса
+    async with AsyncSessionLocal() as session:
+        rows = (await session.execute(stmt)).all()
+
+    _catalog = {
+        code: CatalogPromo(discount_percent, _as_utc(expires_at))
+        for code, discount_percent, expires_at, _ in rows
+    }
+    stock: Dict[int, int] = {}
+    for _, discount_percent, _, allocated_to in rows:
+        if allocated_to is None:
+            stock[discount_percent] = stock.get(discount_percent, 0) + 1
+    _stock = stock
+    _loaded_at = time.monotonic()
+    _stats["refreshes"] += 1
+    return len(_catalog)
+
+
+async def find_promo(code: str) -> Optional[CatalogPromo]:
+    """
+    Действующий промокод по коду или None — без запросов в БД, пока каталог
+    свежий. В API его обновляет фоновая задача; в боте и скриптах её нет,
+    там каталог перечитывается здесь, если старше PROMO_CATALOG_REFRESH_INTERVAL.
+    """
+    if _loaded_at is None or time.monotonic() - _loaded_at > PROMO_CATALOG_REFRESH_INTERVAL:
+        await refresh_promo_catalog()
+
+    _stats["lookups"] += 1
+    promo = _catalog.get(code)
+    if promo is None or promo.expires_at <= datetime.now(dt_timezone.utc):
+        _stats["rejected"] += 1
+        return None
+
+    _stats["found"] += 1
+    return promo
+
+
+def note_promo_allocated(discount_percent: int) -> None:
+    """Уменьшает остаток пула после выдачи кода (до следующего обновления)."""
+    if _stock.get(discount_percent, 0) > 0:
+        _stock[discount_percent] -= 1
+
+
+def get_promo_stock() -> Dict[int, int]:
+    """Свободные коды по скидкам (по последнему обновлению каталога)."""
+    return dict(_stock)
+
+
+async def _refresh_loop() -> None:
+    while True:
+        await asyncio.sleep(PROMO_CATALOG_REFRESH_INTERVAL)
+        try:
+            await refresh_promo_catalog()
+        except Exception as e:
+            print(f"❌ [promo_catalog] refresh failed: {e}")
+
+
+async def start_promo_catalog() -> None:
+    """Загружает каталог и запускает фоновое обновление (на старте API)."""
+    global _refresher_task
+    await refresh_promo_catalog()
+    if _refresher_task is None or _refresher_task.done():
+        _refresher_task = asyncio.create_task(_refresh_loop())
+
+
+async def stop_promo_catalog() -> None:
+    global _refresher_task
+    if _refresher_task is not None:
+        _refresher_task.cancel()
+        try:
+            await _refresher_task
+        except asyncio.CancelledError:
+            pass
+        _refresher_task = None
+
+
+def get_promo_catalog_stats() -> Dict[str, Any]:
+    """Размер и счётчики каталога промокодов (для /api/health)."""
+    return {
+        "size": len(_catalog),
+        "age": round(time.monotonic() - _loaded_at, 1) if _loaded_at is not None else None,
+        "stock": get_promo_stock(),
+        **_stats,
+    }
@@ -2,6 +2,12 @@
 
 from typing import Optional, Dict, List
 
+from sqlalchemy import Update, func, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.postgres import after_commit, session_scope
+from app.db.models import PromoCode, UserPromocode
+from app.services.promo_catalog import note_promo_allocated
 from app.promo_pools.promo_pool_5 import PROMO_CODES as POOL_5
 from app.promo_pools.promo_pool_10 import PROMO_CODES as POOL_10
 from app.promo_pools.promo_pool_15 import PROMO_CODES as POOL_15
@@ -9,6 +15,7 @@ from app.promo_pools.promo_pool_20 import PROMO_CODES as POOL_20
 from app.promo_pools.promo_pool_25 import PROMO_CODES as POOL_25
 from app.promo_pools.promo_pool_30 import PROMO_CODES as POOL_30
 
+# стартовое наполнение пулов (см. import_promo_pools)
 _POOL_MAP: Dict[int, List[str]] = {
     5: POOL_5,
     10: POOL_10,
@@ -18,12 +25,91 @@ _POOL_MAP: Dict[int, List[str]] = {
     30: POOL_30,
 }
 
-def get_promo_from_pool(discount_percent: int) -> Optional[str]:
+
+def promo_pool_pop_stmt(discount_percent: int, user_id: int) -> Update:
+    """
+    Один запрос: подзапрос берёт первый свободный код по частичному индексу
+    с FOR UPDATE SKIP LOCKED, так что параллельные выдачи не берут один код
+    и не ждут друг друга.
+    """
+    candidate = (
+        select(PromoCode.code)
+        .where(
+            PromoCode.discount_percent == discount_percent,
+            PromoCode.allocated_to.is_(None),
+            # ровно как в условии ix_promo_codes_unallocated
+            PromoCode.is_active,
+            PromoCode.expires_at > func.now(),
+        )
+        .order_by(PromoCode.code)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    return (
+        update(PromoCode)
+        .where(
+            PromoCode.code == candidate,
+            PromoCode.allocated_to.is_(None),
+        )
+        .values(allocated_to=user_id, allocated_at=func.now())
+        .returning(PromoCode.code)
+    )
+
+
+async def get_promo_from_pool(discount_percent: int, user_id: int) -> Optional[str]:
     """
-    Возвращает один промокод из пула для указанной скидки.
-    Пока просто берём первый код из списка.
+    Выдаёт пользователю свободный промокод нужной скидки из promo_codes
+    (см. promo_pool_pop_stmt). None — коды этой скидки закончились.
     """
-    pool = _POOL_MAP.get(discount_percent)
-    if not pool:
-        return None
-    return pool[0] if pool else None
+    async with session_scope() as session:
+        stmt = promo_pool_pop_stmt(discount_percent, user_id)
+        code = (await session.execute(stmt)).scalar_one_or_none()
+
+    if code is not None:
+        after_commit(lambda: note_promo_allocated(discount_percent))
+    return code
+
+
+async def import_promo_pools() -> int:
+    """
+    Заливает коды из app/promo_pools в promo_codes (существующие не трогает)
+    и помечает выданными коды, которые уже есть в user_promocodes.
+    Возвращает число новых кодов.
+    """
+    rows = [
+        {"code": code, "discount_percent": discount, "is_active": True}
+        for discount, codes in _POOL_MAP.items()
+        for code in codes
+    ]
+
+    first_owner = (
+        select(
+            UserPromocode.code,
+            func.min(UserPromocode.user_id).label("user_id"),
+        )
+        .group_by(UserPromocode.code)
+        .subquery()
+    )
+
+    async with session_scope() as session:
+        inserted = 0
+        if rows:
+            stmt = (
+                pg_insert(PromoCode)
+                .values(rows)
+                .on_conflict_do_nothing(index_elements=[PromoCode.code])
+                .returning(PromoCode.code)
+            )
+            inserted = len((await session.execute(stmt)).all())
+
+        await session.execute(
+            update(PromoCode)
+            .where(
+                PromoCode.code == first_owner.c.code,
+                PromoCode.allocated_to.is_(None),
+            )
+            .values(allocated_to=first_owner.c.user_id, allocated_at=func.now())
+        )
+
+    return inserted
@@ -3,68 +3,37 @@
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timezone as dt_timezone
 
-from sqlalchemy import select
+from sqlalchemy import Select, func, select
 from sqlalchemy.dialects.postgresql import insert as pg_insert
-from sqlalchemy import func
 
-from app.db.postgres import AsyncSessionLocal
+from app.db.postgres import session_scope
 from app.db.models import PromoCode, UserPromocode
 
 
-async def take_promocode_from_pool(discount_percent: int) -> Optional[str]:
-    """
-    Берёт первый доступный (не выданный) промокод со скидкой `discount_percent`.
-    """
-    async with AsyncSessionLocal() as session:
-        # промокоды нужной скидки, активные и не истёкшие
-        base_stmt = (
-            select(PromoCode.code)
-            .where(
-                PromoCode.discount_percent == discount_percent,
-                PromoCode.is_active.is_(True),
-                PromoCode.expires_at > datetime.now(dt_timezone.utc),
-            )
-            .order_by(PromoCode.code)
+def user_promocodes_stmt(user_id: int) -> Select:
+    """Действующие промокоды пользователя, последние выданные сверху."""
+    return (
+        select(
+            PromoCode.code,
+            PromoCode.discount_percent,
+            PromoCode.expires_at,
         )
-
-        result = await session.execute(base_stmt)
-        codes = [row[0] for row in result.all()]
-        if not codes:
-            return None
-
-        # найдём первый код, который ещё не встречается в user_promocodes
-        for code in codes:
-            stmt_used = select(func.count()).select_from(UserPromocode).where(
-                UserPromocode.code == code
-            )
-            used_count = (await session.execute(stmt_used)).scalar_one()
-            if used_count == 0:
-                return code
-
-        return None
+        .join(UserPromocode, UserPromocode.code == PromoCode.code)
+        .where(
+            UserPromocode.user_id == user_id,
+            PromoCode.is_active.is_(True),
+            PromoCode.expires_at > func.now(),
+        )
+        .order_by(UserPromocode.assigned_at.desc())
+    )
 
 
 async def get_promocodes_for_user(user_id: int) -> List[Dict[str, Any]]:
     """
     Возвращает список промокодов пользователя в формате для фронта.
     """
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(
-                PromoCode.code,
-                PromoCode.discount_percent,
-                PromoCode.expires_at,
-            )
-            .join(UserPromocode, UserPromocode.code == PromoCode.code)
-            .where(
-                UserPromocode.user_id == user_id,
-                PromoCode.is_active.is_(True),
-                PromoCode.expires_at > datetime.now(dt_timezone.utc),
-            )
-            .order_by(UserPromocode.assigned_at.desc())
-        )
-        result = await session.execute(stmt)
-        rows = result.all()
+    async with session_scope() as session:
+        rows = (await session.execute(user_promocodes_stmt(user_id))).all()
 
     return [
         {
@@ -82,9 +51,9 @@ async def assign_promocode(user_id: int, code: str, source: str) -> None:
     """
     Выдаёт промокод пользователю (idempotent, как INSERT OR IGNORE).
     """
-    now = datetime.now(dt_timezone.utc).isoformat()
+    now = datetime.now(dt_timezone.utc)
 
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = pg_insert(UserPromocode).values(
             user_id=user_id,
             code=code,
@@ -95,4 +64,3 @@ async def assign_promocode(user_id: int, code: str, source: str) -> None:
         )
 
         await session.execute(stmt)
-        await session.commit()
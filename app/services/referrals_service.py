@@ -2,11 +2,13 @@
 
 from typing import Dict, Any, List, Optional
 
-from sqlalchemy import select
+from sqlalchemy import Select, select
 
-from app.db.postgres import AsyncSessionLocal
+from app.db.postgres import session_scope
 from app.db.models import User
-from app.services.tasks_service import increment_task_progress
+from app.services.tasks_service import apply_task_events
+from app.services.user_stats_service import bump_user_stats
+from app.services.profile_cache import invalidate_user_profile
 
 
 # === НАСТРОЙКА: замени на имя твоего бота ===
@@ -23,7 +25,7 @@ def generate_ref_code() -> str:
 
 async def get_or_create_ref_code(user_id: int) -> str:
     """Получает или создаёт реферальный код для пользователя."""
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = select(User).where(User.user_id == user_id)
         result = await session.scalars(stmt)
         user = result.first()
@@ -36,23 +38,25 @@ async def get_or_create_ref_code(user_id: int) -> str:
 
         ref_code = generate_ref_code()
         user.ref_code = ref_code
-        await session.commit()
         return ref_code
 
 
+def referral_friends_stmt(user_id: int) -> Select:
+    """Приглашённые пользователем, новые сверху."""
+    return (
+        select(User.first_name, User.username, User.created_at)
+        .where(User.referrer_id == user_id)
+        .order_by(User.created_at.desc())
+    )
+
+
 async def get_referrals_info(user_id: int) -> Dict[str, Any]:
     """Возвращает данные для /api/referrals/info по фронтовому контракту."""
     ref_code = await get_or_create_ref_code(user_id)
     referral_link = f"https://t.me/{BOT_USERNAME}?start={ref_code}"
 
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            select(User.first_name, User.username, User.created_at)
-            .where(User.referrer_id == user_id)
-            .order_by(User.created_at.desc())
-        )
-        result = await session.execute(stmt)
-        rows = result.all()
+    async with session_scope() as session:
+        rows = (await session.execute(referral_friends_stmt(user_id))).all()
 
     friends: List[Dict[str, Any]] = []
     for first_name, username, created_at in rows:
@@ -60,7 +64,7 @@ async def get_referrals_info(user_id: int) -> Dict[str, Any]:
         friends.append(
             {
                 "name": name,
-                "joined_at": created_at,
+                "joined_at": created_at.isoformat(),
                 "bonus_credits": 0,
                 "status": "joined",
             }
@@ -80,7 +84,7 @@ async def apply_referral_code(current_user_id: int, ref_code: str) -> Optional[i
     if not ref_code:
         return None
 
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         # находим реферера по коду
         stmt = select(User).where(User.ref_code == ref_code)
         result = await session.scalars(stmt)
@@ -107,13 +111,13 @@ async def apply_referral_code(current_user_id: int, ref_code: str) -> Optional[i
 
         if not user.referrer_id:
             user.referrer_id = referrer.user_id
-            await session.commit()
+            await bump_user_stats(referrer.user_id, friends_invited=1)
+            invalidate_user_profile(referrer.user_id)
 
     # после успешной (или уже существующей) привязки — двигаем задания реферера
-    await increment_task_progress(referrer.user_id, "REF_1")
-    await increment_task_progress(referrer.user_id, "REF_2")
-    await increment_task_progress(referrer.user_id, "REF_3")
-    await increment_task_progress(referrer.user_id, "REF_4")
-    await increment_task_progress(referrer.user_id, "REF_5")
+    await apply_task_events(
+        referrer.user_id,
+        [("REF_1", 1), ("REF_2", 1), ("REF_3", 1), ("REF_4", 1), ("REF_5", 1)],
+    )
 
     return referrer.user_id
@@ -1,19 +1,18 @@
 # app/services/request_track_service.py
 
-from app.services.tasks_service import increment_task_progress
+from app.services.task_events_service import submit_task_events
 
 
 async def track_user_request(user_id: int, request_type: str) -> None:
     """
     Общая точка учёта любого запроса к ИИ.
-    Двигает ежедневные и долгосрочные задачи.
+    Ставит в очередь ежедневную задачу и счётчик запросов, от которого
+    считаются USE_*; награды выдаются фоновыми воркерами.
     """
-    # ежедневный запрос
-    await increment_task_progress(user_id, "D_REQ_DAILY")
-
-    # долгосрочное использование (кол-во запросов за всё время)
-    await increment_task_progress(user_id, "USE_1")
-    await increment_task_progress(user_id, "USE_2")
-    await increment_task_progress(user_id, "USE_3")
-    await increment_task_progress(user_id, "USE_4")
-    await increment_task_progress(user_id, "USE_5")
+    await submit_task_events(
+        user_id,
+        # ежедневный запрос
+        events=[("D_REQ_DAILY", 1)],
+        # долгосрочное использование (кол-во запросов за всё время)
+        counters=[("requests", 1)],
+    )
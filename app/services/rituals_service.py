@@ -4,7 +4,7 @@ from typing import Dict, Any, Optional
 
 from sqlalchemy import select
 
-from app.db.postgres import AsyncSessionLocal
+from app.db.postgres import session_scope
 from app.db.models import DailyTipSettings
 from app.db.daily_tip import upsert_daily_tip_settings_db
 
@@ -13,7 +13,7 @@ async def get_daily_tip_settings(user_id: int) -> Dict[str, Any]:
     """
     Возвращает настройки ежедневного совета для пользователя из Postgres.
     """
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = select(DailyTipSettings).where(DailyTipSettings.user_id == user_id)
         result = await session.scalars(stmt)
         row = result.first()
@@ -24,7 +24,7 @@ async def get_daily_tip_settings(user_id: int) -> Dict[str, Any]:
             "time_from": row.time_from,
             "time_to": row.time_to,
             "timezone": row.timezone,
-            "updated_at": row.updated_at,
+            "updated_at": row.updated_at.isoformat(),
         }
     else:
         return {
@@ -1,12 +1,18 @@
 # app/services/sms_service.py
 
-from typing import NamedTuple, Optional
-from datetime import datetime, timezone as dt_timezone
+from typing import Dict, NamedTuple, Optional
 
-from sqlalchemy import select
+from app.services.promo_catalog import find_promo
 
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import PromoCode
+
+# пакет сообщений -> цена, руб
+PRICES: Dict[int, int] = {
+    100: 290,
+    200: 490,
+    300: 690,
+    500: 990,
+    1000: 1490,
+}
 
 
 class PreviewResult(NamedTuple):
@@ -24,15 +30,8 @@ async def preview_sms_purchase(
 ) -> PreviewResult:
     """
     Рассчитывает стоимость покупки сообщений.
+    Промокод проверяется по каталогу в памяти — в БД расчёт не ходит.
     """
-    PRICES = {
-        100: 290,
-        200: 490,
-        300: 690,
-        500: 990,
-        1000: 1490,
-    }
-
     base_price = PRICES.get(messages)
     if not base_price:
         return PreviewResult(
@@ -48,22 +47,9 @@ async def preview_sms_purchase(
     promocode: Optional[str] = None
 
     if promo_code:
-        async with AsyncSessionLocal() as session:
-            now = datetime.now(dt_timezone.utc)
-            stmt = (
-                select(PromoCode.discount_percent)
-                .where(
-                    PromoCode.code == promo_code,
-                    PromoCode.is_active.is_(True),
-                    PromoCode.expires_at > now,
-                )
-                .limit(1)
-            )
-            result = await session.execute(stmt)
-            row = result.first()
-
-        if row:
-            discount_percent = row[0]
+        promo = await find_promo(promo_code)
+        if promo:
+            discount_percent = promo.discount_percent
             promocode = promo_code
             final_price = int(base_price * (100 - discount_percent) / 100)
 
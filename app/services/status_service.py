@@ -2,8 +2,8 @@
 
 from typing import Dict, Any
 
-from app.services.user_service import get_user_profile
-from core.config import LEVELS
+from app.services.user_balance_service import get_user_xp
+from app.services.levels_service import resolve_level
 
 
 async def get_status(user_id: int) -> Dict[str, Any]:
@@ -15,31 +15,16 @@ async def get_status(user_id: int) -> Dict[str, Any]:
     - текущий XP
     - следующий уровень
     - осталось до следующего уровня
+    XP читается одним поиском по user_xp, без сборки профиля.
     """
-    profile = await get_user_profile(user_id)
-    if not profile:
-        # пользователь ещё не создан, считаем базовые значения
-        xp = 0
-    else:
-        xp = profile.get("xp", 0)
+    # пользователя без строки user_xp считаем с базовыми значениями
+    xp = await get_user_xp(user_id)
+    return status_for_xp(xp)
 
-    current_level = LEVELS[0]
-    for lvl in LEVELS:
-        min_xp = lvl["min_xp"]
-        max_xp = lvl["max_xp"]
-        if max_xp is None:
-            if xp >= min_xp:
-                current_level = lvl
-            break
-        if min_xp <= xp <= max_xp:
-            current_level = lvl
-            break
 
-    next_level = None
-    for i, lvl in enumerate(LEVELS):
-        if lvl["code"] == current_level["code"] and i < len(LEVELS) - 1:
-            next_level = LEVELS[i + 1]
-            break
+def status_for_xp(xp: int) -> Dict[str, Any]:
+    """Статус по готовому значению XP (без запросов в БД)."""
+    current_level, next_level = resolve_level(xp)
 
     remaining_xp = 0
     if next_level:
@@ -1,25 +1,35 @@
 # app/services/subscription_service.py
 
+import asyncio
+import logging
+from typing import Any, Dict, Set, Tuple
+
 from aiogram import Bot
 from aiogram.exceptions import TelegramBadRequest
-from sqlalchemy import select
 
 from core.config import CHANNEL_ID, GROUP_ID  # ← ИСПРАВЛЕНО
-from app.services.tasks_service import increment_task_progress
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import UserTask
+from app.db.postgres import unit_of_work
+from app.services.tasks_service import (
+    get_claimed_task_codes,
+    increment_task_progress,
+    is_task_completed,
+)
+from app.services.ttl_cache import TTLCache
+
 
+# Результаты get_chat_member кэшируются на пользователя: повторные
+# открытия мини-аппа в пределах TTL в Telegram не ходят.
+MEMBERSHIP_CACHE_SIZE = 50_000
+MEMBERSHIP_CACHE_TTL = 600  # сек
 
-async def is_task_completed(user_id: int, task_code: str) -> bool:
-    """Проверяет, выполнено ли задание (reward_claimed = True)"""
-    async with AsyncSessionLocal() as session:
-        stmt = select(UserTask.reward_claimed).where(
-            UserTask.user_id == user_id,
-            UserTask.task_code == task_code
-        )
-        result = await session.execute(stmt)
-        row = result.first()
-        return bool(row[0]) if row else False
+# user_id -> (в канале, в группе)
+_membership_cache: TTLCache[Tuple[bool, bool]] = TTLCache(
+    maxsize=MEMBERSHIP_CACHE_SIZE,
+    ttl=MEMBERSHIP_CACHE_TTL,
+)
+_checks_in_progress: Set[int] = set()
+# ссылки на фоновые задачи, чтобы их не собрал GC
+_background_checks: Set[asyncio.Task] = set()
 
 
 async def check_channel_subscription(bot: Bot, user_id: int) -> bool:
@@ -49,16 +59,66 @@ async def check_group_participation(bot: Bot, user_id: int) -> bool:
 async def check_and_complete_subscriptions(bot: Bot, user_id: int) -> None:
     """
     Автоматически проверяет подписки при запуске мини-аппа.
-    Проверка происходит только если задание ещё не выполнено.
+    Проверка происходит только если задание ещё не выполнено; обе проверки
+    идут в Telegram параллельно, результат кэшируется на MEMBERSHIP_CACHE_TTL.
+    Пока ждём Telegram, сессия не открыта: соединение из пула не занимаем.
+    Запускается фоном и переживает запрос, поэтому сессию запроса
+    (её видно через contextvars) не трогает — только свои unit of work.
     """
-    
+    async with unit_of_work():
+        claimed = await get_claimed_task_codes(user_id)
+    need_channel = "D_1" not in claimed
+    need_group = "D_2" not in claimed
+    if not (need_channel or need_group):
+        return
+
+    in_channel, in_group = await asyncio.gather(
+        check_channel_subscription(bot, user_id) if need_channel else _false(),
+        check_group_participation(bot, user_id) if need_group else _false(),
+    )
+    _membership_cache.set(user_id, (in_channel, in_group))
+
     # D_1: подписка на канал
-    if not await is_task_completed(user_id, "D_1"):
-        if await check_channel_subscription(bot, user_id):
+    if in_channel:
+        async with unit_of_work():
             await increment_task_progress(user_id, "D_1", delta=1)
-    
+
     # D_2: подписка на группу (отзыв проверяется через handler)
-    if not await is_task_completed(user_id, "D_2"):
-        if await check_group_participation(bot, user_id):
-            # Только членство не засчитываем, ждём реального сообщения
-            pass
+    if in_group:
+        # Только членство не засчитываем, ждём реального сообщения
+        pass
+
+
+async def _false() -> bool:
+    return False
+
+
+async def _run_subscription_check(bot: Bot, user_id: int) -> None:
+    try:
+        await check_and_complete_subscriptions(bot, user_id)
+    except Exception as e:
+        logging.exception("Background subscription check failed for %s: %s", user_id, e)
+    finally:
+        _checks_in_progress.discard(user_id)
+
+
+def schedule_subscription_check(bot: Bot, user_id: int) -> None:
+    """
+    Ставит проверку подписок в фон, не дожидаясь Telegram.
+    Не запускает вторую проверку, пока идёт первая или жив кэш результата.
+    """
+    if user_id in _checks_in_progress:
+        return
+    # get, а не peek: это единственное обращение к кэшу, hit/miss считаются здесь
+    if _membership_cache.get(user_id) is not None:
+        return
+
+    _checks_in_progress.add(user_id)
+    task = asyncio.create_task(_run_subscription_check(bot, user_id))
+    _background_checks.add(task)
+    task.add_done_callback(_background_checks.discard)
+
+
+def get_membership_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша проверок подписок (для /api/health)."""
+    return {**_membership_cache.stats(), "in_progress": len(_checks_in_progress)}
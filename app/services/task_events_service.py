@@ -0,0 +1,220 @@
+# app/services/task_events_service.py
+
+import asyncio
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.db.postgres import after_commit, unit_of_work
+from app.services.tasks_service import advance_counters, apply_task_events
+
+
+# === КОНВЕЙЕР СОБЫТИЙ ЗАДАЧ ===
+# Эндпоинты только кладут события в очередь и сразу отвечают, а прогресс
+# задач, счётчики и каскад наград применяют фоновые воркеры.
+# События одного пользователя за окно TASK_EVENTS_WINDOW сливаются в одну
+# пачку: дельты по одной задаче/счётчику складываются.
+TASK_EVENTS_WINDOW = 0.2          # сек, сколько копим события пользователя
+TASK_EVENTS_WORKERS = 4           # воркеров, применяющих пачки
+TASK_EVENTS_MAX_ATTEMPTS = 3      # попыток применить пачку до того, как её выбросить
+TASK_EVENTS_DRAIN_TIMEOUT = 10.0  # сек на дренаж очереди при остановке
+
+
+@dataclass
+class _PendingBatch:
+    enqueued_at: float
+    tasks: Dict[str, int] = field(default_factory=dict)
+    counters: Dict[str, int] = field(default_factory=dict)
+    events: int = 0
+    attempts: int = 0
+
+    def merge(self, other: "_PendingBatch") -> None:
+        for code, delta in other.tasks.items():
+            self.tasks[code] = self.tasks.get(code, 0) + delta
+        for metric, delta in other.counters.items():
+            self.counters[metric] = self.counters.get(metric, 0) + delta
+        self.enqueued_at = min(self.enqueued_at, other.enqueued_at)
+        self.events += other.events
+        self.attempts = max(self.attempts, other.attempts)
+
+
+# user_id -> накопленная пачка; пока пачка здесь, её user_id стоит в очереди
+_pending: Dict[int, _PendingBatch] = {}
+_queue: Optional["asyncio.Queue[int]"] = None
+_workers: List[asyncio.Task] = []
+# пользователи, чьи пачки сейчас применяются (по одной пачке на пользователя)
+_in_flight: Set[int] = set()
+
+_stats: Dict[str, Any] = {
+    "enqueued_events": 0,
+    "applied_events": 0,
+    "applied_batches": 0,
+    "failed_batches": 0,
+    "dropped_batches": 0,
+    "last_lag": 0.0,
+    "max_lag": 0.0,
+}
+
+
+def _is_running() -> bool:
+    return _queue is not None and bool(_workers)
+
+
+def _put(user_id: int, batch: _PendingBatch) -> None:
+    """Кладёт пачку в очередь, сливая с уже ожидающей пачкой пользователя."""
+    pending = _pending.get(user_id)
+    if pending is not None:
+        pending.merge(batch)
+        return
+
+    _pending[user_id] = batch
+    _queue.put_nowait(user_id)
+
+
+async def _apply_batch(user_id: int, batch: _PendingBatch) -> None:
+    # воркер живёт вне запроса — своя сессия и транзакция на пачку
+    async with unit_of_work():
+        if batch.counters:
+            await advance_counters(user_id, batch.counters.items())
+        if batch.tasks:
+            await apply_task_events(user_id, batch.tasks.items())
+
+
+async def submit_task_events(
+    user_id: int,
+    events: Iterable[Tuple[str, int]] = (),
+    counters: Iterable[Tuple[str, int]] = (),
+) -> None:
+    """
+    Принимает события задач (task_code, delta) и счётчиков (metric, delta).
+    Если конвейер запущен — ставит их в очередь после commit текущего
+    unit of work; иначе (бот, скрипты) применяет сразу в текущей сессии.
+    """
+    batch = _PendingBatch(enqueued_at=time.monotonic())
+    for code, delta in events:
+        if delta:
+            batch.tasks[code] = batch.tasks.get(code, 0) + delta
+            batch.events += 1
+    for metric, delta in counters:
+        if delta:
+            batch.counters[metric] = batch.counters.get(metric, 0) + delta
+            batch.events += 1
+
+    if not batch.events:
+        return
+
+    if not _is_running():
+        if batch.counters:
+            await advance_counters(user_id, batch.counters.items())
+        if batch.tasks:
+            await apply_task_events(user_id, batch.tasks.items())
+        return
+
+    def _enqueue() -> None:
+        _stats["enqueued_events"] += batch.events
+        _put(user_id, batch)
+
+    # события откатившегося запроса применять нельзя
+    after_commit(_enqueue)
+
+
+async def _worker_loop() -> None:
+    while True:
+        user_id = await _queue.get()
+        try:
+            batch = _pending.get(user_id)
+            if batch is None:
+                continue
+
+            # ждём конца окна, чтобы собрать события пользователя в одну пачку
+            delay = batch.enqueued_at + TASK_EVENTS_WINDOW - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+            if user_id in _in_flight:
+                # предыдущая пачка пользователя ещё применяется — вернёмся позже
+                await asyncio.sleep(TASK_EVENTS_WINDOW)
+                _queue.put_nowait(user_id)
+                continue
+
+            batch = _pending.pop(user_id)
+            _in_flight.add(user_id)
+            try:
+                await _apply_batch(user_id, batch)
+            except asyncio.CancelledError:
+                # остановка посреди пачки — транзакция откатилась, вернём пачку
+                _put(user_id, batch)
+                raise
+            except Exception as e:
+                _stats["failed_batches"] += 1
+                batch.attempts += 1
+                if batch.attempts >= TASK_EVENTS_MAX_ATTEMPTS:
+                    _stats["dropped_batches"] += 1
+                    print(f"❌ [task_events] dropped batch for {user_id}: {e}")
+                else:
+                    print(f"❌ [task_events] batch for {user_id} failed, retrying: {e}")
+                    _put(user_id, batch)
+                continue
+            finally:
+                _in_flight.discard(user_id)
+
+            lag = time.monotonic() - batch.enqueued_at
+            _stats["applied_events"] += batch.events
+            _stats["applied_batches"] += 1
+            _stats["last_lag"] = round(lag, 4)
+            _stats["max_lag"] = round(max(_stats["max_lag"], lag), 4)
+        finally:
+            _queue.task_done()
+
+
+def start_task_event_workers() -> None:
+    """Запускает очередь и пул воркеров (вызывается на старте API)."""
+    global _queue
+    if _is_running():
+        return
+
+    _queue = asyncio.Queue()
+    _workers.extend(
+        asyncio.create_task(_worker_loop()) for _ in range(TASK_EVENTS_WORKERS)
+    )
+
+
+async def stop_task_event_workers() -> None:
+    """Дожидается применения очереди, останавливает воркеров и дописывает остаток."""
+    global _queue
+    if _queue is None:
+        return
+
+    try:
+        await asyncio.wait_for(_queue.join(), TASK_EVENTS_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        print(f"⚠️ [task_events] drain timeout, {len(_pending)} batches left")
+
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    _queue = None
+
+    # то, что не успели воркеры, применяем последовательно
+    while _pending:
+        user_id, batch = _pending.popitem()
+        try:
+            await _apply_batch(user_id, batch)
+        except Exception as e:
+            _stats["dropped_batches"] += 1
+            print(f"❌ [task_events] dropped batch for {user_id} on shutdown: {e}")
+
+
+def get_task_events_stats() -> Dict[str, Any]:
+    """Глубина очереди, лаг и счётчики конвейера (для /api/health)."""
+    now = time.monotonic()
+    oldest = min((b.enqueued_at for b in _pending.values()), default=None)
+    return {
+        "running": _is_running(),
+        "queue_depth": len(_pending),
+        "pending_events": sum(b.events for b in _pending.values()),
+        "in_flight": len(_in_flight),
+        "oldest_pending_age": round(now - oldest, 4) if oldest is not None else 0.0,
+        **_stats,
+    }
@@ -1,8 +1,25 @@
 # app/services/tasks_service.py
 
-from typing import List, Dict, Any
-
-from sqlalchemy import select, update
+from typing import List, Dict, Any, Iterable, Mapping, Set, Tuple
+
+from sqlalchemy import (
+    Integer,
+    Select,
+    String,
+    any_,
+    bindparam,
+    column,
+    false,
+    func,
+    literal,
+    literal_column,
+    union_all,
+    select,
+    true,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, insert as pg_insert
 
 from app.services.user_balance_service import (
     change_messages_balance,
@@ -11,8 +28,12 @@ from app.services.user_balance_service import (
 )
 from app.services.promocodes_service import assign_promocode
 from app.services.promo_pool_service import get_promo_from_pool
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import UserTask
+from app.services.levels_service import level_number, levels_crossed
+from app.services.ttl_cache import TTLCache
+from app.services.user_stats_service import bump_user_stats
+from app.services.profile_cache import invalidate_user_profile
+from app.db.postgres import after_commit, session_scope
+from app.db.models import User, UserCounter, UserTask, UserXP
 
 
 # === КОНФИГ ЗАДАЧ (с текстами, как во фронте) ===
@@ -307,88 +328,332 @@ TASK_REWARDS: Dict[str, List[Dict[str, Any]]] = {
 }
 
 
-async def ensure_task_record(user_id: int, task_code: str) -> None:
-    """Создаёт запись задачи, если её нет."""
-    if task_code not in TASK_CONFIG:
-        return
-    progress_target = TASK_CONFIG[task_code]["progress_target"]
+# порядок задач в конфиге (для детерминированной выдачи наград)
+_TASK_ORDER: Dict[str, int] = {code: i for i, code in enumerate(TASK_CONFIG)}
 
-    async with AsyncSessionLocal() as session:
-        stmt = select(UserTask).where(
-            UserTask.user_id == user_id,
-            UserTask.task_code == task_code,
+
+# === ЗАСЕВ СТРОК user_tasks ===
+# Все коды TASK_CONFIG создаются у пользователя сразу, одним INSERT.
+# При добавлении новых задач в TASK_CONFIG увеличь версию — недостающие
+# строки досеются пачкой при следующем входе пользователя
+# (или скриптом seed_user_tasks.py для всех сразу).
+TASK_CATALOG_VERSION = 1
+
+_CATALOG_ROWS = [(code, cfg["progress_target"]) for code, cfg in TASK_CONFIG.items()]
+
+
+def _seed_tasks_stmt(user_filter):
+    """
+    WITH bump AS (UPDATE users SET tasks_version = V WHERE <фильтр> AND tasks_version < V
+                  RETURNING user_id)
+    INSERT INTO user_tasks ... SELECT bump.user_id, каталог ... ON CONFLICT DO NOTHING
+    """
+    bump = (
+        update(User)
+        .where(user_filter, User.tasks_version < TASK_CATALOG_VERSION)
+        .values(tasks_version=TASK_CATALOG_VERSION)
+        .returning(User.user_id)
+        .cte("bump")
+    )
+    catalog = values(
+        column("task_code", String),
+        column("progress_target", Integer),
+        name="catalog",
+    ).data(_CATALOG_ROWS)
+
+    rows = (
+        select(
+            bump.c.user_id,
+            catalog.c.task_code,
+            literal("pending"),
+            literal(0),
+            catalog.c.progress_target,
+            false(),
+        )
+        .select_from(bump)
+        .join(catalog, true())
+    )
+
+    return (
+        pg_insert(UserTask)
+        .from_select(
+            [
+                "user_id",
+                "task_code",
+                "status",
+                "progress_current",
+                "progress_target",
+                "reward_claimed",
+            ],
+            rows,
         )
-        res = await session.scalars(stmt)
-        task = res.first()
-        if task is None:
-            task = UserTask(
-                user_id=user_id,
-                task_code=task_code,
-                progress_current=0,
-                progress_target=progress_target,
-                reward_claimed=False,
+        .on_conflict_do_nothing(index_elements=[UserTask.user_id, UserTask.task_code])
+        .add_cte(bump)
+    )
+
+
+async def seed_user_tasks(user_id: int) -> None:
+    """
+    Досевает пользователю строки всех задач каталога, если его версия устарела.
+    Для актуальных пользователей это один UPDATE, не задевший ни одной строки.
+    """
+    async with session_scope() as session:
+        await session.execute(_seed_tasks_stmt(User.user_id == user_id))
+
+
+async def seed_all_users_tasks(batch_size: int = 1000) -> int:
+    """Бэкфилл: засевает задачи всем пользователям с устаревшей версией каталога."""
+    total = 0
+    while True:
+        async with session_scope() as session:
+            ids_stmt = (
+                select(User.user_id)
+                .where(User.tasks_version < TASK_CATALOG_VERSION)
+                .order_by(User.user_id)
+                .limit(batch_size)
             )
-            session.add(task)
-            await session.commit()
+            user_ids = list((await session.scalars(ids_stmt)).all())
+            if not user_ids:
+                return total
+
+            await session.execute(_seed_tasks_stmt(User.user_id.in_(user_ids)))
+
+        total += len(user_ids)
+
+
+# === КЭШ ВЫПОЛНЕННЫХ ЗАДАЧ ===
+# reward_claimed однажды ставится и больше не снимается, поэтому множество
+# полученных наград можно держать в памяти: события по таким задачам
+# и проверки is_task_completed не ходят в Postgres.
+# Устаревший кэш (награду выдал другой процесс) безопасен: будет лишний
+# запрос, а повторную выдачу отсекает атомарный claim в _apply_task_reward.
+CLAIMED_CACHE_SIZE = 50_000
+
+_claimed_cache: TTLCache[Set[str]] = TTLCache(maxsize=CLAIMED_CACHE_SIZE)
+
+
+def get_claimed_cache_stats() -> Dict[str, Any]:
+    """Счётчики кэша выполненных задач (для /api/health)."""
+    return _claimed_cache.stats()
+
+
+def claimed_codes_stmt(user_id: int) -> Select:
+    return select(UserTask.task_code).where(
+        UserTask.user_id == user_id,
+        UserTask.reward_claimed.is_(True),
+    )
+
+
+async def get_claimed_task_codes(user_id: int) -> Set[str]:
+    """Коды задач пользователя с выданной наградой (из кэша или одним SELECT)."""
+    codes = _claimed_cache.get(user_id)
+    if codes is not None:
+        return codes
+
+    async with session_scope() as session:
+        codes = set((await session.scalars(claimed_codes_stmt(user_id))).all())
+
+    # за время запроса могли добавиться коды — не теряем их
+    cached = _claimed_cache.peek(user_id)
+    if cached is not None:
+        codes |= cached
+    _claimed_cache.set(user_id, codes)
+    return codes
+
+
+def _remember_claimed(user_id: int, task_code: str) -> None:
+    """Отмечает задачу выполненной в кэше — только после commit транзакции."""
+
+    def _update() -> None:
+        codes = _claimed_cache.peek(user_id)
+        if codes is not None:
+            codes.add(task_code)
+
+    after_commit(_update)
+
+
+async def is_task_completed(user_id: int, task_code: str) -> bool:
+    """Проверяет, выполнено ли задание (reward_claimed = True)."""
+    return task_code in await get_claimed_task_codes(user_id)
 
 
-async def sync_level_tasks_with_xp(user_id: int) -> None:
+# задачи уровней по порядку
+LEVEL_TASKS: List[str] = [
+    code for code, cfg in TASK_CONFIG.items() if cfg["category"] == "levels"
+]
+# номер уровня -> задача за переход на него: LEVEL_UP_1 — на уровень 2 и т.д.
+_LEVEL_UP_TASKS: Dict[int, str] = {i + 2: code for i, code in enumerate(LEVEL_TASKS)}
+
+
+async def _reward_level_ups(user_id: int, levels: Iterable[Mapping[str, Any]]) -> List[str]:
     """
-    Синхронизирует LEVEL_UP_* задачи с текущим XP пользователя.
-    Вызывается после выдачи награды по любой задаче.
+    Выдаёт награды LEVEL_UP_* за пройденные уровни (из таблицы уровней).
+    Награды за уровни сами дают XP — следующие уровни выдаст вложенный
+    _apply_task_reward по своему начислению.
     """
-    current_xp = await get_user_xp(user_id)
-
-    level_tasks = [
-        "LEVEL_UP_1",
-        "LEVEL_UP_2",
-        "LEVEL_UP_3",
-        "LEVEL_UP_4",
-        "LEVEL_UP_5",
-        "LEVEL_UP_6",
+    crossed = [
+        _LEVEL_UP_TASKS[number]
+        for number in map(level_number, levels)
+        if number in _LEVEL_UP_TASKS
     ]
+    if not crossed:
+        return crossed
+
+    claimed = await get_claimed_task_codes(user_id)
+    rewarded = [code for code in crossed if code not in claimed]
+    for code in rewarded:
+        await _apply_task_reward(user_id, code)
+    return rewarded
+
+
+async def sync_level_tasks_with_xp(user_id: int) -> List[str]:
+    """
+    Догоняющая выдача LEVEL_UP_* по текущему XP (починка расхождений).
+    В обычном потоке не нужна: add_user_xp сообщает пройденные уровни,
+    и награды выдаются сразу. Возвращает коды задач, по которым выдана награда.
+    """
+    claimed = await get_claimed_task_codes(user_id)
+    if claimed.issuperset(LEVEL_TASKS):
+        return []
+
+    xp = await get_user_xp(user_id)
+    return await _reward_level_ups(user_id, levels_crossed(0, xp))
 
-    for code in level_tasks:
-        cfg = TASK_CONFIG.get(code)
-        if not cfg:
-            continue
-
-        threshold = cfg["progress_target"]
-
-        await ensure_task_record(user_id, code)
-
-        async with AsyncSessionLocal() as session:
-            stmt = (
-                update(UserTask)
-                .where(
-                    UserTask.user_id == user_id,
-                    UserTask.task_code == code,
-                )
-                .values(
-                    progress_current=current_xp,
-                    progress_target=threshold,
-                )
-                .returning(
-                    UserTask.progress_current,
-                    UserTask.progress_target,
-                    UserTask.reward_claimed,
-                )
-            )
-            res = await session.execute(stmt)
-            row = res.first()
-            await session.commit()
 
-        if not row:
-            continue
+# === ЛЕСТНИЦЫ ЗАДАЧ НА ОБЩИХ СЧЁТЧИКАХ ===
+# Ступени лестницы меряют одно и то же число (запросы, купленные сообщения),
+# поэтому оно хранится одной строкой user_counters, а не в каждой из user_tasks.
+TASK_LADDERS: Dict[str, List[str]] = {
+    "requests": ["USE_1", "USE_2", "USE_3", "USE_4", "USE_5"],
+    "purchases": ["BUY_0"],
+    "purchased_messages": ["BUY_1", "BUY_2", "BUY_3", "BUY_4", "BUY_5"],
+}
+
+_LADDER_METRIC: Dict[str, str] = {
+    code: metric for metric, codes in TASK_LADDERS.items() for code in codes
+}
 
-        progress_current, progress_target, reward_claimed = row
 
-        if (not reward_claimed) and progress_current >= progress_target:
-            await _apply_task_reward(user_id, code)
+def _legacy_ladder_progress(user_id: int, metric: str):
+    """Прогресс лестницы, накопленный в user_tasks до появления счётчиков."""
+    return (
+        select(func.coalesce(func.max(UserTask.progress_current), 0))
+        .where(
+            UserTask.user_id == user_id,
+            UserTask.task_code.in_(TASK_LADDERS[metric]),
+        )
+        .scalar_subquery()
+    )
+
+
+async def advance_counters(
+    user_id: int,
+    events: Iterable[Tuple[str, int]],
+) -> List[str]:
+    """
+    Увеличивает счётчики пользователя одним INSERT ... ON CONFLICT ... RETURNING
+    (каждый счётчик — один раз, на сумму его дельт из events)
+    и выдаёт награды за все ступени лестниц, которых достигло новое значение.
+    Одной строкой RETURNING видны все пороги в (новое - дельта, новое] —
+    даже если покупка перескочила через несколько ступеней сразу.
+    Возвращает коды задач, по которым выдана награда.
+    """
+    deltas: Dict[str, int] = {}
+    for metric, delta in events:
+        if metric in TASK_LADDERS and delta:
+            deltas[metric] = deltas.get(metric, 0) + delta
+
+    if not deltas:
+        return []
+
+    stmt = pg_insert(UserCounter).values(
+        [
+            {"user_id": user_id, "metric": metric, "value": delta}
+            for metric, delta in deltas.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserCounter.user_id, UserCounter.metric],
+        set_={"value": UserCounter.value + stmt.excluded.value},
+    ).returning(
+        UserCounter.metric,
+        UserCounter.value,
+        # xmax = 0 только у только что вставленной строки
+        literal_column("xmax = 0").label("inserted"),
+    )
+
+    values_by_metric: Dict[str, int] = {}
+    async with session_scope() as session:
+        result = await session.execute(stmt)
+        inserted: List[str] = []
+        for metric, value, is_new in result.all():
+            values_by_metric[metric] = value
+            if is_new:
+                inserted.append(metric)
+
+        # первый инкремент счётчика: переносим прогресс, накопленный в user_tasks
+        for metric in inserted:
+            seed_stmt = (
+                update(UserCounter)
+                .where(UserCounter.user_id == user_id, UserCounter.metric == metric)
+                .values(value=UserCounter.value + _legacy_ladder_progress(user_id, metric))
+                .returning(UserCounter.value)
+            )
+            values_by_metric[metric] = (await session.execute(seed_stmt)).scalar_one()
+
+    claimed = await get_claimed_task_codes(user_id)
+    due: List[str] = [
+        code
+        for metric, new_value in values_by_metric.items()
+        for code in TASK_LADDERS[metric]
+        if code not in claimed
+        and new_value >= TASK_CONFIG[code]["progress_target"]
+    ]
+    if not due:
+        return due
+
+    due.sort(key=_TASK_ORDER.__getitem__)
+    for code in due:
+        await _apply_task_reward(user_id, code)
+
+    return due
 
 
 async def _apply_task_reward(user_id: int, task_code: str) -> None:
-    """Начисляет награды по задаче и помечает её как полученную."""
+    """
+    Помечает задачу как полученную и начисляет награды по ней.
+    Если начисленный XP прошёл пороги уровней — сразу выдаёт эти LEVEL_UP_*.
+    """
+    # сначала атомарно «забираем» награду: при гонке двух событий
+    # строку обновит только одно из них, второе награду не выдаст.
+    # Задачи лестниц прогресс в user_tasks не пишут, поэтому строки может
+    # не быть — тогда claim её создаёт.
+    async with session_scope() as session:
+        stmt = pg_insert(UserTask).values(
+            user_id=user_id,
+            task_code=task_code,
+            status="pending",
+            progress_current=0,
+            progress_target=TASK_CONFIG[task_code]["progress_target"],
+            reward_claimed=True,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserTask.user_id, UserTask.task_code],
+            set_={"reward_claimed": True},
+            where=UserTask.reward_claimed.is_(False),
+        ).returning(UserTask.task_code)
+        claimed = (await session.execute(stmt)).first()
+
+        if claimed:
+            await bump_user_stats(user_id, tasks_completed=1)
+            invalidate_user_profile(user_id)
+
+    # награда выдана — этим вызовом или раньше, в любом случае задача закрыта
+    _remember_claimed(user_id, task_code)
+
+    if not claimed:
+        return
+
     rewards = TASK_REWARDS.get(task_code, [])
     xp_delta = 0
     sms_delta = 0
@@ -402,71 +667,111 @@ async def _apply_task_reward(user_id: int, task_code: str) -> None:
     for r in rewards:
         if r["type"] == "promocode":
             percent = int(r["percent"])
-            code = await get_promo_from_pool(percent)
+            code = await get_promo_from_pool(percent, user_id)
             if code:
                 await assign_promocode(user_id, code, source=f"task_{task_code}")
 
-    if xp_delta > 0:
-        await add_user_xp(user_id, xp_delta)
     if sms_delta > 0:
-        await change_messages_balance(user_id, sms_delta)
-
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            update(UserTask)
-            .where(
-                UserTask.user_id == user_id,
-                UserTask.task_code == task_code,
-            )
-            .values(reward_claimed=True)
-        )
-        await session.execute(stmt)
-        await session.commit()
-
-    # после выдачи награды обновляем LEVEL_UP_* с учётом нового XP
-    await sync_level_tasks_with_xp(user_id)
+        await change_messages_balance(user_id, sms_delta, reason=f"task_{task_code}")
+    if xp_delta > 0:
+        change = await add_user_xp(user_id, xp_delta)
+        # только уровни, которые прошло именно это начисление
+        await _reward_level_ups(user_id, change.crossed_levels)
 
 
-async def increment_task_progress(user_id: int, task_code: str, delta: int = 1) -> None:
+async def apply_task_events(
+    user_id: int,
+    events: Iterable[Tuple[str, int]],
+) -> List[str]:
     """
-    Увеличивает прогресс задачи и, если цель достигнута и награда ещё не выдана,
-    автоматически начисляет её.
+    Пакетно двигает прогресс задач: все строки user_tasks создаются/увеличиваются
+    одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+    По задачам, которые достигли цели, сразу выдаются награды.
+    Задачи лестниц (USE_*, BUY_*) переводятся в счётчик: одно действие
+    двигает все ступени лестницы сразу, поэтому дельты сначала суммируются
+    по коду задачи, а счётчик растёт на максимум этих сумм по ступеням —
+    один раз на действие, а не на каждую ступень.
+    Возвращает коды задач, ставших выполненными.
     """
-    if task_code not in TASK_CONFIG:
-        return
-
-    await ensure_task_record(user_id, task_code)
+    deltas: Dict[str, int] = {}
+    for task_code, delta in events:
+        if task_code in TASK_CONFIG and delta:
+            deltas[task_code] = deltas.get(task_code, 0) + delta
+
+    counter_deltas: Dict[str, int] = {}
+    for task_code in [code for code in deltas if code in _LADDER_METRIC]:
+        metric = _LADDER_METRIC[task_code]
+        counter_deltas[metric] = max(counter_deltas.get(metric, 0), deltas.pop(task_code))
+
+    if counter_deltas:
+        laddered = await advance_counters(user_id, counter_deltas.items())
+    else:
+        laddered = []
+
+    if not deltas:
+        return laddered
+
+    # по выполненным задачам прогресс больше не пишем
+    claimed = await get_claimed_task_codes(user_id)
+    for task_code in claimed.intersection(deltas):
+        del deltas[task_code]
+
+    if not deltas:
+        return laddered
+
+    rows = [
+        {
+            "user_id": user_id,
+            "task_code": task_code,
+            "status": "pending",
+            "progress_current": delta,
+            "progress_target": TASK_CONFIG[task_code]["progress_target"],
+            "reward_claimed": False,
+        }
+        for task_code, delta in deltas.items()
+    ]
 
-    async with AsyncSessionLocal() as session:
-        target = TASK_CONFIG[task_code]["progress_target"]
+    stmt = pg_insert(UserTask).values(rows)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTask.user_id, UserTask.task_code],
+        set_={
+            "progress_current": UserTask.progress_current + stmt.excluded.progress_current,
+            "progress_target": stmt.excluded.progress_target,
+        },
+    ).returning(
+        UserTask.task_code,
+        UserTask.progress_current,
+        UserTask.progress_target,
+        UserTask.reward_claimed,
+    )
+
+    async with session_scope() as session:
+        result = await session.execute(stmt)
+        returned = result.all()
+
+    due: List[str] = []
+    for task_code, progress_current, progress_target, reward_claimed in returned:
+        if reward_claimed:
+            # награду выдали в другом процессе — запоминаем
+            _remember_claimed(user_id, task_code)
+        elif progress_current >= progress_target:
+            due.append(task_code)
+
+    # награды выдаём в порядке TASK_CONFIG, чтобы результат был детерминирован
+    due.sort(key=_TASK_ORDER.__getitem__)
+
+    for task_code in due:
+        await _apply_task_reward(user_id, task_code)
 
-        stmt = (
-            update(UserTask)
-            .where(
-                UserTask.user_id == user_id,
-                UserTask.task_code == task_code,
-            )
-            .values(
-                progress_current=UserTask.progress_current + delta,
-                progress_target=target,
-            )
-            .returning(
-                UserTask.progress_current,
-                UserTask.progress_target,
-                UserTask.reward_claimed,
-            )
-        )
-        res = await session.execute(stmt)
-        row = res.first()
-        await session.commit()
+    return laddered + due
 
-    if not row:
-        return
 
-    progress_current, progress_target, reward_claimed = row
-
-    if (not reward_claimed) and progress_current >= progress_target:
-        await _apply_task_reward(user_id, task_code)
+async def increment_task_progress(user_id: int, task_code: str, delta: int = 1) -> None:
+    """
+    Увеличивает прогресс задачи и, если цель достигнута и награда ещё не выдана,
+    автоматически начисляет её.
+    """
+    await apply_task_events(user_id, [(task_code, delta)])
 
 
 async def set_task_progress(user_id: int, task_code: str, value: int) -> None:
@@ -477,30 +782,33 @@ async def set_task_progress(user_id: int, task_code: str, value: int) -> None:
     if task_code not in TASK_CONFIG:
         return
 
-    await ensure_task_record(user_id, task_code)
+    if task_code in await get_claimed_task_codes(user_id):
+        return
 
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         target = TASK_CONFIG[task_code]["progress_target"]
 
-        stmt = (
-            update(UserTask)
-            .where(
-                UserTask.user_id == user_id,
-                UserTask.task_code == task_code,
-            )
-            .values(
-                progress_current=value,
-                progress_target=target,
-            )
-            .returning(
-                UserTask.progress_current,
-                UserTask.progress_target,
-                UserTask.reward_claimed,
-            )
+        stmt = pg_insert(UserTask).values(
+            user_id=user_id,
+            task_code=task_code,
+            status="pending",
+            progress_current=value,
+            progress_target=target,
+            reward_claimed=False,
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UserTask.user_id, UserTask.task_code],
+            set_={
+                "progress_current": stmt.excluded.progress_current,
+                "progress_target": stmt.excluded.progress_target,
+            },
+        ).returning(
+            UserTask.progress_current,
+            UserTask.progress_target,
+            UserTask.reward_claimed,
         )
         res = await session.execute(stmt)
         row = res.first()
-        await session.commit()
 
     if not row:
         return
@@ -511,62 +819,163 @@ async def set_task_progress(user_id: int, task_code: str, value: int) -> None:
         await _apply_task_reward(user_id, task_code)
 
 
-async def get_tasks_by_category(user_id: int, category: str) -> List[Dict[str, Any]]:
-    """Возвращает задачи категории в формате фронта."""
-    tasks: List[Dict[str, Any]] = []
+def _build_category_catalog() -> Dict[str, List[Dict[str, Any]]]:
+    """Статическая часть карточек задач по категориям (награды считаем один раз)."""
+    catalog: Dict[str, List[Dict[str, Any]]] = {}
 
     for code, cfg in TASK_CONFIG.items():
-        if cfg["category"] != category:
-            continue
+        reward_cfg = TASK_REWARDS.get(code, [])
+        catalog.setdefault(cfg["category"], []).append(
+            {
+                "code": code,
+                "progress_target": cfg["progress_target"],
+                "xp": sum(r["amount"] for r in reward_cfg if r["type"] == "xp"),
+                "sms": sum(r["amount"] for r in reward_cfg if r["type"] == "sms"),
+                "promo": next(
+                    (f"{r['percent']}%" for r in reward_cfg if r["type"] == "promocode"),
+                    None,
+                ),
+                "title": cfg.get("title"),
+                "desc": cfg.get("desc"),
+            }
+        )
 
-        await ensure_task_record(user_id, code)
+    return catalog
 
-        async with AsyncSessionLocal() as session:
-            stmt = select(
-                UserTask.progress_current,
-                UserTask.reward_claimed,
-            ).where(
-                UserTask.user_id == user_id,
-                UserTask.task_code == code,
-            )
-            res = await session.execute(stmt)
-            row = res.first()
 
-        progress = row[0] if row else 0
-        claimed = bool(row[1]) if row else False
+_CATEGORY_CATALOG = _build_category_catalog()
+_CATEGORY_CODES: Dict[str, List[str]] = {
+    category: [item["code"] for item in items]
+    for category, items in _CATEGORY_CATALOG.items()
+}
 
-        target = cfg["progress_target"]
 
-        if claimed:
-            status = "completed"
-        elif progress >= target:
-            status = "completed"
-        elif progress > 0:
-            status = "in_progress"
-        else:
-            status = "pending"
+def _task_status(progress: int, target: int, claimed: bool) -> str:
+    if claimed:
+        return "completed"
+    if progress >= target:
+        return "completed"
+    if progress > 0:
+        return "in_progress"
+    return "pending"
 
-        reward_cfg = TASK_REWARDS.get(code, [])
-        xp = sum(r["amount"] for r in reward_cfg if r["type"] == "xp")
-        sms = sum(r["amount"] for r in reward_cfg if r["type"] == "sms")
-        promo = next(
-            (f"{r['percent']}%" for r in reward_cfg if r["type"] == "promocode"),
-            None,
-        )
 
-        tasks.append(
-            {
-                "code": code,
-                "status": status,
-                "progress_current": progress,
-                "progress_target": target,
-                "reward_claimed": claimed,
-                "xp": xp,
-                "sms": sms,
-                "promo": promo,
-                "title": cfg.get("title"),
-                "desc": cfg.get("desc"),
-            }
+def task_progress_stmt(user_id: int, codes: List[str]):
+    """
+    Прогресс задач codes одним UNION ALL: строки user_tasks, для лестниц
+    (USE_*, BUY_*) — счётчики user_counters, для уровней — XP из user_xp.
+    Строки — (kind, key, value, claimed), kind: task | counter | xp.
+    """
+    metrics = sorted({_LADDER_METRIC[code] for code in codes if code in _LADDER_METRIC})
+    with_xp = any(code in LEVEL_TASKS for code in codes)
+
+    parts = [select(
+        literal("task").label("kind"),
+        UserTask.task_code.label("key"),
+        UserTask.progress_current.label("value"),
+        UserTask.reward_claimed.label("claimed"),
+    ).where(
+        UserTask.user_id == user_id,
+        UserTask.task_code == any_(bindparam("codes", codes, type_=ARRAY(String))),
+    )]
+    # счётчики лестниц и XP читаем тем же запросом
+    if metrics:
+        parts.append(
+            select(
+                literal("counter"),
+                UserCounter.metric,
+                UserCounter.value,
+                false(),
+            ).where(
+                UserCounter.user_id == user_id,
+                UserCounter.metric == any_(bindparam("metrics", metrics, type_=ARRAY(String))),
+            )
+        )
+    if with_xp:
+        parts.append(
+            select(
+                literal("xp"),
+                literal("xp"),
+                UserXP.xp,
+                false(),
+            ).where(UserXP.user_id == user_id)
         )
+    return union_all(*parts) if len(parts) > 1 else parts[0]
+
+
+async def _load_tasks(
+    user_id: int,
+    categories: List[str],
+) -> Dict[str, List[Dict[str, Any]]]:
+    """Задачи нескольких категорий в формате фронта (прогресс — task_progress_stmt)."""
+    codes = [code for category in categories for code in _CATEGORY_CODES[category]]
+    metrics = sorted({_LADDER_METRIC[code] for code in codes if code in _LADDER_METRIC})
+    with_xp = any(code in LEVEL_TASKS for code in codes)
+
+    async with session_scope() as session:
+        rows = (await session.execute(task_progress_stmt(user_id, codes))).all()
+
+    progress_by_code: Dict[str, Tuple[int, bool]] = {}
+    counters: Dict[str, int] = {}
+    xp = 0
+    for kind, key, value, claimed in rows:
+        if kind == "counter":
+            counters[key] = value or 0
+        elif kind == "xp":
+            xp = value or 0
+        else:
+            progress_by_code[key] = (value or 0, bool(claimed))
+
+    if with_xp:
+        for code in LEVEL_TASKS:
+            claimed = progress_by_code.get(code, (0, False))[1]
+            progress_by_code[code] = (xp, claimed)
+
+    for metric in metrics:
+        ladder = TASK_LADDERS[metric]
+        if metric in counters:
+            progress = counters[metric]
+        else:
+            # счётчик ещё не создан — показываем прогресс из user_tasks
+            progress = max(
+                (progress_by_code[code][0] for code in ladder if code in progress_by_code),
+                default=0,
+            )
+        for code in ladder:
+            claimed = progress_by_code.get(code, (0, False))[1]
+            progress_by_code[code] = (progress, claimed)
+
+    tasks: Dict[str, List[Dict[str, Any]]] = {}
+    for category in categories:
+        items: List[Dict[str, Any]] = []
+        for item in _CATEGORY_CATALOG[category]:
+            progress, claimed = progress_by_code.get(item["code"], (0, False))
+            items.append(
+                {
+                    "code": item["code"],
+                    "status": _task_status(progress, item["progress_target"], claimed),
+                    "progress_current": progress,
+                    "progress_target": item["progress_target"],
+                    "reward_claimed": claimed,
+                    "xp": item["xp"],
+                    "sms": item["sms"],
+                    "promo": item["promo"],
+                    "title": item["title"],
+                    "desc": item["desc"],
+                }
+            )
+        tasks[category] = items
 
     return tasks
+
+
+async def get_tasks_by_category(user_id: int, category: str) -> List[Dict[str, Any]]:
+    """Возвращает задачи категории в формате фронта."""
+    if category not in _CATEGORY_CODES:
+        return []
+    return (await _load_tasks(user_id, [category]))[category]
+
+
+async def get_all_tasks(user_id: int) -> Dict[str, List[Dict[str, Any]]]:
+    """Задачи всех категорий одним запросом (для /api/bootstrap)."""
+    return await _load_tasks(user_id, list(_CATEGORY_CODES))
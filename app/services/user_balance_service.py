@@ -1,54 +1,80 @@
 # app/services/user_balance_service.py
 
-from sqlalchemy import select, update
+from typing import Any, Mapping, NamedTuple, Optional, Tuple
 
-from app.db.postgres import AsyncSessionLocal
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.postgres import session_scope
 from app.db.models import User, UserXP
+from app.services.user_stats_service import bump_user_stats
+from app.services.profile_cache import invalidate_user_profile
+from app.services.leaderboard_service import note_xp_change
+from app.services.levels_service import levels_crossed
+from app.services.credit_ledger_service import apply_credit_delta
 
 
 async def get_messages_balance(user_id: int) -> int:
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = select(User.messages_balance).where(User.user_id == user_id)
         res = await session.execute(stmt)
         row = res.first()
         return int(row[0]) if row and row[0] is not None else 0
 
 
-async def change_messages_balance(user_id: int, delta: int) -> None:
-    if delta == 0:
-        return
-
-    async with AsyncSessionLocal() as session:
-        stmt = (
-            update(User)
-            .where(User.user_id == user_id)
-            .values(messages_balance=User.messages_balance + delta)
-        )
-        await session.execute(stmt)
-        await session.commit()
+async def change_messages_balance(
+    user_id: int,
+    delta: int,
+    reason: str = "adjustment",
+    ref: Optional[str] = None,
+) -> Optional[int]:
+    """
+    Меняет баланс сообщений с записью в credit_ledger.
+    Возвращает новый баланс или None, если списать не удалось.
+    """
+    balance = await apply_credit_delta(user_id, delta, reason, ref)
+    if balance is not None:
+        invalidate_user_profile(user_id)
+    return balance
 
 
 async def get_user_xp(user_id: int) -> int:
-    async with AsyncSessionLocal() as session:
+    async with session_scope() as session:
         stmt = select(UserXP.xp).where(UserXP.user_id == user_id)
         res = await session.execute(stmt)
         row = res.first()
         return int(row[0]) if row and row[0] is not None else 0
 
 
-async def add_user_xp(user_id: int, amount: int) -> None:
+class XPChange(NamedTuple):
+    """Результат начисления XP: значения до/после и пройденные уровни."""
+
+    old_xp: int
+    new_xp: int
+    crossed_levels: Tuple[Mapping[str, Any], ...]
+
+
+async def add_user_xp(user_id: int, amount: int) -> XPChange:
+    """
+    Начисляет XP одним INSERT ... ON CONFLICT DO UPDATE ... RETURNING.
+    Старое значение — новое минус amount: инкремент атомарный, гонок нет.
+    """
     if amount <= 0:
-        return
+        xp = await get_user_xp(user_id)
+        return XPChange(xp, xp, ())
+
+    stmt = pg_insert(UserXP).values(user_id=user_id, xp=amount)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserXP.user_id],
+        set_={"xp": func.coalesce(UserXP.xp, 0) + stmt.excluded.xp},
+    ).returning(UserXP.xp)
 
-    async with AsyncSessionLocal() as session:
-        stmt = select(UserXP).where(UserXP.user_id == user_id)
-        res = await session.scalars(stmt)
-        xp_row = res.first()
+    async with session_scope() as session:
+        new_xp = (await session.execute(stmt)).scalar_one()
 
-        if xp_row is None:
-            xp_row = UserXP(user_id=user_id, xp=amount)
-            session.add(xp_row)
-        else:
-            xp_row.xp = (xp_row.xp or 0) + amount
+        await bump_user_stats(user_id, xp=amount)
+        invalidate_user_profile(user_id)
+        note_xp_change(user_id, new_xp)
 
-        await session.commit()
+    old_xp = new_xp - amount
+    return XPChange(old_xp, new_xp, levels_crossed(old_xp, new_xp))
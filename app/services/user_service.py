@@ -1,13 +1,77 @@
 # user_service.py
 
-from datetime import datetime
-from typing import Optional, Dict, Any
+import asyncio
+from datetime import datetime, timezone as dt_timezone
+from typing import Optional, Dict, Any, List, Tuple
+
+from sqlalchemy import Select, select, func, or_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.postgres import AsyncSessionLocal, after_commit, session_scope
+from app.db.models import User, UserStats
+from app.services.ttl_cache import TTLCache
+from app.services.tasks_service import seed_user_tasks
+from app.services.levels_service import resolve_level
+from app.services.profile_cache import cached_user_profile, invalidate_user_profile
+
+
+# === ЗАПИСЬ ПРОФИЛЯ (write-behind) ===
+# Профиль из initData приходит на каждый запрос, а меняется редко.
+# Новых пользователей создаём сразу, а обновления уже известных копим
+# и пишем пачками фоновым флашером.
+PROFILE_FLUSH_INTERVAL = 0.3        # сек между сбросами очереди
+PROFILE_FLUSH_BATCH = 500           # строк в одном INSERT
+KNOWN_PROFILES_CACHE_SIZE = 50_000
+
+# user_id -> (username, photo_url), которые уже лежат в БД
+_known_profiles: TTLCache[Tuple[Optional[str], Optional[str]]] = TTLCache(
+    maxsize=KNOWN_PROFILES_CACHE_SIZE,
+)
+# user_id -> строка для upsert (последнее значение побеждает)
+_pending_profiles: Dict[int, Dict[str, Any]] = {}
+_flusher_task: Optional[asyncio.Task] = None
+
+
+def _profile_row(
+    user_id: int,
+    first_name: str,
+    username: Optional[str],
+    photo_url: Optional[str],
+) -> Dict[str, Any]:
+    now = datetime.now(dt_timezone.utc)
+    return {
+        "user_id": user_id,
+        "first_name": first_name,
+        "username": username,
+        "photo_url": photo_url,
+        "created_at": now,
+        "updated_at": now,
+        "messages_balance": 0,
+        "is_banned": False,
+        "streak_days": 0,
+        "tasks_version": 0,
+    }
 
-from sqlalchemy import select, func
 
-from core.config import LEVELS
-from app.db.postgres import AsyncSessionLocal
-from app.db.models import User, History, UserTask, UserXP
+def _profile_upsert_stmt(rows: List[Dict[str, Any]]):
+    """
+    INSERT ... ON CONFLICT DO UPDATE ... WHERE:
+    существующая строка переписывается, только если username/photo_url изменились.
+    """
+    stmt = pg_insert(User).values(rows)
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=[User.user_id],
+        set_={
+            "username": excluded.username,
+            "photo_url": excluded.photo_url,
+            "updated_at": excluded.updated_at,
+        },
+        where=or_(
+            User.username.is_distinct_from(excluded.username),
+            User.photo_url.is_distinct_from(excluded.photo_url),
+        ),
+    )
 
 
 async def ensure_user_exists(
@@ -16,116 +80,134 @@ async def ensure_user_exists(
     username: str | None = None,
     photo_url: str | None = None,
 ) -> None:
-    """Создаёт пользователя, если его нет, или обновляет данные, если есть."""
-    async with AsyncSessionLocal() as session:
-        stmt = select(User).where(User.user_id == user_id)
-        result = await session.scalars(stmt)
-        user = result.first()
-
-        now_str = datetime.utcnow().isoformat()
-
-        if user is None:
-            user = User(
-                user_id=user_id,
-                first_name=first_name,
-                username=username,
-                created_at=now_str,
-                updated_at=now_str,
-                messages_balance=0,
-                photo_url=photo_url,
-            )
-            session.add(user)
-        else:
-            user.username = username
-            user.updated_at = now_str
-            user.photo_url = photo_url
-
-        await session.commit()
-
-
-async def _get_user_row(user_id: int) -> Optional[Dict[str, Any]]:
-    async with AsyncSessionLocal() as session:
-        stmt = select(
-            User.user_id,
+    """Создаёт пользователя, если его нет, или обновляет данные, если они изменились."""
+    known = _known_profiles.get(user_id)
+    if known == (username, photo_url):
+        return
+
+    row = _profile_row(user_id, first_name, username, photo_url)
+
+    # пользователь уже точно есть в БД — обновление можно отложить
+    if known is not None and _flusher_task is not None and not _flusher_task.done():
+        _pending_profiles[user_id] = row
+        return
+
+    async with session_scope() as session:
+        await session.execute(_profile_upsert_stmt([row]))
+        # новому пользователю — все задачи сразу, старому — только новые коды
+        await seed_user_tasks(user_id)
+        invalidate_user_profile(user_id)
+
+    # откат транзакции запроса не должен оставить «известного» пользователя
+    after_commit(lambda: _known_profiles.set(user_id, (username, photo_url)))
+
+
+async def flush_pending_profiles() -> int:
+    """Пишет накопленные обновления профилей многострочными upsert-ами."""
+    if not _pending_profiles:
+        return 0
+
+    rows = list(_pending_profiles.values())
+    _pending_profiles.clear()
+
+    for i in range(0, len(rows), PROFILE_FLUSH_BATCH):
+        batch = rows[i:i + PROFILE_FLUSH_BATCH]
+        try:
+            async with AsyncSessionLocal() as session:
+                await session.execute(_profile_upsert_stmt(batch))
+                await session.commit()
+        except Exception:
+            # возвращаем в очередь упавшую и все ещё не записанные пачки,
+            # если за это время не пришло более свежее значение
+            for r in rows[i:]:
+                _pending_profiles.setdefault(r["user_id"], r)
+            raise
+
+        for r in batch:
+            _known_profiles.set(r["user_id"], (r["username"], r["photo_url"]))
+            invalidate_user_profile(r["user_id"])
+
+    return len(rows)
+
+
+async def _profile_flush_loop() -> None:
+    while True:
+        await asyncio.sleep(PROFILE_FLUSH_INTERVAL)
+        try:
+            await flush_pending_profiles()
+        except Exception as e:
+            print(f"❌ [user_service] profile flush failed: {e}")
+
+
+def start_profile_flusher() -> None:
+    """Запускает фоновый флашер профилей (вызывается на старте API)."""
+    global _flusher_task
+    if _flusher_task is None or _flusher_task.done():
+        _flusher_task = asyncio.create_task(_profile_flush_loop())
+
+
+async def stop_profile_flusher() -> None:
+    """Останавливает флашер и дописывает всё, что осталось в очереди."""
+    global _flusher_task
+    if _flusher_task is not None:
+        _flusher_task.cancel()
+        try:
+            await _flusher_task
+        except asyncio.CancelledError:
+            pass
+        _flusher_task = None
+
+    await flush_pending_profiles()
+
+
+async def get_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    """Профиль для /api/me и статуса (через кэш профилей)."""
+    return await cached_user_profile(user_id, _load_user_profile)
+
+
+def user_profile_stmt(user_id: int) -> Select:
+    """
+    Строка пользователя и счётчики из проекции user_stats —
+    два поиска по первичному ключу в одном запросе.
+    """
+    return (
+        select(
             User.username,
             User.first_name,
             User.created_at,
-            User.updated_at,
             User.messages_balance,
-            User.is_banned,
             User.photo_url,
-        ).where(User.user_id == user_id)
+            func.coalesce(UserStats.friends_invited, 0).label("friends_invited"),
+            func.coalesce(UserStats.requests_total, 0).label("requests_total"),
+            func.coalesce(UserStats.tasks_completed, 0).label("tasks_completed"),
+            func.coalesce(UserStats.xp, 0).label("xp"),
+        )
+        .outerjoin(UserStats, UserStats.user_id == User.user_id)
+        .where(User.user_id == user_id)
+    )
 
-        result = await session.execute(stmt)
-        row = result.mappings().first()
-        return dict(row) if row else None
 
+async def _load_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
+    async with session_scope() as session:
+        user = (await session.execute(user_profile_stmt(user_id))).mappings().first()
 
-async def get_user_profile(user_id: int) -> Optional[Dict[str, Any]]:
-    user = await _get_user_row(user_id)
     if user is None:
         return None
 
-    created_at = user.get("created_at") or datetime.utcnow().isoformat()
-
-    async with AsyncSessionLocal() as session:
-        # друзья
-        friends_cnt_stmt = (
-            select(func.count())
-            .select_from(User)
-            .where(User.referrer_id == user_id)
-        )
-        friends_invited = (await session.execute(friends_cnt_stmt)).scalar_one() or 0
-
-        # запросы
-        requests_cnt_stmt = (
-            select(func.count())
-            .select_from(History)
-            .where(History.user_id == user_id)
-        )
-        requests_total = (await session.execute(requests_cnt_stmt)).scalar_one() or 0
-
-        # выполненные задания
-        tasks_cnt_stmt = (
-            select(func.count())
-            .select_from(UserTask)
-            .where(
-                UserTask.user_id == user_id,
-                UserTask.reward_claimed.is_(True),
-            )
-        )
-        tasks_completed = (await session.execute(tasks_cnt_stmt)).scalar_one() or 0
-
-        # XP
-        xp_stmt = select(UserXP.xp).where(UserXP.user_id == user_id)
-        xp_row = (await session.execute(xp_stmt)).first()
-        xp = int(xp_row[0]) if xp_row and xp_row[0] is not None else 0
-
-    # уровень
-    current_level = LEVELS[0]
-    for lvl in LEVELS:
-        min_xp = lvl["min_xp"]
-        max_xp = lvl["max_xp"]
-        if max_xp is None:
-            if xp >= min_xp:
-                current_level = lvl
-            break
-        if min_xp <= xp <= max_xp:
-            current_level = lvl
-            break
-
-    balance = int(user.get("messages_balance") or 0)
+    created_at = user["created_at"] or datetime.now(dt_timezone.utc)
+    xp_value = int(user["xp"] or 0)
+    current_level, _ = resolve_level(xp_value)
 
     return {
-        "name": user.get("first_name") or "",
-        "username": user.get("username") or "",
-        "photo_url": user.get("photo_url"),
-        "registered_at": created_at,
+        "name": user["first_name"] or "",
+        "username": user["username"] or "",
+        "photo_url": user["photo_url"],
+        "registered_at": created_at.isoformat(),
         "status_code": (current_level.get("code") or "").strip(),
         "status_title": (current_level.get("title") or "").strip(),
-        "credits_balance": balance,
-        "friends_invited": friends_invited,
-        "tasks_completed": tasks_completed,
-        "requests_total": requests_total,
-        "xp": xp,
+        "credits_balance": int(user["messages_balance"] or 0),
+        "friends_invited": user["friends_invited"] or 0,
+        "tasks_completed": user["tasks_completed"] or 0,
+        "requests_total": user["requests_total"] or 0,
+        "xp": xp_value,
     }
@@ -0,0 +1,104 @@
+# app/services/user_stats_service.py
+
+from typing import Iterable, Optional
+
+from sqlalchemy import func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.db.postgres import session_scope
+from app.db.models import History, HistoryArchiveCount, User, UserStats, UserTask, UserXP
+
+
+# Колонки проекции user_stats. Каждая поддерживается инкрементом в транзакции
+# источника (log_event, привязка реферала, выдача награды, начисление XP),
+# а rebuild_user_stats пересчитывает их из первоисточников.
+STATS_COLUMNS = ("requests_total", "friends_invited", "tasks_completed", "xp")
+
+
+async def bump_user_stats(user_id: int, **deltas: int) -> None:
+    """Увеличивает счётчики user_stats одним upsert в текущей транзакции."""
+    deltas = {k: v for k, v in deltas.items() if v}
+    if not deltas:
+        return
+
+    unknown = set(deltas).difference(STATS_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown user_stats columns: {sorted(unknown)}")
+
+    stmt = pg_insert(UserStats).values(user_id=user_id, **deltas)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserStats.user_id],
+        set_={
+            name: getattr(UserStats, name) + getattr(stmt.excluded, name)
+            for name in deltas
+        },
+    )
+
+    async with session_scope() as session:
+        await session.execute(stmt)
+
+
+def _rebuild_stmt(user_ids: Optional[Iterable[int]] = None):
+    """INSERT ... SELECT со всеми счётчиками, посчитанными агрегатами по таблицам."""
+    ids = list(user_ids) if user_ids is not None else None
+
+    def _scoped(stmt, column):
+        # фильтр внутри агрегатов, чтобы точечный пересчёт не сканировал всё
+        return stmt.where(column.in_(ids)) if ids is not None else stmt
+
+    requests = _scoped(
+        select(History.user_id, func.count().label("cnt")),
+        History.user_id,
+    ).group_by(History.user_id).subquery()
+    # записи, которые ретеншн уже вынес из history
+    archived = _scoped(
+        select(HistoryArchiveCount.user_id, HistoryArchiveCount.requests),
+        HistoryArchiveCount.user_id,
+    ).subquery()
+    friends = _scoped(
+        select(User.referrer_id.label("user_id"), func.count().label("cnt"))
+        .where(User.referrer_id.is_not(None)),
+        User.referrer_id,
+    ).group_by(User.referrer_id).subquery()
+    tasks = _scoped(
+        select(UserTask.user_id, func.count().label("cnt"))
+        .where(UserTask.reward_claimed.is_(True)),
+        UserTask.user_id,
+    ).group_by(UserTask.user_id).subquery()
+
+    rows = (
+        select(
+            User.user_id,
+            func.coalesce(archived.c.requests, 0) + func.coalesce(requests.c.cnt, 0),
+            func.coalesce(friends.c.cnt, 0),
+            func.coalesce(tasks.c.cnt, 0),
+            func.coalesce(UserXP.xp, literal(0)),
+        )
+        .outerjoin(requests, requests.c.user_id == User.user_id)
+        .outerjoin(archived, archived.c.user_id == User.user_id)
+        .outerjoin(friends, friends.c.user_id == User.user_id)
+        .outerjoin(tasks, tasks.c.user_id == User.user_id)
+        .outerjoin(UserXP, UserXP.user_id == User.user_id)
+    )
+    rows = _scoped(rows, User.user_id)
+
+    stmt = pg_insert(UserStats).from_select(["user_id", *STATS_COLUMNS], rows)
+    # пересчитанное значение записывается как есть — иначе пересчёт
+    # не исправил бы завышенный счётчик
+    set_ = {name: getattr(stmt.excluded, name) for name in STATS_COLUMNS}
+    return stmt.on_conflict_do_update(index_elements=[UserStats.user_id], set_=set_)
+
+
+async def rebuild_user_stats(user_ids: Optional[Iterable[int]] = None) -> int:
+    """
+    Пересчитывает user_stats из первоисточников одним set-based запросом
+    (бэкфилл и починка расхождений). Возвращает число затронутых строк.
+    requests_total — строки history плюс записи, ушедшие в архив по ретеншну
+    (history_archive_counts).
+    """
+    async with session_scope() as session:
+        # без preserve_rowcount у INSERT ... SELECT rowcount = -1
+        result = await session.execute(
+            _rebuild_stmt(user_ids), execution_options={"preserve_rowcount": True}
+        )
+        return result.rowcount
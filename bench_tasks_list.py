@@ -0,0 +1,100 @@
+# bench_tasks_list.py
+# Бенчмарк /api/tasks/list: число запросов к БД и латентность (p50/p95)
+# старой реализации (SELECT на каждую задачу) против новой (один SELECT).
+#
+#   python bench_tasks_list.py <user_id> [iterations]
+import asyncio
+import statistics
+import sys
+import time
+from typing import Any, Dict, List
+
+from sqlalchemy import event, select
+
+from app.db.postgres import AsyncSessionLocal, engine, unit_of_work
+from app.db.models import UserTask
+from app.services.tasks_service import TASK_CONFIG, TASK_REWARDS, get_tasks_by_category
+
+CATEGORIES = ["daily", "activity", "referral", "usage", "purchases", "levels"]
+
+_statements = 0
+
+
+def _count_statement(*_args, **_kwargs):
+    global _statements
+    _statements += 1
+
+
+async def legacy_get_tasks_by_category(user_id: int, category: str) -> List[Dict[str, Any]]:
+    """Старый алгоритм: на каждую задачу — проверка строки и отдельный SELECT в своей сессии."""
+    tasks: List[Dict[str, Any]] = []
+    for code, cfg in TASK_CONFIG.items():
+        if cfg["category"] != category:
+            continue
+
+        # бывший ensure_task_record: SELECT в отдельной сессии
+        async with AsyncSessionLocal() as session:
+            await session.execute(
+                select(UserTask).where(UserTask.user_id == user_id, UserTask.task_code == code)
+            )
+
+        async with AsyncSessionLocal() as session:
+            res = await session.execute(
+                select(UserTask.progress_current, UserTask.reward_claimed).where(
+                    UserTask.user_id == user_id, UserTask.task_code == code
+                )
+            )
+            row = res.first()
+
+        reward_cfg = TASK_REWARDS.get(code, [])
+        tasks.append(
+            {
+                "code": code,
+                "progress_current": row[0] if row else 0,
+                "reward_claimed": bool(row[1]) if row else False,
+                "xp": sum(r["amount"] for r in reward_cfg if r["type"] == "xp"),
+            }
+        )
+    return tasks
+
+
+async def _measure(name: str, fn, user_id: int, iterations: int) -> None:
+    global _statements
+    for category in CATEGORIES:
+        timings: List[float] = []
+        _statements = 0
+        for _ in range(iterations):
+            started = time.perf_counter()
+            async with unit_of_work():
+                await fn(user_id, category)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        p50 = statistics.median(timings)
+        p95 = statistics.quantiles(timings, n=20)[18] if len(timings) >= 2 else timings[0]
+        print(
+            f"{name:7} {category:10} round-trips/call={_statements / iterations:5.1f} "
+            f"p50={p50:7.2f}ms p95={p95:7.2f}ms"
+        )
+
+
+async def main():
+    if len(sys.argv) < 2:
+        print("usage: python bench_tasks_list.py <user_id> [iterations]")
+        return
+
+    user_id = int(sys.argv[1])
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+
+    event.listen(engine.sync_engine, "before_cursor_execute", _count_statement)
+
+    # прогрев пула соединений
+    await get_tasks_by_category(user_id, "daily")
+
+    await _measure("before", legacy_get_tasks_by_category, user_id, iterations)
+    await _measure("after", get_tasks_by_category, user_id, iterations)
+
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,65 @@
+# credit_snapshot.py
+# Периодическая сверка балансов: досчитывает credit_snapshots по журналу
+# credit_ledger пачками и сверяет их с users.messages_balance.
+# Использование: python credit_snapshot.py [--interval СЕКУНДЫ]
+#   без --interval — один проход (для cron), с ним — цикл.
+import argparse
+import asyncio
+
+from app.db.postgres import unit_of_work
+from app.db.schema import ensure_schema
+from app.services.credit_ledger_service import (
+    open_credit_ledger,
+    snapshot_ledger_chunk,
+    verify_snapshots_chunk,
+)
+
+
+async def run_once() -> None:
+    # каждая пачка — своя транзакция, чтобы не держать длинную
+    async with unit_of_work():
+        opened = await open_credit_ledger()
+    if opened:
+        print(f"Opened ledger for {opened} users")
+
+    snapshots = 0
+    while True:
+        async with unit_of_work():
+            updated = await snapshot_ledger_chunk()
+        if not updated:
+            break
+        snapshots += updated
+    print(f"Snapshots updated: {snapshots}")
+
+    checked_up_to = 0
+    mismatches = 0
+    while True:
+        async with unit_of_work():
+            last_user_id, bad = await verify_snapshots_chunk(checked_up_to)
+        if last_user_id is None:
+            break
+        checked_up_to = last_user_id
+        for m in bad:
+            mismatches += 1
+            print(
+                f"❌ user {m['user_id']}: ledger={m['ledger_balance']} "
+                f"balance={m['balance']}"
+            )
+    print(f"Verification done, mismatches: {mismatches}")
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--interval", type=float, default=None)
+    args = parser.parse_args()
+
+    await ensure_schema()
+    while True:
+        await run_once()
+        if args.interval is None:
+            break
+        await asyncio.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,40 @@
+# history_retention.py
+# Ретеншн истории: заводит партиции history на ближайшие месяцы, а партиции
+# старше HISTORY_RETENTION_MONTHS (env, по умолчанию 12) выгружает в
+# HISTORY_ARCHIVE_DIR (env, по умолчанию archive/history) как
+# NDJSON.zst (или .gz без zstandard) и удаляет.
+# Использование: python history_retention.py [--dry-run] [--interval СЕКУНДЫ]
+#   без --interval — один проход (для cron), с ним — цикл.
+import argparse
+import asyncio
+
+from app.db.schema import ensure_schema
+from app.services.history_retention_service import run_history_retention
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--dry-run", action="store_true")
+    parser.add_argument("--interval", type=float, default=None)
+    args = parser.parse_args()
+
+    await ensure_schema()
+    while True:
+        summary = await run_history_retention(dry_run=args.dry_run)
+        print(f"Cutoff: {summary['cutoff']}")
+        for name in summary["created"]:
+            print(f"{'Would create' if args.dry_run else 'Created'} partition {name}")
+        for name in summary.get("expired", []):
+            print(f"Would archive {name}")
+        for item in summary["archived"]:
+            print(
+                f"Archived {item['table']} -> {item['file']} "
+                f"({item['answers_deleted']} answers deleted)"
+            )
+        if args.interval is None:
+            break
+        await asyncio.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+# import_promo_pools.py
+# Заливает коды из app/promo_pools в promo_codes и помечает выданными
+# те, что уже есть в user_promocodes. Повторный запуск безопасен.
+import asyncio
+
+from app.db.schema import ensure_schema
+from app.services.promo_pool_service import import_promo_pools
+
+
+async def main():
+    await ensure_schema()
+    inserted = await import_promo_pools()
+    print(f"Imported {inserted} new promo codes")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,44 @@
+# migrate.py
+# Применяет миграции схемы (шаг деплоя: API на старте только проверяет,
+# что база не отстала) и проверяет планы горячих запросов.
+# Использование:
+#   python migrate.py            — создать таблицы и применить миграции
+#   python migrate.py --status   — показать применённые и ожидающие версии
+#   python migrate.py --check    — упасть, если горячий запрос идёт seq scan'ом
+import asyncio
+import sys
+
+from app.db.hot_queries import check_hot_queries
+from app.db.migrations import applied_versions, migration_lock, pending_migrations
+from app.db.schema import migrate_schema
+
+
+async def show_status() -> None:
+    async with migration_lock() as conn:
+        applied = await applied_versions(conn)
+    print(f"Applied: {sorted(applied)}")
+    for migration in pending_migrations(applied):
+        print(f"Pending: {migration.version} {migration.name}")
+
+
+async def check() -> int:
+    failures = await check_hot_queries()
+    for name, tables in failures:
+        print(f"❌ {name}: seq scan on {', '.join(tables)}")
+    if not failures:
+        print("✅ all hot queries use indexes")
+    return 1 if failures else 0
+
+
+async def main() -> int:
+    if "--status" in sys.argv:
+        await show_status()
+        return 0
+    if "--check" in sys.argv:
+        return await check()
+    await migrate_schema()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main()))
@@ -0,0 +1,60 @@
+# migrate_history_answers.py
+# Переносит старые history.answer_full в сжатую history_answers пачками,
+# каждая пачка — своя короткая транзакция. Повторный запуск безопасен.
+# Использование:
+#   python migrate_history_answers.py [--batch N] [--pause СЕКУНДЫ]
+#   python migrate_history_answers.py --report   — только отчёт об экономии
+import argparse
+import asyncio
+
+from app.db.postgres import unit_of_work
+from app.db.schema import ensure_schema
+from app.services.history_answers_service import (
+    HISTORY_ANSWERS_MIGRATE_BATCH,
+    history_storage_report,
+    migrate_history_answers_chunk,
+)
+
+
+async def print_report() -> None:
+    async with unit_of_work():
+        report = await history_storage_report()
+    for codec, stats in report["codecs"].items():
+        print(f"{codec:5} rows={stats['rows']} raw={stats['raw_bytes']} stored={stats['stored_bytes']}")
+    print(
+        f"Answers: raw={report['raw_bytes']} stored={report['stored_bytes']} "
+        f"saved={report['saved_bytes']} ratio={report['ratio']}"
+    )
+    print(f"Not migrated yet: {report['legacy_rows']}")
+    print(
+        f"Tables: history={report['history_table_bytes']} "
+        f"history_answers={report['history_answers_table_bytes']}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--batch", type=int, default=HISTORY_ANSWERS_MIGRATE_BATCH)
+    parser.add_argument("--pause", type=float, default=0.1)
+    parser.add_argument("--report", action="store_true")
+    args = parser.parse_args()
+
+    await ensure_schema()
+    if not args.report:
+        last_id, moved = 0, 0
+        while True:
+            async with unit_of_work():
+                last_id, count = await migrate_history_answers_chunk(last_id, args.batch)
+            if last_id is None:
+                break
+            moved += count
+            print(f"Moved {moved} answers (up to id {last_id})")
+            await asyncio.sleep(args.pause)
+        # место в history освободит (auto)vacuum
+        print(f"Done, moved {moved} answers")
+
+    await print_report()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
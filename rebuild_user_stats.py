@@ -0,0 +1,22 @@
+# rebuild_user_stats.py
+# Бэкфилл и починка проекции user_stats: пересчитывает счётчики профиля
+# из history / users / user_tasks / user_xp.
+# Использование: python rebuild_user_stats.py [user_id ...]
+import asyncio
+import sys
+
+from app.db.postgres import unit_of_work
+from app.db.schema import ensure_schema
+from app.services.user_stats_service import rebuild_user_stats
+
+
+async def main():
+    await ensure_schema()
+    user_ids = [int(arg) for arg in sys.argv[1:]] or None
+    async with unit_of_work():
+        rebuilt = await rebuild_user_stats(user_ids)
+    print(f"Rebuilt user_stats for {rebuilt} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,17 @@
+# seed_user_tasks.py
+# Разовый бэкфилл: создаёт строки user_tasks по всем кодам TASK_CONFIG
+# для пользователей, у которых tasks_version меньше TASK_CATALOG_VERSION.
+import asyncio
+
+from app.db.schema import ensure_schema
+from app.services.tasks_service import TASK_CATALOG_VERSION, seed_all_users_tasks
+
+
+async def main():
+    await ensure_schema()
+    seeded = await seed_all_users_tasks()
+    print(f"Seeded task catalog v{TASK_CATALOG_VERSION} for {seeded} users")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
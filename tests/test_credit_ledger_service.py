@@ -0,0 +1,55 @@
+# tests/test_credit_ledger_service.py
+
+from sqlalchemy import text
+
+from app.db.postgres import engine, unit_of_work
+from app.services.credit_ledger_service import (
+    apply_credit_delta,
+    snapshot_ledger_chunk,
+    verify_snapshots_chunk,
+)
+
+from conftest import insert_users, run_db
+
+
+async def _age_ledger() -> None:
+    # вместо ожидания SNAPSHOT_SAFETY_LAG
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE credit_ledger SET created_at = created_at - interval '2 minutes'"))
+
+
+async def _snapshots() -> dict:
+    async with engine.connect() as conn:
+        rows = await conn.execute(text("SELECT user_id, balance FROM credit_snapshots"))
+        return dict(rows.all())
+
+
+async def _snapshot_around_late_commit() -> tuple:
+    await insert_users(1, 2)
+    await apply_credit_delta(1, 10, "a")
+    await apply_credit_delta(1, 5, "b")
+    await _age_ledger()
+
+    # строка пользователя 2 получает id раньше, а видна становится позже
+    async with unit_of_work():
+        await apply_credit_delta(2, 3, "late")
+        async with unit_of_work():
+            await apply_credit_delta(1, 4, "c")
+        async with unit_of_work():
+            await snapshot_ledger_chunk()
+        during = await _snapshots()
+
+    await _age_ledger()
+    while await snapshot_ledger_chunk():
+        pass
+    _, mismatches = await verify_snapshots_chunk()
+    return during, await _snapshots(), mismatches
+
+
+def test_snapshot_does_not_skip_late_committed_rows(database):
+    during, after, mismatches = run_db(_snapshot_around_late_commit())
+
+    # пачка обрывается на свежей строке, курсор не уходит за незакоммиченную
+    assert during == {1: 15}
+    assert after == {1: 19, 2: 3}
+    assert mismatches == []
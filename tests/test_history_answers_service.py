@@ -0,0 +1,65 @@
+# tests/test_history_answers_service.py
+
+import os
+import zlib
+
+import pytest
+
+from app.services import history_answers_service
+from app.services.history_answers_service import (
+    HISTORY_ANSWER_MIN_COMPRESS,
+    _answer_row,
+    pack_answer,
+    unpack_answer,
+)
+
+LONG_ANSWER = "Карта дня — Луна. Доверься интуиции, но проверь факты. " * 40
+
+
+def test_short_answer_is_stored_raw():
+    raw = "Да".encode("utf-8")
+    assert len(raw) < HISTORY_ANSWER_MIN_COMPRESS
+
+    assert pack_answer(raw) == ("raw", raw)
+
+
+def test_long_answer_round_trip():
+    raw = LONG_ANSWER.encode("utf-8")
+
+    codec, data = pack_answer(raw)
+
+    assert codec in ("zstd", "zlib")
+    assert len(data) < len(raw)
+    assert unpack_answer(codec, data) == LONG_ANSWER
+
+
+def test_incompressible_answer_is_stored_raw():
+    raw = os.urandom(HISTORY_ANSWER_MIN_COMPRESS * 4)
+
+    assert pack_answer(raw) == ("raw", raw)
+
+
+def test_zlib_fallback_without_zstandard(monkeypatch):
+    monkeypatch.setattr(history_answers_service, "_zstd_compressor", None)
+    raw = LONG_ANSWER.encode("utf-8")
+
+    codec, data = pack_answer(raw)
+
+    assert codec == "zlib"
+    assert zlib.decompress(data) == raw
+    assert unpack_answer(codec, data) == LONG_ANSWER
+
+
+def test_zstd_answers_need_zstandard(monkeypatch):
+    monkeypatch.setattr(history_answers_service, "zstandard", None)
+
+    with pytest.raises(RuntimeError):
+        unpack_answer("zstd", b"\x28\xb5\x2f\xfd")
+
+
+def test_answer_row_keeps_raw_size():
+    row = _answer_row(5, LONG_ANSWER, created_at=None)
+
+    assert row["history_id"] == 5
+    assert row["raw_size"] == len(LONG_ANSWER.encode("utf-8"))
+    assert unpack_answer(row["codec"], row["data"]) == LONG_ANSWER
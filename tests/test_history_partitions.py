@@ -0,0 +1,68 @@
+# tests/test_history_partitions.py
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+
+from app.db import history_partitions
+from app.db.history_partitions import (
+    _BOUND_RE,
+    _bound,
+    _parse_bound,
+    history_cutoff,
+    month_start,
+    partition_name,
+)
+
+UTC = dt_timezone.utc
+
+
+@pytest.mark.parametrize(
+    "moment, months, expected",
+    [
+        (datetime(2026, 5, 17, 13, 45, tzinfo=UTC), 0, datetime(2026, 5, 1, tzinfo=UTC)),
+        (datetime(2026, 5, 1, tzinfo=UTC), 1, datetime(2026, 6, 1, tzinfo=UTC)),
+        (datetime(2026, 11, 30, tzinfo=UTC), 2, datetime(2027, 1, 1, tzinfo=UTC)),
+        (datetime(2026, 1, 15, tzinfo=UTC), -1, datetime(2025, 12, 1, tzinfo=UTC)),
+        (datetime(2026, 3, 10, tzinfo=UTC), -14, datetime(2025, 1, 1, tzinfo=UTC)),
+        # месяц считается по UTC: 1 июня 01:00 в +03:00 — это ещё май
+        (
+            datetime(2026, 6, 1, 1, 0, tzinfo=dt_timezone(timedelta(hours=3))),
+            0,
+            datetime(2026, 5, 1, tzinfo=UTC),
+        ),
+    ],
+)
+def test_month_start(moment, months, expected):
+    assert month_start(moment, months) == expected
+
+
+def test_partition_name():
+    assert partition_name(datetime(2026, 2, 1, tzinfo=UTC)) == "history_p202602"
+
+
+def test_history_cutoff(monkeypatch):
+    monkeypatch.setattr(history_partitions, "HISTORY_RETENTION_MONTHS", 12)
+
+    assert history_cutoff(datetime(2026, 10, 18, tzinfo=UTC)) == datetime(2025, 10, 1, tzinfo=UTC)
+
+
+def test_bounds_round_trip_through_pg_get_expr_format():
+    lower = datetime(2026, 10, 1, tzinfo=UTC)
+    upper = month_start(lower, 1)
+    assert _bound(upper) == "'2026-11-01T00:00:00+00:00'"
+
+    # так границы печатает pg_get_expr(relpartbound) в зоне UTC
+    bound = "FOR VALUES FROM ('2026-10-01 00:00:00+00') TO ('2026-11-01 00:00:00+00')"
+    match = _BOUND_RE.search(bound)
+
+    assert _parse_bound(match.group(1)) == lower
+    assert _parse_bound(match.group(2)) == upper
+
+
+def test_legacy_partition_has_open_lower_bound():
+    bound = "FOR VALUES FROM (MINVALUE) TO ('2026-11-01 00:00:00+00')"
+    match = _BOUND_RE.search(bound)
+
+    assert _parse_bound(match.group(1)) is None
+    assert _parse_bound(match.group(2)) == datetime(2026, 11, 1, tzinfo=UTC)
@@ -0,0 +1,100 @@
+# tests/test_history_partitions_pg.py
+
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.db.postgres import engine
+from app.db.migrations import migration_lock
+from app.db.history_partitions import (
+    HISTORY_LEGACY_PARTITION,
+    list_history_partitions,
+    month_start,
+    partition_history,
+)
+
+pytestmark = pytest.mark.skipif(
+    not os.getenv("TEST_DATABASE_URL"), reason="TEST_DATABASE_URL is not set"
+)
+
+
+# history в том виде, в каком она была до миграции 4
+_LEGACY_SCHEMA = [
+    "DROP TABLE IF EXISTS history CASCADE",
+    f"DROP TABLE IF EXISTS {HISTORY_LEGACY_PARTITION} CASCADE",
+    "DROP TABLE IF EXISTS users CASCADE",
+    "CREATE TABLE users (user_id BIGINT PRIMARY KEY)",
+    "CREATE TABLE history ("
+    "id SERIAL PRIMARY KEY, "
+    "user_id BIGINT NOT NULL REFERENCES users (user_id), "
+    "type VARCHAR NOT NULL, "
+    "question TEXT, answer_full TEXT, answer_short TEXT, "
+    "created_at TIMESTAMPTZ NOT NULL)",
+    "CREATE INDEX ix_history_user_id_created_at ON history (user_id, created_at, id)",
+    "INSERT INTO users (user_id) VALUES (1)",
+]
+
+
+async def _migrate_legacy_history() -> None:
+    now = datetime.now(dt_timezone.utc)
+    async with engine.begin() as conn:
+        for ddl in _LEGACY_SCHEMA:
+            await conn.execute(text(ddl))
+        await conn.execute(
+            text("INSERT INTO history (user_id, type, created_at) VALUES (1, 'ask', :at)"),
+            [{"at": now - timedelta(days=days)} for days in (0, 40, 400)],
+        )
+
+    async with migration_lock() as lock_conn:
+        await partition_history(lock_conn)
+        # повторный запуск (миграция упала после подмены) — no-op
+        await partition_history(lock_conn)
+
+    async with engine.begin() as conn:
+        relkind = await conn.scalar(
+            text("SELECT relkind FROM pg_class WHERE oid = 'history'::regclass")
+        )
+        assert relkind == "p"
+
+        await conn.execute(text("SET LOCAL TIME ZONE 'UTC'"))
+        partitions = await list_history_partitions(conn)
+        assert partitions[0].name == HISTORY_LEGACY_PARTITION
+        assert partitions[0].lower is None
+        assert partitions[-1].upper > month_start(now, 1)
+
+        assert await conn.scalar(text("SELECT count(*) FROM history")) == 3
+
+        # новая запись идёт в месячную партицию, id — из той же последовательности
+        new_id = await conn.scalar(
+            text(
+                "INSERT INTO history (user_id, type, created_at) "
+                "VALUES (1, 'ask', :at) RETURNING id"
+            ),
+            {"at": month_start(now, 2)},
+        )
+        assert new_id == 4
+        table = await conn.scalar(
+            text("SELECT tableoid::regclass::text FROM history WHERE id = :id"), {"id": new_id}
+        )
+        assert table != HISTORY_LEGACY_PARTITION
+
+        pkey = await conn.scalar(
+            text(
+                "SELECT pg_get_constraintdef(oid) FROM pg_constraint "
+                "WHERE conrelid = 'history'::regclass AND contype = 'p'"
+            )
+        )
+        assert pkey == "PRIMARY KEY (id, created_at)"
+
+
+def test_partition_history_swaps_legacy_table():
+    async def scenario() -> None:
+        try:
+            await _migrate_legacy_history()
+        finally:
+            await engine.dispose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,105 @@
+# tests/test_history_retention_pg.py
+
+from datetime import datetime, timezone as dt_timezone
+
+from sqlalchemy import text
+
+from app.db.postgres import engine
+from app.db.migrations import migration_lock
+from app.db.history_partitions import (
+    _bound,
+    adopt_detached_partitions,
+    list_history_partitions,
+    month_start,
+    partition_name,
+)
+from app.services import history_retention_service
+from app.services.history_retention_service import run_history_retention
+
+from conftest import run_db
+
+
+async def _create_old_partition() -> str:
+    old = month_start(datetime.now(dt_timezone.utc), -14)
+    name = partition_name(old)
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"CREATE TABLE {name} PARTITION OF history "
+                f"FOR VALUES FROM ({_bound(old)}) TO ({_bound(month_start(old, 1))})"
+            )
+        )
+    return name
+
+
+async def _partition_names() -> list:
+    async with engine.connect() as conn:
+        return [p.name for p in await list_history_partitions(conn)]
+
+
+async def _tables(*names: str) -> list:
+    async with engine.connect() as conn:
+        result = await conn.execute(
+            text("SELECT relname FROM pg_class WHERE relname = ANY(:names) ORDER BY relname"),
+            {"names": list(names)},
+        )
+        return list(result.scalars().all())
+
+
+async def _dry_run() -> tuple:
+    old = await _create_old_partition()
+    newest = (await _partition_names())[-1]
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {newest}"))
+    before = await _partition_names()
+
+    summary = await run_history_retention(dry_run=True)
+    return old, newest, summary, before, await _partition_names()
+
+
+def test_dry_run_changes_nothing(database):
+    old, newest, summary, before, after = run_db(_dry_run())
+
+    assert summary["created"] == [newest]
+    assert summary["expired"] == [old]
+    assert summary["archived"] == []
+    assert after == before
+
+
+async def _archive_only_own_tables() -> tuple:
+    old = await _create_old_partition()
+    # чужие таблицы с похожими именами и отключённая до history_archives партиция
+    strangers = ["history_p_backup", "history_p209901", "history_p200001"]
+    async with engine.begin() as conn:
+        for name in strangers:
+            await conn.execute(text(f"CREATE TABLE {name} (LIKE history)"))
+
+    await run_history_retention()
+    first = await _tables(old, *strangers)
+
+    async with migration_lock() as lock_conn:
+        await adopt_detached_partitions(lock_conn)
+    await run_history_retention()
+    second = await _tables(old, *strangers)
+
+    async with engine.connect() as conn:
+        archived = (
+            await conn.execute(
+                text(
+                    "SELECT table_name FROM history_archives "
+                    "WHERE archived_at IS NOT NULL AND archive_file IS NOT NULL "
+                    "ORDER BY table_name"
+                )
+            )
+        ).scalars().all()
+    return old, first, second, list(archived)
+
+
+def test_retention_drops_only_tables_it_detached(database, monkeypatch, tmp_path):
+    monkeypatch.setattr(history_retention_service, "HISTORY_ARCHIVE_DIR", tmp_path)
+
+    old, first, second, archived = run_db(_archive_only_own_tables())
+
+    assert first == ["history_p200001", "history_p209901", "history_p_backup"]
+    assert second == ["history_p209901", "history_p_backup"]
+    assert archived == sorted(["history_p200001", old])
@@ -0,0 +1,104 @@
+# tests/test_history_service.py
+
+import base64
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import pytest
+from sqlalchemy import text
+
+from app.db.postgres import engine
+
+from app.services import history_service
+from app.services.history_service import (
+    InvalidHistoryCursor,
+    decode_history_cursor,
+    encode_history_cursor,
+)
+
+from conftest import insert_users, run_db
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2026, 3, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc)
+
+    cursor = encode_history_cursor(created_at, 42)
+
+    assert "=" not in cursor
+    assert decode_history_cursor(cursor) == (created_at, 42)
+
+
+@pytest.mark.parametrize(
+    "cursor",
+    [
+        "",
+        "not base64!",
+        base64.urlsafe_b64encode(b"{}").decode(),
+        base64.urlsafe_b64encode(b'["2026-03-01T12:00:00+00:00"]').decode(),
+        base64.urlsafe_b64encode(b'["yesterday", 1]').decode(),
+        base64.urlsafe_b64encode(b'["2026-03-01T12:00:00+00:00", "x"]').decode(),
+        base64.urlsafe_b64encode(b'[null, 1]').decode(),
+    ],
+)
+def test_bad_cursor_raises_invalid_history_cursor(cursor):
+    with pytest.raises(InvalidHistoryCursor):
+        decode_history_cursor(cursor)
+
+
+def test_invalid_cursor_is_value_error():
+    assert issubclass(InvalidHistoryCursor, ValueError)
+
+
+async def _page_through(limit: int, cursor_offset: int = 0) -> tuple:
+    await insert_users(1, 2)
+    now = datetime.now(dt_timezone.utc).replace(microsecond=123456)
+    # одинаковые created_at на границах страниц
+    times = [now] * 3 + [now - timedelta(minutes=1)] * 2 + [now - timedelta(minutes=2)]
+    async with engine.begin() as conn:
+        ids = (
+            await conn.execute(
+                text(
+                    "INSERT INTO history (user_id, type, created_at) "
+                    "SELECT 1, 'ask', unnest(CAST(:times AS timestamptz[])) RETURNING id"
+                ),
+                {"times": times},
+            )
+        ).scalars().all()
+        await conn.execute(
+            text("INSERT INTO history (user_id, type, created_at) VALUES (2, 'ask', :at)"),
+            {"at": now},
+        )
+    expected = [i for _, i in sorted(zip(times, ids), reverse=True)]
+
+    pages, cursor = [], None
+    while True:
+        page = await history_service.list_history(
+            1, limit=limit, cursor=cursor, offset=cursor_offset if cursor else 0
+        )
+        pages.append([item["id"] for item in page["items"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+        # новое событие между страницами не сдвигает следующие
+        async with engine.begin() as conn:
+            await conn.execute(
+                text("INSERT INTO history (user_id, type, created_at) VALUES (1, 'ask', :at)"),
+                {"at": now + timedelta(hours=1)},
+            )
+
+    legacy = await history_service.list_history(1, limit=limit, offset=limit)
+    return expected, pages, [item["id"] for item in legacy["items"]]
+
+
+def test_list_history_pages_by_key(database):
+    expected, pages, _ = run_db(_page_through(limit=2))
+
+    assert [len(page) for page in pages] == [2, 2, 2]
+    assert [i for page in pages for i in page] == expected
+
+
+def test_list_history_cursor_ignores_legacy_offset(database):
+    expected, pages, legacy = run_db(_page_through(limit=3, cursor_offset=3))
+
+    assert [i for page in pages for i in page] == expected
+    # без курсора offset ещё работает, и новое событие его сдвигает
+    assert legacy == expected[2:5]
@@ -0,0 +1,7 @@
+from conftest import run_db
+
+from app.db.hot_queries import check_hot_queries
+
+
+def test_hot_queries_use_indexes(database):
+    assert run_db(check_hot_queries()) == []
@@ -0,0 +1,67 @@
+# tests/test_levels_service.py
+
+import pytest
+
+from app.services import levels_service
+from app.services.levels_service import _build_index, resolve_level
+
+LEVELS = [
+    {"code": "c", "title": "C", "min_xp": 300, "max_xp": None},
+    {"code": "a", "title": "A", "min_xp": 0, "max_xp": 99},
+    {"code": "b", "title": "B", "min_xp": 100, "max_xp": 299},
+]
+
+
+@pytest.fixture
+def levels(monkeypatch):
+    monkeypatch.setattr(levels_service, "_index", _build_index(LEVELS))
+
+
+def test_index_is_sorted_and_read_only():
+    index = _build_index(LEVELS)
+
+    assert index.min_xp == (0, 100, 300)
+    assert [lvl["code"] for lvl in index.levels] == ["a", "b", "c"]
+    with pytest.raises(TypeError):
+        index.levels[0]["min_xp"] = 5
+
+
+@pytest.mark.parametrize(
+    "xp, current, following",
+    [
+        (0, "a", "b"),
+        (99, "a", "b"),
+        (100, "b", "c"),
+        (299, "b", "c"),
+        (300, "c", None),
+        (10_000, "c", None),
+        # отрицательный XP не должен уводить за начало таблицы
+        (-5, "a", "b"),
+    ],
+)
+def test_resolve_level_bounds(levels, xp, current, following):
+    level, next_level = resolve_level(xp)
+
+    assert level["code"] == current
+    assert (next_level["code"] if next_level else None) == following
+
+
+@pytest.mark.parametrize(
+    "old_xp, new_xp, crossed",
+    [
+        (0, 99, []),
+        (99, 100, ["b"]),
+        (100, 299, []),
+        (50, 300, ["b", "c"]),
+        # с нуля первый уровень уже достигнут — его награды нет
+        (0, 0, []),
+    ],
+)
+def test_levels_crossed(levels, old_xp, new_xp, crossed):
+    assert [lvl["code"] for lvl in levels_service.levels_crossed(old_xp, new_xp)] == crossed
+
+
+def test_level_number_follows_thresholds(levels):
+    numbers = [levels_service.level_number(lvl) for lvl in levels_service._index.levels]
+
+    assert numbers == [1, 2, 3]
@@ -0,0 +1,30 @@
+# tests/test_promo_catalog.py
+
+import asyncio
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from app.services import promo_catalog
+from app.services.promo_catalog import CatalogPromo
+
+
+def test_find_promo_reloads_stale_catalog(monkeypatch):
+    now = [1000.0]
+    loads = []
+    expires = datetime.now(dt_timezone.utc) + timedelta(days=1)
+
+    async def refresh():
+        loads.append(now[0])
+        promo_catalog._catalog = {"NEW": CatalogPromo(10, expires)} if len(loads) > 1 else {}
+        promo_catalog._loaded_at = now[0]
+        return len(promo_catalog._catalog)
+
+    monkeypatch.setattr(promo_catalog.time, "monotonic", lambda: now[0])
+    monkeypatch.setattr(promo_catalog, "refresh_promo_catalog", refresh)
+    monkeypatch.setattr(promo_catalog, "_loaded_at", None)
+
+    assert asyncio.run(promo_catalog.find_promo("NEW")) is None
+    now[0] += promo_catalog.PROMO_CATALOG_REFRESH_INTERVAL
+    assert asyncio.run(promo_catalog.find_promo("NEW")) is None
+    now[0] += 1
+    assert asyncio.run(promo_catalog.find_promo("NEW")) == CatalogPromo(10, expires)
+    assert len(loads) == 2
@@ -0,0 +1,55 @@
+# tests/test_promo_pool_service.py
+
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.postgres import engine, unit_of_work
+from app.services.promo_pool_service import get_promo_from_pool
+
+from conftest import run_db
+
+
+async def _allocate_concurrently() -> tuple:
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO promo_codes (code, discount_percent, expires_at, is_active) "
+                "VALUES (:code, :discount, '2099-12-31', true)"
+            ),
+            [
+                {"code": "A10", "discount": 10},
+                {"code": "B10", "discount": 10},
+                {"code": "C10", "discount": 10},
+                {"code": "A5", "discount": 5},
+            ],
+        )
+
+    # все транзакции держат свой код, пока остальные выбирают свои
+    barrier = asyncio.Barrier(5)
+
+    async def allocate(user_id: int):
+        async with unit_of_work():
+            code = await get_promo_from_pool(10, user_id)
+            await barrier.wait()
+        return code
+
+    codes = await asyncio.wait_for(asyncio.gather(*(allocate(i) for i in range(1, 6))), 10)
+
+    async with engine.connect() as conn:
+        owners = dict(
+            (await conn.execute(text("SELECT code, allocated_to FROM promo_codes"))).all()
+        )
+    return codes, owners
+
+
+def test_concurrent_allocations_get_distinct_codes(database):
+    codes, owners = run_db(_allocate_concurrently())
+
+    issued = [code for code in codes if code is not None]
+    assert sorted(issued) == ["A10", "B10", "C10"]
+    assert codes.count(None) == 2
+    assert owners["A5"] is None
+    assert {owners[code] for code in issued} == {
+        user_id for user_id, code in enumerate(codes, 1) if code is not None
+    }
@@ -0,0 +1,65 @@
+# tests/test_subscription_service.py
+
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+from app.services import subscription_service
+from app.services.ttl_cache import TTLCache
+
+
+def test_telegram_is_called_without_open_session(monkeypatch):
+    events = []
+    open_sessions = []
+
+    @asynccontextmanager
+    async def unit_of_work():
+        open_sessions.append(1)
+        try:
+            yield None
+        finally:
+            open_sessions.pop()
+
+    async def get_claimed_task_codes(user_id):
+        events.append(("claimed", len(open_sessions)))
+        return set()
+
+    async def increment_task_progress(user_id, code, delta):
+        events.append((code, len(open_sessions)))
+
+    class Bot:
+        async def get_chat_member(self, chat_id, user_id):
+            events.append(("telegram", len(open_sessions)))
+            return SimpleNamespace(status="member")
+
+    monkeypatch.setattr(subscription_service, "unit_of_work", unit_of_work)
+    monkeypatch.setattr(subscription_service, "get_claimed_task_codes", get_claimed_task_codes)
+    monkeypatch.setattr(subscription_service, "increment_task_progress", increment_task_progress)
+    monkeypatch.setattr(subscription_service, "_membership_cache", TTLCache(maxsize=10, ttl=60))
+
+    asyncio.run(subscription_service.check_and_complete_subscriptions(Bot(), 1))
+
+    assert events == [("claimed", 1), ("telegram", 0), ("telegram", 0), ("D_1", 1)]
+
+
+def test_schedule_counts_cache_hits_and_misses(monkeypatch):
+    cache = TTLCache(maxsize=10, ttl=60)
+    started = []
+
+    async def run_check(bot, user_id):
+        started.append(user_id)
+        cache.set(user_id, (True, False))
+        subscription_service._checks_in_progress.discard(user_id)
+
+    monkeypatch.setattr(subscription_service, "_membership_cache", cache)
+    monkeypatch.setattr(subscription_service, "_run_subscription_check", run_check)
+
+    async def main():
+        subscription_service.schedule_subscription_check(None, 1)
+        await asyncio.gather(*subscription_service._background_checks)
+        subscription_service.schedule_subscription_check(None, 1)
+
+    asyncio.run(main())
+
+    assert started == [1]
+    assert (cache.hits, cache.misses) == (1, 1)
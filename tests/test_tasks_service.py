@@ -0,0 +1,79 @@
+# tests/test_tasks_service.py
+
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.postgres import engine, unit_of_work
+from app.services import levels_service, tasks_service
+
+from conftest import insert_users, run_db
+
+
+def test_ladder_events_advance_counter_once_per_action(monkeypatch):
+    advanced = []
+
+    async def advance_counters(user_id, events):
+        advanced.extend(events)
+        return []
+
+    monkeypatch.setattr(tasks_service, "advance_counters", advance_counters)
+
+    # один запрос двигает все ступени USE_*, два запроса — по +1 дважды
+    events = [(code, 1) for code in tasks_service.TASK_LADDERS["requests"]] * 2
+    asyncio.run(tasks_service.apply_task_events(1, events))
+
+    assert advanced == [("requests", 2)]
+
+
+def test_level_up_rewards_follow_levels_table(monkeypatch):
+    levels = [
+        {"code": code, "title": code, "min_xp": min_xp, "max_xp": None}
+        for code, min_xp in [("a", 0), ("b", 50), ("c", 80), ("d", 5000)]
+    ]
+    monkeypatch.setattr(levels_service, "_index", levels_service._build_index(levels))
+    rewarded = []
+
+    async def get_claimed_task_codes(user_id):
+        return {"LEVEL_UP_1"}
+
+    async def apply_task_reward(user_id, code):
+        rewarded.append(code)
+
+    monkeypatch.setattr(tasks_service, "get_claimed_task_codes", get_claimed_task_codes)
+    monkeypatch.setattr(tasks_service, "_apply_task_reward", apply_task_reward)
+
+    # пороги берутся из таблицы уровней, а не из progress_target задач
+    crossed = levels_service.levels_crossed(10, 100)
+    asyncio.run(tasks_service._reward_level_ups(1, crossed))
+
+    assert rewarded == ["LEVEL_UP_2"]
+
+
+async def _claim_twice_concurrently() -> tuple:
+    await insert_users(1)
+    tasks_service._claimed_cache.clear()
+
+    async def claim() -> None:
+        async with unit_of_work():
+            await tasks_service._apply_task_reward(1, "USE_1")
+
+    await asyncio.gather(claim(), claim())
+    # и ещё раз, когда награда давно выдана
+    await claim()
+
+    async with engine.connect() as conn:
+        row = await conn.execute(
+            text(
+                "SELECT s.tasks_completed, x.xp, u.messages_balance, "
+                "(SELECT count(*) FROM credit_ledger WHERE user_id = 1) "
+                "FROM users u JOIN user_stats s USING (user_id) JOIN user_xp x USING (user_id) "
+                "WHERE u.user_id = 1"
+            )
+        )
+        return tuple(row.one())
+
+
+def test_claim_rewards_once_under_concurrency(database):
+    # USE_1: 50 XP и 5 сообщений
+    assert run_db(_claim_twice_concurrently()) == (1, 50, 5, 1)
@@ -0,0 +1,47 @@
+# tests/test_timestamp_migration.py
+
+import re
+
+import pytest
+
+from app.db.timestamp_migration import TimestampColumn, _convert
+
+CREATED_AT = TimestampColumn("created_at", "timestamptz", not_null=True)
+
+
+def _offset_regex() -> re.Pattern:
+    # регулярка, по которой SQL решает, есть ли у строки смещение
+    # (синтаксис \d, \s и групп у POSIX-регулярок PostgreSQL тот же)
+    sql = _convert(CREATED_AT, "created_at")
+    return re.compile(re.search(r"~ '(.+?)' THEN", sql).group(1))
+
+
+def test_date_column_is_plain_cast():
+    column = TimestampColumn("last_active_date", "date")
+
+    assert _convert(column, "last_active_date") == "NULLIF(last_active_date, '')::date"
+
+
+def test_timestamptz_reads_naive_strings_as_utc():
+    sql = _convert(CREATED_AT, "NEW.created_at")
+
+    assert sql.startswith("CASE WHEN NULLIF(NEW.created_at, '') ~ '")
+    assert "THEN NULLIF(NEW.created_at, '')::timestamptz" in sql
+    assert sql.endswith("ELSE NULLIF(NEW.created_at, '')::timestamp AT TIME ZONE 'UTC' END")
+
+
+@pytest.mark.parametrize(
+    "value, has_offset",
+    [
+        ("2024-05-01T10:20:30", False),
+        ("2024-05-01T10:20:30.123456", False),
+        ("2024-05-01 10:20", False),
+        ("2024-05-01T10:20:30Z", True),
+        ("2024-05-01T10:20:30+03:00", True),
+        ("2024-05-01T10:20:30.5-0530", True),
+        ("2024-05-01 10:20:30+00", True),
+        ("2024-05-01 10:20 +03:00", True),
+    ],
+)
+def test_offset_detection(value, has_offset):
+    assert bool(_offset_regex().search(value)) is has_offset
@@ -0,0 +1,90 @@
+# tests/test_timestamp_migration_pg.py
+
+from datetime import date, datetime, timezone as dt_timezone
+
+from sqlalchemy import text
+
+from app.db.postgres import engine
+from app.db.migrations import apply_migrations, migration_lock
+
+from conftest import run_db
+
+# users до миграции 3: даты строками из isoformat()
+_LEGACY_USERS = [
+    "ALTER TABLE users ALTER COLUMN created_at TYPE VARCHAR USING created_at::text",
+    "ALTER TABLE users ALTER COLUMN updated_at TYPE VARCHAR USING updated_at::text",
+    "ALTER TABLE users ALTER COLUMN last_active_date TYPE VARCHAR USING last_active_date::text",
+    "DELETE FROM schema_migrations WHERE version = 3",
+]
+
+_INSERT_USER = text(
+    "INSERT INTO users (user_id, created_at, updated_at, last_active_date, "
+    "is_banned, messages_balance, streak_days) "
+    "VALUES (:id, :created, :updated, :active, false, 0, 0)"
+)
+
+
+async def _convert_users() -> list:
+    async with engine.begin() as conn:
+        for ddl in _LEGACY_USERS:
+            await conn.execute(text(ddl))
+        await conn.execute(
+            _INSERT_USER,
+            [
+                # utcnow().isoformat() — без зоны, это UTC
+                {"id": 1, "created": "2024-05-01T10:20:30.123456",
+                 "updated": "2024-05-01 10:20", "active": "2024-05-01"},
+                {"id": 2, "created": "2024-05-01T10:20:30+03:00",
+                 "updated": "2024-05-01T10:20:30Z", "active": ""},
+            ],
+        )
+
+    async with migration_lock() as lock_conn:
+        assert await apply_migrations(lock_conn) == [3]
+
+    async with engine.connect() as conn:
+        types = dict(
+            (
+                await conn.execute(
+                    text(
+                        "SELECT column_name, data_type FROM information_schema.columns "
+                        "WHERE table_name = 'users' "
+                        "AND column_name IN ('created_at', 'updated_at', 'last_active_date')"
+                    )
+                )
+            ).all()
+        )
+        rows = (
+            await conn.execute(
+                text(
+                    "SELECT user_id, created_at, updated_at, last_active_date "
+                    "FROM users ORDER BY user_id"
+                )
+            )
+        ).all()
+    return [types, rows]
+
+
+def test_string_dates_become_native(database):
+    types, rows = run_db(_convert_users())
+
+    assert types == {
+        "created_at": "timestamp with time zone",
+        "updated_at": "timestamp with time zone",
+        "last_active_date": "date",
+    }
+    utc = dt_timezone.utc
+    assert [tuple(row) for row in rows] == [
+        (
+            1,
+            datetime(2024, 5, 1, 10, 20, 30, 123456, tzinfo=utc),
+            datetime(2024, 5, 1, 10, 20, tzinfo=utc),
+            date(2024, 5, 1),
+        ),
+        (
+            2,
+            datetime(2024, 5, 1, 7, 20, 30, tzinfo=utc),
+            datetime(2024, 5, 1, 10, 20, 30, tzinfo=utc),
+            None,
+        ),
+    ]
@@ -0,0 +1,91 @@
+# tests/test_user_stats_service_pg.py
+
+from datetime import datetime, timezone as dt_timezone
+
+from sqlalchemy import text
+
+from app.db.postgres import engine
+from app.db.migrations import apply_migrations, migration_lock
+from app.db.history_partitions import _bound, month_start, partition_name
+from app.services import history_retention_service
+from app.services.history_retention_service import run_history_retention
+from app.services.user_stats_service import rebuild_user_stats
+
+from conftest import run_db
+
+
+async def _requests_total() -> int:
+    async with engine.connect() as conn:
+        return await conn.scalar(text("SELECT requests_total FROM user_stats WHERE user_id = 1"))
+
+
+async def _rebuild_around_retention() -> list:
+    now = datetime.now(dt_timezone.utc)
+    old = month_start(now, -14)
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                f"CREATE TABLE {partition_name(old)} PARTITION OF history "
+                f"FOR VALUES FROM ({_bound(old)}) TO ({_bound(month_start(old, 1))})"
+            )
+        )
+        await conn.execute(
+            text(
+                "INSERT INTO users (user_id, created_at, updated_at, is_banned, "
+                "messages_balance, streak_days) VALUES (1, now(), now(), false, 0, 0)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO history (user_id, type, created_at) VALUES (1, 'ask', :at)"),
+            [{"at": old}] * 3 + [{"at": now}] * 2,
+        )
+
+    totals = []
+    assert await rebuild_user_stats() == 1
+    totals.append(await _requests_total())
+
+    await run_history_retention()
+    await rebuild_user_stats()
+    totals.append(await _requests_total())
+
+    # завышенный счётчик пересчёт исправляет
+    async with engine.begin() as conn:
+        await conn.execute(text("UPDATE user_stats SET requests_total = 100"))
+    await rebuild_user_stats()
+    totals.append(await _requests_total())
+    return totals
+
+
+def test_rebuild_counts_archived_history(database, monkeypatch, tmp_path):
+    monkeypatch.setattr(history_retention_service, "HISTORY_ARCHIVE_DIR", tmp_path)
+
+    assert run_db(_rebuild_around_retention()) == [5, 5, 5]
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+async def _seed_archive_counts() -> int:
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "INSERT INTO users (user_id, created_at, updated_at, is_banned, "
+                "messages_balance, streak_days) VALUES (1, now(), now(), false, 0, 0)"
+            )
+        )
+        await conn.execute(
+            text("INSERT INTO history (user_id, type, created_at) VALUES (1, 'ask', now())")
+        )
+        # старый ретеншн уже удалил 4 записи, счётчик их помнит
+        await conn.execute(text("INSERT INTO user_stats (user_id, requests_total) VALUES (1, 5)"))
+        await conn.execute(text("DELETE FROM schema_migrations WHERE version = 5"))
+
+    async with migration_lock() as lock_conn:
+        await apply_migrations(lock_conn)
+    await rebuild_user_stats()
+
+    async with engine.connect() as conn:
+        archived = await conn.scalar(text("SELECT requests FROM history_archive_counts"))
+    return [archived, await _requests_total()]
+
+
+def test_migration_seeds_archive_counts_from_stats(database):
+    assert run_db(_seed_archive_counts()) == [4, 5]